@@ -0,0 +1,250 @@
+"""
+In-process response cache for the chatbot.
+
+Responses are keyed by the normalised prompt plus a hash of the shared part
+of the prompt context (user role and climate indicators). General questions
+are answered from that shared context alone, leaving out personal fields
+(carbon totals, points, location, ...), so their answers are safe to reuse
+for anyone with the same role; questions about the user themselves ("my
+footprint", "how am I doing") keep the full context and are never cached. On
+an exact miss, an optional similarity lookup over locally embedded prompts
+(see ``embeddings``) catches near-duplicate questions. Entries expire after
+a TTL and the least recently used entry is evicted when the cache is full.
+
+News curation results are cached persistently instead, in ``CurationResult``
+rows keyed by content hash, prompt version and model, so re-ingested or
+reprocessed articles only reach the model when one of the three changed.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import redis
+from django.conf import settings
+
+from ecosphere.redis_client import get_redis
+
+from .embeddings import DEFAULT_DIMENSIONS, embed, normalize_text
+
+
+class ResponseCache:
+    """LRU + TTL cache of chatbot responses with optional semantic lookup"""
+    
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600,
+                 similarity_threshold: Optional[float] = 0.92,
+                 dimensions: int = DEFAULT_DIMENSIONS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        
+        # key -> (response, expires_at, slot)
+        self._entries: OrderedDict = OrderedDict()
+        # Embedding index: one row per slot, tagged with its key and context
+        self._vectors = np.zeros((max_entries, dimensions), dtype=np.float32)
+        self._slot_contexts = np.zeros(max_entries, dtype=np.int64)
+        self._slot_keys = [None] * max_entries
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+    
+    # Context fields many users share; every other field is personal
+    SHARED_CONTEXT_FIELDS = ('role', 'climate')
+    # First-person words mark a question about the user's own data
+    PERSONAL_WORDS = frozenset(['i', 'me', 'my', 'mine', 'myself', 'we', 'us', 'our', 'ours', 'ourselves'])
+    
+    @classmethod
+    def cacheable(cls, message: str) -> bool:
+        """Whether the question is general, so its answer can be shared between users"""
+        return not cls.PERSONAL_WORDS.intersection(normalize_text(message).split())
+    
+    @classmethod
+    def shared_context(cls, user_context: Optional[Dict]) -> Dict:
+        """The part of a prompt context that cached answers may depend on"""
+        return {field: value for field, value in (user_context or {}).items() if field in cls.SHARED_CONTEXT_FIELDS}
+    
+    @classmethod
+    def context_hash(cls, user_context: Optional[Dict]) -> str:
+        shared = {field: (user_context or {}).get(field) for field in cls.SHARED_CONTEXT_FIELDS}
+        payload = json.dumps(shared, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+    
+    def make_key(self, message: str, user_context: Optional[Dict] = None) -> str:
+        return f'{self.context_hash(user_context)}:{normalize_text(message)}'
+    
+    @staticmethod
+    def _context_id(context_hash: str) -> int:
+        return int(context_hash[:15], 16)
+    
+    def get(self, message: str, user_context: Optional[Dict] = None) -> Optional[Dict]:
+        """Return a cached response for this prompt (or a near-duplicate of it)"""
+        key = self.make_key(message, user_context)
+        now = time.monotonic()
+        # Embed outside the lock; only the matrix product needs it
+        query = embed(message, self._vectors.shape[1]) if self.similarity_threshold is not None else None
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry:
+                self._evict(key)
+            
+            if query is not None and self._entries:
+                similar_key = self._nearest(query, self.context_hash(user_context), now)
+                if similar_key:
+                    self._entries.move_to_end(similar_key)
+                    self.semantic_hits += 1
+                    return self._entries[similar_key][0]
+            
+            self.misses += 1
+            return None
+    
+    def set(self, message: str, user_context: Optional[Dict], response: Dict):
+        key = self.make_key(message, user_context)
+        context_hash = self.context_hash(user_context)
+        
+        with self._lock:
+            if key in self._entries:
+                self._evict(key)
+            while len(self._entries) >= self.max_entries:
+                self._evict(next(iter(self._entries)))
+            
+            slot = self._free_slots.pop()
+            self._vectors[slot] = embed(message, self._vectors.shape[1])
+            self._slot_contexts[slot] = self._context_id(context_hash)
+            self._slot_keys[slot] = key
+            self._entries[key] = (response, time.monotonic() + self.ttl, slot)
+    
+    def _nearest(self, query: np.ndarray, context_hash: str, now: float) -> Optional[str]:
+        if not query.any():
+            return None
+        
+        scores = self._vectors @ query
+        scores[self._slot_contexts != self._context_id(context_hash)] = -1.0
+        slot = int(np.argmax(scores))
+        if scores[slot] < self.similarity_threshold:
+            return None
+        
+        key = self._slot_keys[slot]
+        if key is None or self._entries[key][1] <= now:
+            if key is not None:
+                self._evict(key)
+            return None
+        return key
+    
+    def _evict(self, key: str):
+        _, _, slot = self._entries.pop(key)
+        self._vectors[slot] = 0
+        self._slot_contexts[slot] = 0
+        self._slot_keys[slot] = None
+        self._free_slots.append(slot)
+    
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._evict(key)
+    
+    def stats(self) -> Dict:
+        lookups = self.hits + self.semantic_hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'semantic_hits': self.semantic_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.hits + self.semantic_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+_response_cache = None
+
+
+def get_response_cache() -> ResponseCache:
+    """Return the process-wide chatbot response cache"""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache(
+            max_entries=settings.CHATBOT_CACHE_MAX_ENTRIES,
+            ttl=settings.CHATBOT_CACHE_TTL,
+            similarity_threshold=settings.CHATBOT_CACHE_SIMILARITY_THRESHOLD
+        )
+    return _response_cache
+
+
+class CurationResultCache:
+    """
+    Persistent cache of news curation results with shared hit/miss counters.
+    
+    Counters live in Redis so the numbers add up across Celery workers.
+    """
+    
+    HITS_KEY = 'chatbot:curation-cache:hits'
+    MISSES_KEY = 'chatbot:curation-cache:misses'
+    
+    def get_many(self, content_hashes: Iterable[str], prompt_version: str, model: str) -> Dict[str, Dict]:
+        """Cached results by content hash; hashes without a result are left out"""
+        from .models import CurationResult
+        
+        content_hashes = set(content_hashes)
+        if not content_hashes:
+            return {}
+        
+        found = dict(
+            CurationResult.objects.filter(
+                content_hash__in=content_hashes,
+                prompt_version=prompt_version,
+                model=model
+            ).values_list('content_hash', 'result')
+        )
+        self._count(len(found), len(content_hashes) - len(found))
+        return found
+    
+    def set_many(self, results: Dict[str, Dict], prompt_version: str, model: str):
+        from .models import CurationResult
+        
+        if not results:
+            return
+        CurationResult.objects.bulk_create(
+            [
+                CurationResult(content_hash=content_hash, prompt_version=prompt_version, model=model, result=result)
+                for content_hash, result in results.items()
+            ],
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['content_hash', 'prompt_version', 'model'],
+            update_fields=['result']
+        )
+    
+    def _count(self, hits: int, misses: int):
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            if hits:
+                pipe.incrby(self.HITS_KEY, hits)
+            if misses:
+                pipe.incrby(self.MISSES_KEY, misses)
+            pipe.execute()
+        except redis.RedisError:
+            pass
+    
+    def stats(self) -> Dict:
+        try:
+            hits, misses = (int(value or 0) for value in get_redis().mget(self.HITS_KEY, self.MISSES_KEY))
+        except redis.RedisError:
+            hits = misses = 0
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+curation_cache = CurationResultCache()
@@ -0,0 +1,186 @@
+import asyncio
+import json
+import time
+from channels.generic.websocket import AsyncWebsocketConsumer
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+
+from .context import ConversationContextService, user_context_snapshots
+from .ratelimit import chat_rate_limiter
+from .services import GeminiChatbotService, ChatSessionService
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ChatConsumer(AsyncWebsocketConsumer):
+    """
+    WebSocket consumer for token-streamed chatbot replies
+    """
+    
+    # Persist the partial assistant message at most this often while streaming
+    PERSIST_INTERVAL = 0.5
+    
+    async def connect(self):
+        """Handle WebSocket connection"""
+        # Resolved by JWTAuthMiddleware from the token query parameter
+        self.user = self.scope.get('user')
+        
+        if self.user is None or not self.user.is_authenticated:
+            await self.close()
+            return
+        
+        self.chatbot = GeminiChatbotService()
+        self.sessions = ChatSessionService()
+        self.conversation = ConversationContextService()
+        await self.accept()
+    
+    async def receive(self, text_data):
+        """Handle messages from WebSocket client"""
+        try:
+            data = json.loads(text_data)
+        except json.JSONDecodeError:
+            await self.send_json({'type': 'error', 'message': 'Invalid JSON format'})
+            return
+        
+        message_type = data.get('type')
+        
+        if message_type == 'chat_message':
+            await self.handle_chat_message(data)
+        
+        elif message_type == 'ping':
+            await self.send_json({'type': 'pong', 'timestamp': data.get('timestamp')})
+    
+    async def handle_chat_message(self, data):
+        """Stream a reply to a user message, persisting it as it grows"""
+        message_text = (data.get('message') or '').strip()
+        if not message_text:
+            await self.send_json({'type': 'error', 'message': 'Message is required'})
+            return
+        
+        allowed, retry_after = await sync_to_async(chat_rate_limiter.acquire)(self.user)
+        if not allowed:
+            await self.send_json({
+                'type': 'error',
+                'message': 'Rate limit exceeded',
+                'retry_after': round(retry_after, 1)
+            })
+            return
+        
+        session = await self.get_session(data.get('session_id'))
+        if session is None:
+            await self.send_json({'type': 'error', 'message': 'Session not found'})
+            return
+        
+        started = time.perf_counter()
+        history = await self.get_history(session)
+        user_message = await self.add_message(session, 'USER', message_text)
+        bot_message = await self.add_message(session, 'ASSISTANT', '')
+        
+        await self.send_json({
+            'type': 'chat_started',
+            'session_id': session.session_id,
+            'user_message_id': user_message.id,
+            'message_id': bot_message.id,
+        })
+        
+        content = ''
+        usage = {}
+        try:
+            persisted_at = time.perf_counter()
+            user_context = await self.get_user_context()
+            async for chunk in self.chatbot.astream_response(
+                message_text,
+                user_context,
+                history,
+                usage
+            ):
+                content += chunk
+                await self.send_json({
+                    'type': 'chat_token',
+                    'message_id': bot_message.id,
+                    'delta': chunk,
+                })
+                
+                if time.perf_counter() - persisted_at >= self.PERSIST_INTERVAL:
+                    await self.update_message(bot_message, content)
+                    persisted_at = time.perf_counter()
+            
+            response_time = round(time.perf_counter() - started, 2)
+            tokens_used = usage.get('tokens_used', 0)
+            await self.finish_message(session, bot_message, content, tokens_used, response_time)
+        except asyncio.CancelledError:
+            await self.abandon_message(session, bot_message, content, usage, started)
+            raise
+        except Exception as e:
+            logger.error(f"Error streaming chat reply: {e}")
+            await self.abandon_message(session, bot_message, content, usage, started)
+            await self.send_json({
+                'type': 'error',
+                'message_id': bot_message.id,
+                'message': 'The reply could not be completed',
+            })
+            return
+        
+        try:
+            await sync_to_async(chat_rate_limiter.record_usage)(self.user, tokens_used)
+            await self.record_turn(session, message_text, content)
+        except Exception as e:
+            logger.error(f"Error recording chat turn: {e}")
+        
+        await self.send_json({
+            'type': 'chat_complete',
+            'message_id': bot_message.id,
+            'content': content,
+            'tokens_used': tokens_used,
+            'response_time': response_time,
+        })
+    
+    async def abandon_message(self, session, bot_message, content, usage, started):
+        """Keep what was streamed of a failed reply, or remove its empty placeholder"""
+        try:
+            if content:
+                response_time = round(time.perf_counter() - started, 2)
+                await self.finish_message(session, bot_message, content, usage.get('tokens_used', 0), response_time)
+            else:
+                await self.discard_message(session, bot_message)
+        except Exception as e:
+            logger.error(f"Error cleaning up chat message {bot_message.id}: {e}")
+    
+    async def send_json(self, content):
+        await self.send(text_data=json.dumps(content))
+    
+    @database_sync_to_async
+    def get_user_context(self):
+        return user_context_snapshots.get_prompt_context(self.user)
+    
+    @database_sync_to_async
+    def get_history(self, session):
+        return self.conversation.format_history(
+            self.conversation.get_window(session.session_id)
+        )
+    
+    @database_sync_to_async
+    def record_turn(self, session, user_content, assistant_content):
+        self.conversation.record(session.session_id, 'USER', user_content)
+        self.conversation.record(session.session_id, 'ASSISTANT', assistant_content)
+    
+    @database_sync_to_async
+    def get_session(self, session_id):
+        return self.sessions.get_or_create_session(self.user, session_id)
+    
+    @database_sync_to_async
+    def add_message(self, session, role, content):
+        return self.sessions.add_message(session, role, content)
+    
+    @database_sync_to_async
+    def update_message(self, chat_message, content, tokens_used=None, response_time=None):
+        self.sessions.update_message(chat_message, content, tokens_used, response_time)
+    
+    @database_sync_to_async
+    def finish_message(self, session, chat_message, content, tokens_used, response_time):
+        self.sessions.finish_message(session, chat_message, content, tokens_used, response_time)
+    
+    @database_sync_to_async
+    def discard_message(self, session, chat_message):
+        self.sessions.discard_message(session, chat_message)
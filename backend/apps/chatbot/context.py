@@ -0,0 +1,241 @@
+"""
+Prompt context assembly for chat sessions.
+"""
+import math
+import re
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Sum
+from django.utils import timezone
+from typing import Dict, List, Optional
+
+from .models import ChatMessage, ChatbotConfig
+
+User = get_user_model()
+
+SENTENCE_END = re.compile(r'(?<=[.!?])\s')
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate model tokens (~4 characters per token for English text)"""
+    return max(1, math.ceil(len(text) / 4)) if text else 0
+
+
+class ConversationContextService:
+    """
+    Keep a rolling, token-bounded window of recent turns per chat session.
+    
+    The window lives in the cache and is updated as messages are recorded,
+    so a turn normally reads no chat history from the database. Turns that
+    fall out of the token budget are folded into a short running summary,
+    which is itself capped. On a cache miss the window is rebuilt from the
+    last ``REBUILD_LIMIT`` messages only.
+    """
+    
+    KEY_TEMPLATE = 'chatbot:context:{session_id}'
+    TIMEOUT = 60 * 60 * 6
+    REBUILD_LIMIT = 50
+    ROLE_LABELS = {'USER': 'User', 'ASSISTANT': 'Assistant', 'SYSTEM': 'System'}
+    
+    def __init__(self):
+        self.max_tokens = settings.CHATBOT_CONTEXT_MAX_TOKENS
+        self.summary_max_tokens = settings.CHATBOT_CONTEXT_SUMMARY_MAX_TOKENS
+    
+    def _key(self, session_id: str) -> str:
+        return self.KEY_TEMPLATE.format(session_id=session_id)
+    
+    def get_window(self, session_id: str) -> Dict:
+        """Return ``{'summary': str, 'turns': [{'role', 'content', 'tokens'}]}`` for a session"""
+        state = cache.get(self._key(session_id))
+        if state is None:
+            state = self._rebuild(session_id)
+            cache.set(self._key(session_id), state, self.TIMEOUT)
+        return state
+    
+    def record(self, session_id: str, role: str, content: str):
+        """Append a finished message to the cached window, if there is one"""
+        if not content:
+            return
+        
+        state = cache.get(self._key(session_id))
+        if state is None:
+            # Rebuilt lazily from the database on the next read
+            return
+        
+        self._append(state, role, content)
+        cache.set(self._key(session_id), state, self.TIMEOUT)
+    
+    def format_history(self, window: Dict) -> str:
+        """Render a window as prompt text"""
+        parts = []
+        if window['summary']:
+            parts.append(f"Summary of earlier conversation:\n{window['summary']}")
+        if window['turns']:
+            parts.append('\n'.join(
+                f"{self.ROLE_LABELS.get(turn['role'], turn['role'])}: {turn['content']}"
+                for turn in window['turns']
+            ))
+        return '\n\n'.join(parts)
+    
+    def _rebuild(self, session_id: str) -> Dict:
+        recent = list(
+            ChatMessage.objects.filter(session_id=session_id)
+            .exclude(content='')
+            .order_by('-id')
+            .values_list('role', 'content')[:self.REBUILD_LIMIT]
+        )
+        state = {'summary': '', 'summary_lines': [], 'turns': [], 'tokens': 0}
+        for role, content in reversed(recent):
+            self._append(state, role, content)
+        return state
+    
+    def _append(self, state: Dict, role: str, content: str):
+        tokens = estimate_tokens(content)
+        state['turns'].append({'role': role, 'content': content, 'tokens': tokens})
+        state['tokens'] += tokens
+        
+        # Keep at least the latest turn even if it alone exceeds the budget
+        while state['tokens'] > self.max_tokens and len(state['turns']) > 1:
+            evicted = state['turns'].pop(0)
+            state['tokens'] -= evicted['tokens']
+            self._summarize(state, evicted)
+    
+    def _summarize(self, state: Dict, turn: Dict):
+        first_sentence = SENTENCE_END.split(turn['content'].strip(), 1)[0][:160]
+        label = self.ROLE_LABELS.get(turn['role'], turn['role'])
+        lines: List[str] = state['summary_lines']
+        lines.append(f"- {label}: {first_sentence}")
+        
+        while sum(estimate_tokens(line) for line in lines) > self.summary_max_tokens and len(lines) > 1:
+            lines.pop(0)
+        state['summary'] = '\n'.join(lines)
+
+
+class UserContextSnapshotService:
+    """
+    Precomputed per-user context injected into chatbot prompts.
+    
+    Snapshots are rebuilt in the background when the underlying data changes
+    (see ``signals``). The global climate snapshot and the active
+    ChatbotConfig flags are cached the same way, and the chat path reads all
+    three with a single ``get_many``.
+    """
+    
+    USER_KEY_TEMPLATE = 'chatbot:user-context:{user_id}'
+    PENDING_KEY_TEMPLATE = 'chatbot:user-context-pending:{user_id}'
+    CLIMATE_KEY = 'chatbot:climate-context'
+    CONFIG_KEY = 'chatbot:config-flags'
+    TIMEOUT = 60 * 60 * 24
+    CONFIG_TIMEOUT = 60 * 5
+    REFRESH_DELAY = 5  # seconds; coalesces bursts of changes into one rebuild
+    
+    def get_prompt_context(self, user) -> Dict:
+        """Return the context dict for a user's next prompt"""
+        user_key = self.USER_KEY_TEMPLATE.format(user_id=user.id)
+        cached = cache.get_many([self.CONFIG_KEY, user_key, self.CLIMATE_KEY])
+        
+        flags = cached.get(self.CONFIG_KEY) or self._get_config_flags()
+        context = {'role': user.role}
+        
+        if flags['include_user_data']:
+            user_snapshot = cached.get(user_key)
+            if user_snapshot is None:
+                user_snapshot = self.refresh_user_snapshot(user.id)
+            context.update(user_snapshot)
+        if flags['include_climate_data']:
+            climate_snapshot = cached.get(self.CLIMATE_KEY)
+            if climate_snapshot is None:
+                climate_snapshot = self.refresh_climate_snapshot()
+            context['climate'] = climate_snapshot
+        return context
+    
+    def get_user_snapshot(self, user_id: int) -> Dict:
+        snapshot = cache.get(self.USER_KEY_TEMPLATE.format(user_id=user_id))
+        if snapshot is None:
+            snapshot = self.refresh_user_snapshot(user_id)
+        return snapshot
+    
+    def get_climate_snapshot(self) -> Dict:
+        snapshot = cache.get(self.CLIMATE_KEY)
+        if snapshot is None:
+            snapshot = self.refresh_climate_snapshot()
+        return snapshot
+    
+    def schedule_user_refresh(self, user_id: int):
+        """Queue a rebuild unless one is already pending for this user"""
+        if cache.add(self.PENDING_KEY_TEMPLATE.format(user_id=user_id), 1, self.REFRESH_DELAY * 6):
+            from .tasks import refresh_user_chat_context
+            refresh_user_chat_context.apply_async((user_id,), countdown=self.REFRESH_DELAY)
+    
+    def refresh_user_snapshot(self, user_id: int) -> Dict:
+        from apps.carbon.models import CarbonEntry
+        from apps.gamification.models import UserChallenge
+        
+        cache.delete(self.PENDING_KEY_TEMPLATE.format(user_id=user_id))
+        
+        user = User.objects.filter(id=user_id).values('location', 'total_points').first() or {}
+        today = timezone.now().date()
+        
+        entries = CarbonEntry.objects.filter(user_id=user_id)
+        recent_total = entries.filter(
+            date__gte=today - timedelta(days=30)
+        ).aggregate(total=Sum('co2_calculated'))['total'] or 0
+        top_categories = (
+            entries.filter(date__year=today.year)
+            .order_by()
+            .values('category', 'subcategory')
+            .annotate(total=Sum('co2_calculated'))
+            .order_by('-total')[:3]
+        )
+        active_challenges = UserChallenge.objects.filter(
+            user_id=user_id
+        ).exclude(
+            status__in=['COMPLETED', 'FAILED']
+        ).values_list('challenge__name', flat=True)[:5]
+        
+        snapshot = {
+            'location': user.get('location', ''),
+            'total_points': user.get('total_points', 0),
+            'carbon_data': round(float(recent_total), 1),
+            'top_categories': [
+                {
+                    'category': row['category'],
+                    'subcategory': row['subcategory'],
+                    'co2': round(float(row['total']), 1)
+                } for row in top_categories
+            ],
+            'active_challenges': list(active_challenges),
+        }
+        cache.set(self.USER_KEY_TEMPLATE.format(user_id=user_id), snapshot, self.TIMEOUT)
+        return snapshot
+    
+    def refresh_climate_snapshot(self) -> Dict:
+        from apps.climate_data.models import ClimateStatistics
+        
+        snapshot = {}
+        for stat_type in ['GLOBAL_CO2', 'GLOBAL_TEMP', 'ARCTIC_ICE_EXTENT', 'SEA_LEVEL_RISE']:
+            latest = ClimateStatistics.objects.filter(stat_type=stat_type).order_by('-date').first()
+            if latest:
+                snapshot[latest.get_stat_type_display()] = f'{latest.current_value} {latest.unit}'
+        
+        cache.set(self.CLIMATE_KEY, snapshot, self.TIMEOUT)
+        return snapshot
+    
+    def invalidate_config(self):
+        cache.delete(self.CONFIG_KEY)
+    
+    def _get_config_flags(self) -> Dict:
+        flags = cache.get(self.CONFIG_KEY)
+        if flags is None:
+            config: Optional[ChatbotConfig] = ChatbotConfig.objects.filter(is_active=True).first()
+            flags = {
+                'include_user_data': config.include_user_data if config else True,
+                'include_climate_data': config.include_climate_data if config else True,
+            }
+            cache.set(self.CONFIG_KEY, flags, self.CONFIG_TIMEOUT)
+        return flags
+
+
+user_context_snapshots = UserContextSnapshotService()
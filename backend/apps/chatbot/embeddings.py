@@ -0,0 +1,58 @@
+"""
+Lightweight local text embeddings.
+
+Texts are embedded with the hashing trick over word unigrams and bigrams
+into a fixed-size, L2-normalised vector, so similarity is a dot product and
+no model or network call is needed.
+"""
+import re
+import zlib
+from typing import Iterable, List
+
+import numpy as np
+
+DEFAULT_DIMENSIONS = 256
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+STOPWORDS = frozenset([
+    'a', 'an', 'and', 'are', 'can', 'do', 'does', 'for', 'how', 'i', 'in',
+    'is', 'it', 'me', 'my', 'of', 'on', 'or', 'the', 'to', 'what', 'with', 'you',
+])
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase and collapse punctuation/whitespace"""
+    return ' '.join(TOKEN_PATTERN.findall(text.lower()))
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def _features(tokens: List[str]) -> Iterable[str]:
+    yield from tokens
+    for first, second in zip(tokens, tokens[1:]):
+        yield f'{first} {second}'
+
+
+def embed(text: str, dimensions: int = DEFAULT_DIMENSIONS) -> np.ndarray:
+    """Embed one text as a unit-length float32 vector (all zeros for empty text)"""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for feature in _features(tokenize(text)):
+        digest = zlib.crc32(feature.encode('utf-8'))
+        sign = 1.0 if digest & 0x80000000 else -1.0
+        vector[digest % dimensions] += sign
+    
+    norm = np.linalg.norm(vector)
+    if norm:
+        vector /= norm
+    return vector
+
+
+def embed_many(texts: Iterable[str], dimensions: int = DEFAULT_DIMENSIONS) -> np.ndarray:
+    texts = list(texts)
+    matrix = np.zeros((len(texts), dimensions), dtype=np.float32)
+    for row, text in enumerate(texts):
+        matrix[row] = embed(text, dimensions)
+    return matrix
@@ -0,0 +1,138 @@
+"""
+Keyword intent matching for the offline chatbot and news categorization.
+
+Each ``IntentMatcher`` compiles all keywords of all intents into one
+Aho-Corasick automaton when it is built, so classifying a text is a single
+pass over its characters no matter how many intents or keywords exist.
+Keywords must start on a word boundary but may be followed by a suffix
+("flood" matches "floods" and "flooding"). Every match adds the keyword's
+weight to its intent; the highest score wins and ties go to the intent
+declared first.
+"""
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class AhoCorasick:
+    """Multi-pattern string matcher; patterns map to arbitrary payloads"""
+    
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, object]]] = [[]]
+        self._built = False
+    
+    def add(self, pattern: str, payload):
+        if self._built:
+            raise RuntimeError('Cannot add patterns after the automaton is built')
+        
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append((len(pattern), payload))
+    
+    def build(self):
+        """Compute failure links breadth-first and merge outputs along them"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+        self._built = True
+        return self
+    
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, object]]:
+        """Yield ``(start, payload)`` for every pattern occurrence in ``text``"""
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, payload in output[state]:
+                yield index - length + 1, payload
+
+
+class IntentMatcher:
+    """
+    Weighted keyword classifier over a fixed set of intents.
+    
+    ``intents`` maps an intent name to ``{keyword: weight}``; declaration
+    order breaks ties.
+    """
+    
+    def __init__(self, intents: Dict[str, Dict[str, float]]):
+        self.priorities = {intent: priority for priority, intent in enumerate(intents)}
+        self._automaton = AhoCorasick()
+        for intent, keywords in intents.items():
+            for keyword, weight in keywords.items():
+                self._automaton.add(keyword.lower(), (intent, weight))
+        self._automaton.build()
+    
+    def scores(self, text: str) -> Dict[str, float]:
+        text = text.lower()
+        scores = {}
+        for start, (intent, weight) in self._automaton.iter_matches(text):
+            if start and text[start - 1].isalnum():
+                continue
+            scores[intent] = scores.get(intent, 0) + weight
+        return scores
+    
+    def match(self, text: str) -> Optional[str]:
+        """Return the best scoring intent, or None when no keyword occurs"""
+        scores = self.scores(text)
+        if not scores:
+            return None
+        return min(scores, key=lambda intent: (-scores[intent], self.priorities[intent]))
+
+
+# Intent -> keyword weights for the offline chatbot. Specific features outweigh
+# generic topics so "carbon calculator" is answered as a calculator question.
+CHATBOT_INTENTS = {
+    'calculator': {'calculator': 3, 'calculate': 2, 'track my emissions': 2},
+    'challenge': {'challenge': 3, 'points': 1, 'leaderboard': 2, 'achievement': 1, 'badge': 1},
+    'news': {'news': 3, 'article': 2, 'headline': 2, 'latest': 1},
+    'carbon': {'carbon': 2, 'co2': 2, 'emission': 2, 'footprint': 2, 'reduce': 1},
+    'help': {'help': 1, 'how do i': 1, 'what can you': 1},
+}
+
+CHATBOT_RESPONSES = {
+    'carbon': "I can help you understand carbon footprints! Try using our carbon calculator to track your emissions across different categories like transportation and energy use.",
+    'calculator': "The carbon calculator helps you track emissions from electricity, water, gas, waste, and transportation. You can find it in the main navigation.",
+    'challenge': "Check out our challenges section to join community initiatives and earn points for sustainable actions!",
+    'news': "Visit our news section for the latest climate science and environmental updates, curated and summarized for easy reading.",
+    'help': "I'm here to help with climate questions, carbon reduction tips, and navigating EcoSphere. What would you like to know?",
+    'default': "I'm the EcoSphere Assistant! I can help you with climate information, carbon reduction tips, and guide you through our platform features. How can I assist you today?"
+}
+
+# News category -> keyword weights, ordered by precedence of the old if/elif chain
+NEWS_CATEGORY_KEYWORDS = {
+    'POLICY': {'policy': 2, 'government': 2, 'regulation': 2, 'agreement': 2, 'legislation': 2, 'treaty': 2},
+    'SCIENCE': {'research': 2, 'study': 2, 'scientific': 2, 'scientist': 2, 'data': 1},
+    'DISASTERS': {'disaster': 2, 'hurricane': 2, 'flood': 2, 'drought': 2, 'wildfire': 2, 'fire': 1, 'heatwave': 2},
+    'SOLUTIONS': {'solution': 2, 'technology': 2, 'renewable': 2, 'innovation': 2, 'solar': 1, 'wind power': 1},
+    'LOCAL': {'local': 2, 'city': 1, 'regional': 2, 'community': 1},
+}
+
+
+@lru_cache(maxsize=None)
+def get_chatbot_intents() -> IntentMatcher:
+    return IntentMatcher(CHATBOT_INTENTS)
+
+
+@lru_cache(maxsize=None)
+def get_news_categorizer() -> IntentMatcher:
+    return IntentMatcher(NEWS_CATEGORY_KEYWORDS)
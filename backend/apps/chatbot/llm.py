@@ -0,0 +1,351 @@
+"""
+Shared client for large language model calls.
+
+Every caller (chatbot, news curation) goes through one process-wide
+``LLMClient``. Calls run on a bounded worker pool so a slow model can never
+tie up more than ``LLM_MAX_CONCURRENCY`` threads, each call has a deadline,
+transient failures are retried with jittered exponential backoff, and a
+circuit breaker short-circuits calls while the backend is failing. A call
+that misses its deadline keeps its worker slot until the backend actually
+returns, so new calls wait for a free thread rather than queueing behind
+abandoned ones.
+"""
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Iterator, Optional
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .context import estimate_tokens
+import logging
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_API_KEYS = ('', 'your-gemini-api-key', 'your-gemini-api-key-here')
+
+
+class LLMError(Exception):
+    """Raised when a model call fails after retries"""
+
+
+class LLMUnavailable(LLMError):
+    """Raised when no backend is configured or the circuit is open"""
+
+
+class LLMTimeout(LLMError):
+    """Raised when a call misses its deadline"""
+
+
+class GeminiBackend:
+    """Backend for Google Gemini; one model object is shared by all calls"""
+    
+    name = 'gemini'
+    
+    def __init__(self, model_name: str = 'gemini-pro'):
+        import google.generativeai as genai
+        
+        api_key = settings.GEMINI_API_KEY
+        if api_key in PLACEHOLDER_API_KEYS:
+            raise LLMUnavailable('Gemini API key not configured')
+        
+        if settings.GEMINI_API_ENDPOINT:
+            # Local or fake model servers only speak REST
+            genai.configure(
+                api_key=api_key,
+                transport='rest',
+                client_options={'api_endpoint': settings.GEMINI_API_ENDPOINT}
+            )
+        else:
+            genai.configure(api_key=api_key)
+        
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+    
+    def generate(self, prompt: str) -> Dict:
+        response = self.model.generate_content(prompt)
+        # Newer SDKs report usage; older ones leave it to the client to estimate
+        usage = getattr(response, 'usage_metadata', None)
+        return {
+            'text': response.text,
+            'prompt_tokens': getattr(usage, 'prompt_token_count', None),
+            'completion_tokens': getattr(usage, 'candidates_token_count', None),
+        }
+    
+    def stream(self, prompt: str) -> Iterator[str]:
+        for chunk in self.model.generate_content(prompt, stream=True):
+            if chunk.text:
+                yield chunk.text
+
+
+class StubBackend:
+    """
+    Offline backend for development and tests.
+    
+    ``responder`` maps a prompt to the response text; the default returns a
+    fixed acknowledgement so callers exercise their full code path.
+    """
+    
+    name = 'stub'
+    model_name = 'stub'
+    
+    def __init__(self, responder: Optional[Callable[[str], str]] = None):
+        self.responder = responder or (lambda prompt: 'This is a response from the local stub model.')
+    
+    def generate(self, prompt: str) -> Dict:
+        return {'text': self.responder(prompt), 'prompt_tokens': None, 'completion_tokens': None}
+    
+    def stream(self, prompt: str) -> Iterator[str]:
+        words = self.responder(prompt).split(' ')
+        for index, word in enumerate(words):
+            yield word if index == len(words) - 1 else word + ' '
+
+
+BACKENDS = {
+    'gemini': GeminiBackend,
+    'stub': StubBackend,
+}
+
+
+class CircuitBreaker:
+    """
+    Opens after consecutive failures; after a cool-down, a single trial call
+    is let through (half-open) and its outcome closes or re-opens the circuit
+    """
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probe_started = None
+        self._lock = threading.Lock()
+    
+    def _probe_due(self, now: float) -> bool:
+        # A trial that never reported back (e.g. it gave up before calling the
+        # backend) stops blocking new trials after another cool-down
+        return (
+            now - self._opened_at >= self.reset_timeout
+            and (self._probe_started is None or now - self._probe_started >= self.reset_timeout)
+        )
+    
+    @property
+    def is_open(self) -> bool:
+        """True while calls are refused (a trial call being due counts as closed)"""
+        with self._lock:
+            return self._opened_at is not None and not self._probe_due(time.monotonic())
+    
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            if self._probe_due(now):
+                self._probe_started = now
+                return True
+            return False
+    
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_started = None
+    
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probe_started is not None:
+                # The trial call failed: stay open for another cool-down
+                self._opened_at = time.monotonic()
+                self._probe_started = None
+            elif self._failures >= self.failure_threshold and self._opened_at is None:
+                self._opened_at = time.monotonic()
+                logger.warning("LLM circuit breaker opened")
+
+
+class LLMClient:
+    """Concurrency-limited, deadline-bound, retrying client around a backend"""
+    
+    SLOT_POLL_INTERVAL = 0.05  # seconds between checks for a free worker
+    
+    def __init__(self, backend=None, max_concurrency: int = 8, timeout: float = 20.0,
+                 max_retries: int = 2, backoff_base: float = 0.5, backoff_max: float = 5.0,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.backend = backend
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix='llm'
+        )
+        # Held from submission until the worker thread finishes, even if the
+        # caller stopped waiting, so it counts threads actually in use
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+    
+    @property
+    def available(self) -> bool:
+        return self.backend is not None and not self.breaker.is_open
+    
+    @property
+    def model_name(self) -> str:
+        return getattr(self.backend, 'model_name', '') if self.backend else ''
+    
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(delay / 2, delay)
+    
+    def _check_available(self):
+        if self.backend is None:
+            raise LLMUnavailable('No LLM backend configured')
+        if not self.breaker.allow():
+            raise LLMUnavailable('LLM circuit breaker is open')
+    
+    async def _run(self, deadline: float, func, *args):
+        """Run ``func`` on a worker thread, waiting for a free slot until ``deadline``"""
+        loop = asyncio.get_running_loop()
+        while not self._slots.acquire(blocking=False):
+            if loop.time() >= deadline:
+                raise LLMTimeout('No LLM worker became free before the deadline')
+            await asyncio.sleep(self.SLOT_POLL_INTERVAL)
+        
+        def call():
+            try:
+                return func(*args)
+            finally:
+                self._slots.release()
+        
+        try:
+            future = loop.run_in_executor(self._executor, call)
+        except BaseException:
+            self._slots.release()
+            raise
+        return await asyncio.wait_for(future, max(deadline - loop.time(), 0))
+    
+    @staticmethod
+    def account(prompt: str, result: Dict) -> Dict:
+        """Fill in token counts the backend did not report and total them"""
+        if result.get('prompt_tokens') is None:
+            result['prompt_tokens'] = estimate_tokens(prompt)
+        if result.get('completion_tokens') is None:
+            result['completion_tokens'] = estimate_tokens(result['text'])
+        result['tokens_used'] = result['prompt_tokens'] + result['completion_tokens']
+        return result
+    
+    async def agenerate(self, prompt: str, timeout: Optional[float] = None) -> Dict:
+        """
+        Generate a completion.
+        
+        Returns ``text``, ``prompt_tokens``, ``completion_tokens`` and their
+        sum ``tokens_used``; counts the backend does not report are estimated.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout)
+        last_error = None
+        
+        for attempt in range(self.max_retries + 1):
+            self._check_available()
+            
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            
+            try:
+                result = await self._run(deadline, self.backend.generate, prompt)
+                self.breaker.record_success()
+                return self.account(prompt, result)
+            except asyncio.TimeoutError:
+                self.breaker.record_failure()
+                raise LLMTimeout(f'LLM call exceeded {timeout or self.timeout:.1f}s deadline')
+            except LLMError:
+                raise
+            except Exception as e:
+                self.breaker.record_failure()
+                last_error = e
+                logger.warning(f"LLM call failed (attempt {attempt + 1}): {e}")
+            
+            delay = self._backoff(attempt)
+            if attempt == self.max_retries or loop.time() + delay >= deadline:
+                break
+            await asyncio.sleep(delay)
+        
+        raise LLMError(f'LLM call failed: {last_error}') from last_error
+    
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> Dict:
+        """Blocking wrapper around ``agenerate`` for sync callers"""
+        return async_to_sync(self.agenerate)(prompt, timeout)
+    
+    async def astream(self, prompt: str, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Stream a completion chunk by chunk.
+        
+        ``timeout`` bounds the wait for each chunk. Streams are not retried
+        once the first chunk has been delivered.
+        """
+        self._check_available()
+        loop = asyncio.get_running_loop()
+        timeout = timeout or self.timeout
+        
+        def next_chunk(iterator):
+            return next(iterator, None)
+        
+        try:
+            iterator = await self._run(loop.time() + timeout, self.backend.stream, prompt)
+            while True:
+                chunk = await self._run(loop.time() + timeout, next_chunk, iterator)
+                if chunk is None:
+                    break
+                yield chunk
+        except asyncio.TimeoutError:
+            self.breaker.record_failure()
+            raise LLMTimeout(f'LLM stream stalled for more than {timeout:.1f}s')
+        except LLMError:
+            raise
+        except Exception as e:
+            self.breaker.record_failure()
+            raise LLMError(f'LLM stream failed: {e}') from e
+        
+        self.breaker.record_success()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def build_backend():
+    """Instantiate the backend named by LLM_BACKEND (a registered name or dotted path)"""
+    backend_name = settings.LLM_BACKEND
+    backend_class = BACKENDS.get(backend_name) or import_string(backend_name)
+    
+    try:
+        if backend_class is GeminiBackend:
+            return backend_class(settings.LLM_MODEL)
+        return backend_class()
+    except LLMUnavailable as e:
+        logger.warning(f"{e}, model calls will use fallback responses")
+        return None
+
+
+def get_llm_client() -> LLMClient:
+    """Return the process-wide LLM client, building it on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LLMClient(
+                    backend=build_backend(),
+                    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+                    timeout=settings.LLM_TIMEOUT,
+                    max_retries=settings.LLM_MAX_RETRIES,
+                    breaker=CircuitBreaker(
+                        failure_threshold=settings.LLM_CIRCUIT_FAILURE_THRESHOLD,
+                        reset_timeout=settings.LLM_CIRCUIT_RESET_TIMEOUT
+                    )
+                )
+    return _client
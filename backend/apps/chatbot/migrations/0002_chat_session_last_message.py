@@ -0,0 +1,59 @@
+# Generated by Django 5.0.6 on 2026-10-19 10:04
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Exists, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Left
+
+
+def backfill_last_message(apps, schema_editor):
+    ChatMessage = apps.get_model('chatbot', 'ChatMessage')
+    ChatSession = apps.get_model('chatbot', 'ChatSession')
+    
+    messages = ChatMessage.objects.filter(session_id=OuterRef('session_id'))
+    latest = messages.order_by('-created_at', '-id')
+    totals = messages.order_by().values('session_id')
+    # Sessions without messages keep the field defaults
+    ChatSession.objects.filter(Exists(messages)).update(
+        last_message_preview=Subquery(latest.annotate(preview=Left('content', 200)).values('preview')[:1]),
+        last_message_role=Subquery(latest.values('role')[:1]),
+        last_message_at=Subquery(latest.values('created_at')[:1]),
+        message_count=Subquery(totals.annotate(count=Count('id')).values('count')),
+        total_tokens=Subquery(
+            totals.annotate(tokens=Coalesce(Sum('tokens_used'), Value(0), output_field=IntegerField())).values('tokens')
+        )
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatsession',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, help_text='When the most recent message was sent', null=True),
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='last_message_preview',
+            field=models.CharField(blank=True, help_text='Start of the most recent message', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='last_message_role',
+            field=models.CharField(blank=True, help_text='Role of the most recent message', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['session_id', 'created_at', 'id'], name='chat_msg_session_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatsession',
+            index=models.Index(fields=['user', '-last_activity', '-id'], name='chat_session_user_activity_idx'),
+        ),
+        migrations.RunPython(backfill_last_message, migrations.RunPython.noop),
+    ]
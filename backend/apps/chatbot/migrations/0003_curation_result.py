@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-19 10:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0002_chat_session_last_message'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CurationResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(help_text='SHA-256 of the normalized title and content', max_length=64)),
+                ('prompt_version', models.CharField(help_text='Version of the prompt that produced the result', max_length=50)),
+                ('model', models.CharField(help_text='Model that produced the result', max_length=100)),
+                ('result', models.JSONField(help_text='Parsed model output (summary and/or category)')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Curation Result',
+                'verbose_name_plural': 'Curation Results',
+                'db_table': 'chatbot_curation_results',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='curationresult',
+            constraint=models.UniqueConstraint(fields=('content_hash', 'prompt_version', 'model'), name='curation_result_key_uniq'),
+        ),
+    ]
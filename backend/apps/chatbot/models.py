@@ -56,6 +56,9 @@ class ChatMessage(models.Model):
         verbose_name = 'Chat Message'
         verbose_name_plural = 'Chat Messages'
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['session_id', 'created_at', 'id'], name='chat_msg_session_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.role}: {self.content[:50]}..."
@@ -93,6 +96,24 @@ class ChatSession(models.Model):
         help_text='Total tokens used in session'
     )
     
+    last_message_preview = models.CharField(
+        max_length=200,
+        blank=True,
+        help_text='Start of the most recent message'
+    )
+    
+    last_message_role = models.CharField(
+        max_length=20,
+        blank=True,
+        help_text='Role of the most recent message'
+    )
+    
+    last_message_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text='When the most recent message was sent'
+    )
+    
     is_active = models.BooleanField(
         default=True,
         help_text='Whether session is active'
@@ -107,6 +128,9 @@ class ChatSession(models.Model):
         verbose_name = 'Chat Session'
         verbose_name_plural = 'Chat Sessions'
         ordering = ['-last_activity']
+        indexes = [
+            models.Index(fields=['user', '-last_activity', '-id'], name='chat_session_user_activity_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.session_id}"
@@ -163,3 +187,43 @@ class ChatbotConfig(models.Model):
     
     def __str__(self):
         return self.name
+
+
+class CurationResult(models.Model):
+    """
+    Cached model output for news curation (see apps.chatbot.cache.CurationResultCache)
+    """
+    content_hash = models.CharField(
+        max_length=64,
+        help_text='SHA-256 of the normalized title and content'
+    )
+    
+    prompt_version = models.CharField(
+        max_length=50,
+        help_text='Version of the prompt that produced the result'
+    )
+    
+    model = models.CharField(
+        max_length=100,
+        help_text='Model that produced the result'
+    )
+    
+    result = models.JSONField(
+        help_text='Parsed model output (summary and/or category)'
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'chatbot_curation_results'
+        verbose_name = 'Curation Result'
+        verbose_name_plural = 'Curation Results'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['content_hash', 'prompt_version', 'model'],
+                name='curation_result_key_uniq'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.content_hash[:12]} ({self.prompt_version}, {self.model})"
@@ -0,0 +1,17 @@
+from rest_framework.pagination import CursorPagination
+
+
+class ChatMessageCursorPagination(CursorPagination):
+    """Newest messages first; follow ``next`` to scroll back through a session"""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-created_at', '-id')
+
+
+class ChatSessionCursorPagination(CursorPagination):
+    """Most recently active sessions first, served from the (user, last_activity) index"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-last_activity', '-id')
@@ -0,0 +1,139 @@
+"""
+Per-user token-bucket rate limiting for chat.
+
+Each user has two buckets in Redis: one for requests and one for model
+tokens. Both are refilled continuously and updated by a single Lua script,
+so a check is one round trip and no database query. A request is admitted
+only if the request bucket has a token and the model token budget is not
+exhausted; the actual model tokens are debited after the reply, which may
+drive the budget negative and hold off further requests until it refills.
+Limits are per role (``CHATBOT_RATE_LIMITS``). If Redis is unreachable,
+requests are let through rather than failing chat entirely.
+"""
+import time
+from typing import Dict, List, Optional, Tuple
+
+import redis
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+from ecosphere.redis_client import get_redis
+import logging
+
+logger = logging.getLogger(__name__)
+
+# KEYS: bucket keys. ARGV: now, force, then (capacity, refill_per_second, cost)
+# per key. Unless forced, every bucket must hold max(cost, 1) for the call to
+# be admitted; admitted calls debit every bucket by its cost.
+# Returns {admitted, retry_after_seconds}.
+TOKEN_BUCKET_SCRIPT = """
+local now = tonumber(ARGV[1])
+local force = tonumber(ARGV[2]) == 1
+local levels = {}
+local retry_after = 0
+
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 3])
+    local rate = tonumber(ARGV[i * 3 + 1])
+    local cost = tonumber(ARGV[i * 3 + 2])
+    local state = redis.call('HMGET', key, 'level', 'updated')
+    local level = tonumber(state[1]) or capacity
+    local updated = tonumber(state[2]) or now
+    level = math.min(capacity, level + math.max(0, now - updated) * rate)
+    levels[i] = level
+    
+    local needed = math.max(cost, 1)
+    if level < needed then
+        retry_after = math.max(retry_after, (needed - level) / rate)
+    end
+end
+
+local admitted = force or retry_after == 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 3])
+    local rate = tonumber(ARGV[i * 3 + 1])
+    local level = levels[i]
+    if admitted then
+        level = level - tonumber(ARGV[i * 3 + 2])
+    end
+    redis.call('HSET', key, 'level', level, 'updated', now)
+    redis.call('EXPIRE', key, math.ceil((capacity - math.min(level, 0)) / rate) + 1)
+end
+
+if admitted then
+    return {1, '0'}
+end
+return {0, tostring(retry_after)}
+"""
+
+
+class ChatRateLimiter:
+    """Request and model-token buckets per user, sized by role"""
+    
+    KEY_TEMPLATE = 'chatbot:ratelimit:{user_id}:{bucket}'
+    
+    def __init__(self, limits: Optional[Dict] = None):
+        self.limits = limits if limits is not None else settings.CHATBOT_RATE_LIMITS
+        self._script = None
+    
+    def _run(self, keys: List[str], args: List, force: bool = False) -> Tuple[bool, float]:
+        client = get_redis()
+        if self._script is None:
+            self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+        admitted, retry_after = self._script(keys=keys, args=[time.time(), int(force)] + args, client=client)
+        return bool(admitted), float(retry_after)
+    
+    def _buckets(self, user) -> Optional[Dict]:
+        return self.limits.get(user.role, self.limits.get('default'))
+    
+    def acquire(self, user) -> Tuple[bool, float]:
+        """Admit one chat request; returns ``(allowed, retry_after_seconds)``"""
+        limits = self._buckets(user)
+        if not limits:
+            return True, 0.0
+        
+        try:
+            return self._run(
+                [
+                    self.KEY_TEMPLATE.format(user_id=user.pk, bucket='requests'),
+                    self.KEY_TEMPLATE.format(user_id=user.pk, bucket='tokens'),
+                ],
+                [
+                    limits['request_burst'], limits['requests_per_minute'] / 60, 1,
+                    limits['tokens_per_hour'], limits['tokens_per_hour'] / 3600, 0,
+                ]
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Chat rate limiter unavailable, allowing request: {e}")
+            return True, 0.0
+    
+    def record_usage(self, user, tokens: int):
+        """Debit model tokens spent on a reply from the user's budget"""
+        limits = self._buckets(user)
+        if not limits or not tokens:
+            return
+        
+        try:
+            self._run(
+                [self.KEY_TEMPLATE.format(user_id=user.pk, bucket='tokens')],
+                [limits['tokens_per_hour'], limits['tokens_per_hour'] / 3600, tokens],
+                force=True
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Could not record chat token usage: {e}")
+
+
+chat_rate_limiter = ChatRateLimiter()
+
+
+class ChatRateThrottle(BaseThrottle):
+    """DRF throttle backed by the shared chat token buckets"""
+    
+    def allow_request(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return True
+        allowed, self.retry_after = chat_rate_limiter.acquire(request.user)
+        return allowed
+    
+    def wait(self):
+        return self.retry_after
@@ -0,0 +1,281 @@
+"""
+Local retrieval over news articles and climate statistics.
+
+Passages are embedded with ``embeddings.embed`` and stored dimension-major
+(one contiguous row per hashed feature). Query vectors are sparse, so scoring
+only reads the rows for the query's non-zero features before ``argpartition``
+picks the top k; that keeps a 100k-passage search to a few milliseconds.
+Only vectors and ``(kind, object_id, chunk)`` references are kept in memory
+and on disk; passage text is re-derived from the database for the few hits a
+query returns.
+
+The index is persisted to ``CHATBOT_RETRIEVAL_INDEX_PATH`` by the Celery
+worker and reloaded by web processes when the file changes. New articles are
+appended incrementally after each news fetch; deleted articles drop out at
+query time and are purged by the periodic full rebuild.
+"""
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Max, Q
+
+from .embeddings import DEFAULT_DIMENSIONS, embed, embed_many
+import logging
+
+logger = logging.getLogger(__name__)
+
+ARTICLE = 0
+STATISTIC = 1
+
+CHUNK_WORDS = 120
+CHUNK_OVERLAP = 20
+
+
+def chunk_text(text: str, size: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Split text into overlapping word windows"""
+    words = text.split()
+    if len(words) <= size:
+        return [' '.join(words)] if words else []
+    step = size - overlap
+    return [' '.join(words[start:start + size]) for start in range(0, len(words) - overlap, step)]
+
+
+def article_passages(article) -> List[str]:
+    """Passages for an article; the title is repeated so every chunk carries the topic"""
+    return [f'{article.title}. {chunk}' for chunk in chunk_text(article.summary or article.content)] or [article.title]
+
+
+def statistic_passage(statistic) -> str:
+    text = (
+        f'{statistic.get_stat_type_display()} ({statistic.period}) was '
+        f'{statistic.current_value} {statistic.unit} on {statistic.date}'
+    )
+    if statistic.change_percentage is not None:
+        text += f', a change of {statistic.change_percentage}% from the previous period'
+    return f'{text}. Source: {statistic.source}.'
+
+
+class RetrievalIndex:
+    """In-memory passage index backed by an ``.npz`` file"""
+    
+    RELOAD_CHECK_INTERVAL = 30  # seconds between mtime checks in readers
+    
+    def __init__(self, path: Optional[str] = None, dimensions: int = DEFAULT_DIMENSIONS):
+        self.path = path
+        self.dimensions = dimensions
+        self._lock = threading.Lock()
+        self._loaded_mtime = None
+        self._checked_at = 0.0
+        self._reset()
+    
+    def _reset(self):
+        self.vectors = np.zeros((self.dimensions, 0), dtype=np.float32)
+        self.kinds = np.zeros(0, dtype=np.int8)
+        self.object_ids = np.zeros(0, dtype=np.int64)
+        self.chunks = np.zeros(0, dtype=np.int32)
+        self.last_article_id = 0
+    
+    def __len__(self):
+        return len(self.object_ids)
+    
+    # Persistence
+    
+    def load(self) -> bool:
+        if not self.path or not os.path.exists(self.path):
+            return False
+        
+        mtime = os.path.getmtime(self.path)
+        with np.load(self.path) as data:
+            vectors = data['vectors']
+            if vectors.shape[0] != self.dimensions:
+                logger.warning("Retrieval index dimensions changed, ignoring stale index")
+                return False
+            
+            with self._lock:
+                self.vectors = vectors
+                self.kinds = data['kinds']
+                self.object_ids = data['object_ids']
+                self.chunks = data['chunks']
+                self.last_article_id = int(data['last_article_id'])
+                self._loaded_mtime = mtime
+        return True
+    
+    def save(self):
+        """Write the index atomically so readers never see a partial file"""
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        
+        handle, tmp_path = tempfile.mkstemp(dir=directory, suffix='.npz')
+        try:
+            with os.fdopen(handle, 'wb') as tmp_file:
+                np.savez(
+                    tmp_file,
+                    vectors=self.vectors,
+                    kinds=self.kinds,
+                    object_ids=self.object_ids,
+                    chunks=self.chunks,
+                    last_article_id=self.last_article_id
+                )
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+        self._loaded_mtime = os.path.getmtime(self.path)
+    
+    def reload_if_changed(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.RELOAD_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        
+        if self.path and os.path.exists(self.path) and os.path.getmtime(self.path) != self._loaded_mtime:
+            self.load()
+    
+    # Building
+    
+    def rebuild(self) -> int:
+        """Re-embed every article and the latest statistics from scratch"""
+        with self._lock:
+            self._reset()
+        return self.update()
+    
+    def update(self) -> int:
+        """Append articles added since the last build and refresh the statistics passages"""
+        from apps.news.models import NewsArticle
+        
+        kinds, object_ids, chunks, texts = [], [], [], []
+        
+        articles = NewsArticle.objects.filter(
+            id__gt=self.last_article_id
+        ).only('id', 'title', 'summary', 'content').order_by('id')
+        last_article_id = self.last_article_id
+        for article in articles.iterator(chunk_size=500):
+            for chunk, passage in enumerate(article_passages(article)):
+                kinds.append(ARTICLE)
+                object_ids.append(article.id)
+                chunks.append(chunk)
+                texts.append(passage)
+            last_article_id = article.id
+        
+        statistics = self._latest_statistics()
+        for statistic in statistics:
+            kinds.append(STATISTIC)
+            object_ids.append(statistic.id)
+            chunks.append(0)
+            texts.append(statistic_passage(statistic))
+        
+        vectors = embed_many(texts, self.dimensions)
+        
+        with self._lock:
+            keep = self.kinds == ARTICLE
+            self.vectors = np.concatenate([self.vectors[:, keep], vectors.T], axis=1)
+            self.kinds = np.concatenate([self.kinds[keep], np.array(kinds, dtype=np.int8)])
+            self.object_ids = np.concatenate([self.object_ids[keep], np.array(object_ids, dtype=np.int64)])
+            self.chunks = np.concatenate([self.chunks[keep], np.array(chunks, dtype=np.int32)])
+            self.last_article_id = last_article_id
+        
+        return len(texts) - len(statistics)
+    
+    def _latest_statistics(self):
+        from apps.climate_data.models import ClimateStatistics
+        
+        latest = ClimateStatistics.objects.order_by().values('stat_type', 'period').annotate(latest_date=Max('date'))
+        query = Q()
+        for row in latest:
+            query |= Q(stat_type=row['stat_type'], period=row['period'], date=row['latest_date'])
+        return list(ClimateStatistics.objects.filter(query)) if query else []
+    
+    # Querying
+    
+    def search(self, query: str, k: int = 3, min_score: float = 0.0) -> List[Dict]:
+        """Return up to ``k`` passages ranked by cosine similarity to ``query``"""
+        from apps.climate_data.models import ClimateStatistics
+        from apps.news.models import NewsArticle
+        
+        query_vector = embed(query, self.dimensions)
+        with self._lock:
+            vectors, kinds, object_ids, chunks = self.vectors, self.kinds, self.object_ids, self.chunks
+        
+        if not len(object_ids) or not query_vector.any():
+            return []
+        
+        features = np.flatnonzero(query_vector)
+        scores = query_vector[features] @ vectors[features]
+        # Over-fetch so hits on deleted articles or duplicate chunks can be dropped
+        candidates = min(len(scores), k * 3)
+        top = np.argpartition(-scores, candidates - 1)[:candidates]
+        top = top[np.argsort(-scores[top])]
+        top = [index for index in top if scores[index] >= min_score]
+        if not top:
+            return []
+        
+        article_ids = {int(object_ids[i]) for i in top if kinds[i] == ARTICLE}
+        statistic_ids = {int(object_ids[i]) for i in top if kinds[i] == STATISTIC}
+        articles = NewsArticle.objects.only(
+            'id', 'title', 'summary', 'content', 'source', 'url'
+        ).in_bulk(article_ids)
+        statistics = ClimateStatistics.objects.in_bulk(statistic_ids)
+        
+        results = []
+        for index in top:
+            object_id = int(object_ids[index])
+            if kinds[index] == ARTICLE:
+                article = articles.get(object_id)
+                passages = article_passages(article) if article else []
+                if int(chunks[index]) >= len(passages):
+                    continue
+                results.append({
+                    'kind': 'article',
+                    'id': object_id,
+                    'title': article.title,
+                    'source': article.source,
+                    'url': article.url,
+                    'text': passages[int(chunks[index])],
+                    'score': float(scores[index]),
+                })
+            else:
+                statistic = statistics.get(object_id)
+                if statistic is None:
+                    continue
+                results.append({
+                    'kind': 'statistic',
+                    'id': object_id,
+                    'title': statistic.get_stat_type_display(),
+                    'source': statistic.source,
+                    'url': '',
+                    'text': statistic_passage(statistic),
+                    'score': float(scores[index]),
+                })
+            if len(results) == k:
+                break
+        return results
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_retrieval_index() -> RetrievalIndex:
+    """Return the process-wide index, loading it from disk and picking up rebuilds"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = RetrievalIndex(settings.CHATBOT_RETRIEVAL_INDEX_PATH)
+                index.load()
+                _index = index
+    _index.reload_if_changed()
+    return _index
+
+
+def format_passages(passages: List[Dict]) -> str:
+    """Render retrieved passages as a numbered source list for the prompt"""
+    lines = []
+    for number, passage in enumerate(passages, start=1):
+        lines.append(f"[{number}] {passage['title']} ({passage['source']}): {passage['text']}")
+    return '\n'.join(lines)
@@ -20,8 +20,13 @@ class ChatSessionSerializer(serializers.ModelSerializer):
         model = ChatSession
         fields = [
             'id', 'session_id', 'title', 'message_count', 'total_tokens',
+            'last_message_preview', 'last_message_role', 'last_message_at',
             'is_active', 'created_at', 'updated_at', 'last_activity'
         ]
+        read_only_fields = [
+            'session_id', 'message_count', 'total_tokens', 'last_message_preview',
+            'last_message_role', 'last_message_at', 'created_at', 'updated_at', 'last_activity'
+        ]
 
 
 class ChatbotConfigSerializer(serializers.ModelSerializer):
@@ -1,51 +1,164 @@
+import asyncio
+import json
 import os
-import google.generativeai as genai
+import re
+import time
+import uuid
+from asgiref.sync import async_to_sync, sync_to_async
 from django.conf import settings
-from typing import Dict, List, Optional
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, NullIf
+from django.utils import timezone
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 import logging
 
+from apps.news.models import NewsArticle
+
+from .cache import curation_cache, get_response_cache
+from .intents import CHATBOT_RESPONSES, get_chatbot_intents, get_news_categorizer
+from .llm import LLMError, get_llm_client
+from .retrieval import format_passages, get_retrieval_index
+from .models import ChatMessage, ChatSession
+
 logger = logging.getLogger(__name__)
 
+JSON_OBJECT = re.compile(r'\{.*\}', re.DOTALL)
+
 
 class GeminiChatbotService:
     """Service for interacting with Google Gemini AI"""
     
     def __init__(self):
-        self.api_key = settings.GEMINI_API_KEY
-        if self.api_key and self.api_key != 'your-gemini-api-key-here':
-            genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel('gemini-pro')
-        else:
-            self.model = None
-            logger.warning("Gemini API key not configured, chatbot will use fallback responses")
-    
-    def generate_response(self, message: str, user_context: Dict = None) -> Dict:
-        """Generate chatbot response using Gemini AI"""
-        
-        if not self.model:
+        self.client = get_llm_client()
+        self.cache = get_response_cache()
+    
+    def generate_response(self, message: str, user_context: Dict = None, history: str = '') -> Dict:
+        """
+        Generate chatbot response using Gemini AI.
+        
+        ``tokens_used`` counts model tokens (prompt and completion) billed for
+        this turn, so cached and fallback replies report zero; ``response_time``
+        is the measured wall-clock time in seconds.
+        """
+        started = time.perf_counter()
+        result = self._generate(message, user_context, history)
+        result['response_time'] = round(time.perf_counter() - started, 2)
+        return result
+    
+    def _generate(self, message: str, user_context: Dict = None, history: str = '') -> Dict:
+        # Follow-up questions depend on the conversation and questions about
+        # the user on their own data, so only cold, general questions are
+        # cached, and those are answered from the shared context alone
+        use_cache = not history and self.cache.cacheable(message)
+        if use_cache:
+            user_context = self.cache.shared_context(user_context)
+        cached = self.cache.get(message, user_context) if use_cache else None
+        if cached:
+            return dict(cached, tokens_used=0, source='cache')
+        
+        if not self.client.available:
             return self._get_fallback_response(message)
         
         try:
             # Build context-aware prompt
-            system_prompt = self._build_system_prompt(user_context)
+            system_prompt = self._build_system_prompt(user_context, self.retrieve_sources(message))
             
             # Generate response
-            response = self.model.generate_content(
-                f"{system_prompt}\n\nUser: {message}"
+            response = self.client.generate(
+                self._build_prompt(system_prompt, message, history)
             )
             
-            return {
-                'content': response.text,
-                'tokens_used': len(response.text.split()),
-                'response_time': 0.5,  # Mock response time
+            result = {
+                'content': response['text'],
+                'tokens_used': response['tokens_used'],
                 'source': 'gemini'
             }
+            if use_cache:
+                self.cache.set(message, user_context, result)
+            return result
             
-        except Exception as e:
+        except LLMError as e:
             logger.error(f"Error generating Gemini response: {e}")
             return self._get_fallback_response(message)
     
-    def _build_system_prompt(self, user_context: Dict = None) -> str:
+    async def astream_response(self, message: str, user_context: Dict = None,
+                               history: str = '', usage: Dict = None) -> AsyncIterator[str]:
+        """
+        Yield the chatbot response in chunks as the model produces them.
+        
+        When given, ``usage`` is filled with ``tokens_used`` and ``source``
+        once the stream ends, with the same meaning as in ``generate_response``.
+        """
+        usage = usage if usage is not None else {}
+        usage.update(tokens_used=0, source='fallback')
+        
+        use_cache = not history and self.cache.cacheable(message)
+        if use_cache:
+            user_context = self.cache.shared_context(user_context)
+        cached = self.cache.get(message, user_context) if use_cache else None
+        if cached:
+            usage['source'] = 'cache'
+            yield cached['content']
+            return
+        
+        if not self.client.available:
+            yield self._get_fallback_response(message)['content']
+            return
+        
+        chunks = []
+        try:
+            sources = await sync_to_async(self.retrieve_sources)(message)
+            system_prompt = self._build_system_prompt(user_context, sources)
+            
+            prompt = self._build_prompt(system_prompt, message, history)
+            async for chunk in self.client.astream(prompt):
+                chunks.append(chunk)
+                yield chunk
+            
+            # Streams carry no usage metadata, so both sides are estimated
+            content = ''.join(chunks)
+            usage.update(
+                tokens_used=self.client.account(prompt, {'text': content})['tokens_used'],
+                source='gemini'
+            )
+            if use_cache:
+                self.cache.set(message, user_context, {
+                    'content': content,
+                    'tokens_used': usage['tokens_used'],
+                    'source': 'gemini'
+                })
+            
+        except LLMError as e:
+            logger.error(f"Error streaming Gemini response: {e}")
+            if chunks:
+                content = ''.join(chunks)
+                usage.update(
+                    tokens_used=self.client.account(prompt, {'text': content})['tokens_used'],
+                    source='gemini'
+                )
+            else:
+                yield self._get_fallback_response(message)['content']
+    
+    def _build_prompt(self, system_prompt: str, message: str, history: str = '') -> str:
+        """Combine the system prompt, prior conversation and the new message"""
+        if history:
+            return f"{system_prompt}\n\n{history}\n\nUser: {message}"
+        return f"{system_prompt}\n\nUser: {message}"
+    
+    def retrieve_sources(self, message: str) -> List[Dict]:
+        """Find news and climate passages relevant to the message"""
+        try:
+            return get_retrieval_index().search(
+                message,
+                k=settings.CHATBOT_RETRIEVAL_TOP_K,
+                min_score=settings.CHATBOT_RETRIEVAL_MIN_SCORE
+            )
+        except Exception as e:
+            logger.error(f"Error retrieving chatbot sources: {e}")
+            return []
+    
+    def _build_system_prompt(self, user_context: Dict = None, sources: List[Dict] = None) -> str:
         """Build system prompt with EcoSphere context"""
         
         base_prompt = """You are the EcoSphere Assistant, an AI climate helper for the EcoSphere platform. 
@@ -67,64 +180,318 @@ class GeminiChatbotService:
         
         if user_context:
             if user_context.get('carbon_data'):
-                base_prompt += f"\n\nUser's current carbon footprint: {user_context['carbon_data']} kg CO2"
+                base_prompt += f"\n\nUser's carbon footprint over the last 30 days: {user_context['carbon_data']} kg CO2"
+            
+            if user_context.get('top_categories'):
+                categories = ', '.join(
+                    f"{item['category'].lower()}/{item['subcategory']} ({item['co2']} kg)"
+                    for item in user_context['top_categories']
+                )
+                base_prompt += f"\n\nUser's largest emission sources this year: {categories}"
+            
+            if user_context.get('active_challenges'):
+                base_prompt += f"\n\nUser's active challenges: {', '.join(user_context['active_challenges'])}"
+            
+            if user_context.get('total_points'):
+                base_prompt += f"\n\nUser's EcoSphere points: {user_context['total_points']}"
             
             if user_context.get('location'):
                 base_prompt += f"\n\nUser's location: {user_context['location']}"
             
             if user_context.get('role'):
                 base_prompt += f"\n\nUser role: {user_context['role']}"
+            
+            if user_context.get('climate'):
+                indicators = '; '.join(f"{name}: {value}" for name, value in user_context['climate'].items())
+                base_prompt += f"\n\nLatest global climate indicators: {indicators}"
+        
+        if sources:
+            base_prompt += (
+                "\n\nRelevant EcoSphere sources (cite them by number when you use them):\n"
+                + format_passages(sources)
+            )
         
         return base_prompt
     
     def _get_fallback_response(self, message: str) -> Dict:
         """Provide fallback responses when Gemini is not available"""
         
-        fallback_responses = {
-            'carbon': "I can help you understand carbon footprints! Try using our carbon calculator to track your emissions across different categories like transportation and energy use.",
-            'calculator': "The carbon calculator helps you track emissions from electricity, water, gas, waste, and transportation. You can find it in the main navigation.",
-            'challenge': "Check out our challenges section to join community initiatives and earn points for sustainable actions!",
-            'news': "Visit our news section for the latest climate science and environmental updates, curated and summarized for easy reading.",
-            'help': "I'm here to help with climate questions, carbon reduction tips, and navigating EcoSphere. What would you like to know?",
-            'default': "I'm the EcoSphere Assistant! I can help you with climate information, carbon reduction tips, and guide you through our platform features. How can I assist you today?"
-        }
-        
-        message_lower = message.lower()
-        
-        for keyword, response in fallback_responses.items():
-            if keyword in message_lower:
-                return {
-                    'content': response,
-                    'tokens_used': len(response.split()),
-                    'response_time': 0.1,
-                    'source': 'fallback'
-                }
+        intent = get_chatbot_intents().match(message) or 'default'
+        response = CHATBOT_RESPONSES[intent]
         
         return {
-            'content': fallback_responses['default'],
-            'tokens_used': len(fallback_responses['default'].split()),
-            'response_time': 0.1,
+            'content': response,
+            'tokens_used': 0,
             'source': 'fallback'
         }
 
 
+class ChatSessionService:
+    """Service for chat session bookkeeping"""
+    
+    def get_or_create_session(self, user, session_id: Optional[str] = None) -> Optional[ChatSession]:
+        """Return the user's session, a new one if no id is given, or None if it is not theirs"""
+        if session_id:
+            return ChatSession.objects.filter(session_id=session_id, user=user).first()
+        return ChatSession.objects.create(user=user, session_id=uuid.uuid4().hex)
+    
+    PREVIEW_LENGTH = 200
+    TITLE_LENGTH = 200
+    
+    def add_message(self, session: ChatSession, role: str, content: str,
+                    tokens_used: Optional[int] = None,
+                    response_time: Optional[float] = None) -> ChatMessage:
+        """Append a message to a session and update the session counters and preview"""
+        with transaction.atomic():
+            chat_message = ChatMessage.objects.create(
+                user_id=session.user_id,
+                session_id=session.session_id,
+                role=role,
+                content=content,
+                tokens_used=tokens_used,
+                response_time=response_time
+            )
+            updates = {
+                'last_message_preview': content[:self.PREVIEW_LENGTH],
+                'last_message_role': role,
+                'last_message_at': chat_message.created_at,
+            }
+            if role == 'USER':
+                # The first user message names the session
+                updates['title'] = Coalesce(NullIf(F('title'), Value('')), Value(content[:self.TITLE_LENGTH]))
+            self.record_activity(session, messages=1, tokens=tokens_used or 0, **updates)
+        return chat_message
+    
+    def update_message(self, chat_message: ChatMessage, content: str,
+                       tokens_used: Optional[int] = None,
+                       response_time: Optional[float] = None):
+        """Persist new content for a message that is still being streamed"""
+        chat_message.content = content
+        chat_message.tokens_used = tokens_used
+        chat_message.response_time = response_time
+        chat_message.save(update_fields=['content', 'tokens_used', 'response_time'])
+    
+    def finish_message(self, session: ChatSession, chat_message: ChatMessage, content: str,
+                       tokens_used: int, response_time: float):
+        """Store a streamed message's final content and fold it into the session totals"""
+        with transaction.atomic():
+            self.update_message(chat_message, content, tokens_used, response_time)
+            self.record_activity(session, tokens=tokens_used)
+            # Only refresh the preview if no newer message has been added meanwhile
+            ChatSession.objects.filter(
+                pk=session.pk,
+                last_message_at=chat_message.created_at
+            ).update(last_message_preview=content[:self.PREVIEW_LENGTH])
+    
+    def discard_message(self, session: ChatSession, chat_message: ChatMessage):
+        """Delete a message that never got content and take it back out of the session"""
+        with transaction.atomic():
+            deleted, _ = ChatMessage.objects.filter(pk=chat_message.pk).delete()
+            if not deleted:
+                return
+            self.record_activity(session, messages=-1)
+            # The preview falls back to the previous message, unless a newer one replaced it
+            previous = ChatMessage.objects.filter(session_id=session.session_id).order_by(
+                '-created_at', '-id'
+            ).values('content', 'role', 'created_at').first() or {'content': '', 'role': '', 'created_at': None}
+            ChatSession.objects.filter(
+                pk=session.pk,
+                last_message_at=chat_message.created_at
+            ).update(
+                last_message_preview=previous['content'][:self.PREVIEW_LENGTH],
+                last_message_role=previous['role'],
+                last_message_at=previous['created_at']
+            )
+    
+    def record_activity(self, session: ChatSession, messages: int = 0, tokens: int = 0, **updates):
+        ChatSession.objects.filter(pk=session.pk).update(
+            message_count=F('message_count') + messages,
+            total_tokens=F('total_tokens') + tokens,
+            last_activity=timezone.now(),
+            **updates
+        )
+
+
 class NewsCurationService:
     """Service for curating and summarizing climate news"""
     
+    VALID_CATEGORIES = ['POLICY', 'SCIENCE', 'DISASTERS', 'SOLUTIONS', 'LOCAL', 'GLOBAL']
+    
+    # Model output is cached per (content hash, prompt version, model); bump a
+    # version whenever its prompt or parsing changes so results are redone
+    CURATION_PROMPT_VERSION = 'curate-v1'
+    SUMMARY_PROMPT_VERSION = 'summary-v1'
+    CATEGORY_PROMPT_VERSION = 'category-v1'
+    
     def __init__(self):
-        self.api_key = settings.GEMINI_API_KEY
-        if self.api_key and self.api_key != 'your-gemini-api-key-here':
-            genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel('gemini-pro')
-        else:
-            self.model = None
+        self.client = get_llm_client()
+    
+    def curate_many(self, articles: List[Dict]) -> List[Dict]:
+        """
+        Summarize and categorize many articles; results keep input order.
+        
+        Cached results are reused and only the misses reach the model,
+        concurrently. Fallback results are not cached.
+        """
+        if not self.client.available:
+            return [self._basic_curation(article['title'], article['content']) for article in articles]
+        
+        model = self.client.model_name
+        keys = [NewsArticle.compute_content_hash(article['title'], article['content']) for article in articles]
+        cached = curation_cache.get_many(keys, self.CURATION_PROMPT_VERSION, model)
+        misses = [index for index, key in enumerate(keys) if key not in cached]
+        generated = async_to_sync(self._acurate_many)([articles[index] for index in misses])
+        
+        results = [cached.get(key) for key in keys]
+        fresh = {}
+        for index, (result, from_model) in zip(misses, generated):
+            results[index] = result
+            if from_model:
+                fresh[keys[index]] = result
+        curation_cache.set_many(fresh, self.CURATION_PROMPT_VERSION, model)
+        
+        if articles:
+            logger.info(f"Curated {len(articles)} articles: {len(articles) - len(misses)} cached, {len(misses)} generated")
+        return results
+    
+    async def acurate_many(self, articles: List[Dict]) -> List[Dict]:
+        """Summarize and categorize many articles concurrently, bypassing the result cache"""
+        return [result for result, _ in await self._acurate_many(articles)]
+    
+    async def _acurate_many(self, articles: List[Dict]) -> List[Tuple[Dict, bool]]:
+        # The LLM client's worker pool bounds concurrency across all callers;
+        # this keeps one large batch from queueing ahead of chat traffic.
+        semaphore = asyncio.Semaphore(settings.NEWS_CURATION_CONCURRENCY)
+        
+        async def curate(article):
+            async with semaphore:
+                return await self._acurate(article['title'], article['content'])
+        
+        return await asyncio.gather(*(curate(article) for article in articles))
+    
+    async def acurate_article(self, title: str, content: str) -> Dict:
+        """Summarize and categorize an article with a single model call"""
+        result, _ = await self._acurate(title, content)
+        return result
+    
+    async def _acurate(self, title: str, content: str) -> Tuple[Dict, bool]:
+        """The curation result, and whether it came from the model rather than a fallback"""
+        
+        if not self.client.available:
+            return self._basic_curation(title, content), False
+        
+        prompt = f"""Summarize and categorize this climate news article.
+
+Title: {title}
+
+Content: {content[:2000]}
+
+The summary should be 150-200 words, informative but accessible to general audiences, and highlight:
+- Main findings or developments
+- Environmental impact
+- Relevance to climate action
+- Any actionable insights
+
+The category must be one of:
+- POLICY: Government policies, regulations, international agreements
+- SCIENCE: Research findings, scientific studies, climate data
+- DISASTERS: Extreme weather events, natural disasters
+- SOLUTIONS: Technology, innovations, renewable energy
+- LOCAL: Regional or local environmental issues
+- GLOBAL: International climate developments
+
+Respond with only a JSON object: {{"summary": "...", "category": "..."}}"""
+        
+        try:
+            response = await self.client.agenerate(prompt)
+        except LLMError as e:
+            logger.error(f"Error curating article: {e}")
+            return self._basic_curation(title, content), False
+        
+        return self._parse_curation(response['text'], title, content), True
+    
+    def _parse_curation(self, text: str, title: str, content: str) -> Dict:
+        """Read the model's JSON reply, falling back field by field on anything malformed"""
+        match = JSON_OBJECT.search(text)
+        try:
+            data = json.loads(match.group(0)) if match else {}
+        except ValueError:
+            data = {}
+        if not isinstance(data, dict):
+            data = {}
+        
+        summary = str(data.get('summary') or '').strip()
+        category = str(data.get('category') or '').strip().upper()
+        return {
+            'summary': summary or self._basic_summary(content),
+            'category': category if category in self.VALID_CATEGORIES else self._basic_categorization(title, content),
+        }
+    
+    def _basic_curation(self, title: str, content: str) -> Dict:
+        return {
+            'summary': self._basic_summary(content),
+            'category': self._basic_categorization(title, content),
+        }
+    
+    def recurate_articles(self, batch_size: int = 100) -> Tuple[int, int]:
+        """
+        Re-run curation over stored articles, e.g. after a prompt change.
+        
+        Articles whose (content, prompt version, model) result is cached cost
+        no model call, and only rows whose summary or category actually
+        changed are written. Returns (articles processed, articles updated).
+        """
+        if not self.client.available:
+            logger.warning("Skipping re-curation: no model available")
+            return 0, 0
+        
+        processed = updated = 0
+        last_id = 0
+        while True:
+            batch = list(
+                NewsArticle.objects.filter(id__gt=last_id).order_by('id')
+                .only('id', 'title', 'content', 'summary', 'category')[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+            
+            results = self.curate_many([{'title': article.title, 'content': article.content} for article in batch])
+            changed = []
+            for article, result in zip(batch, results):
+                if (article.summary, article.category) != (result['summary'], result['category']):
+                    article.summary = result['summary']
+                    article.category = result['category']
+                    changed.append(article)
+            NewsArticle.objects.bulk_update(changed, ['summary', 'category'])
+            
+            processed += len(batch)
+            updated += len(changed)
+        return processed, updated
+    
+    def _cached_result(self, prompt_version: str, title: str, content: str, generate) -> Optional[Dict]:
+        """Cached model result for this article and prompt, generating and storing it on a miss"""
+        key = NewsArticle.compute_content_hash(title, content)
+        model = self.client.model_name
+        cached = curation_cache.get_many([key], prompt_version, model)
+        if key in cached:
+            return cached[key]
+        
+        result = generate(title, content)
+        if result is not None:
+            curation_cache.set_many({key: result}, prompt_version, model)
+        return result
     
     def summarize_article(self, title: str, content: str) -> str:
         """Summarize a news article using Gemini AI"""
         
-        if not self.model:
+        if not self.client.available:
             return self._basic_summary(content)
         
+        result = self._cached_result(self.SUMMARY_PROMPT_VERSION, title, content, self._generate_summary)
+        return result['summary'] if result else self._basic_summary(content)
+    
+    def _generate_summary(self, title: str, content: str) -> Optional[Dict]:
         try:
             prompt = f"""Summarize this climate news article in 150-200 words, focusing on key facts and implications:
 
@@ -140,19 +507,23 @@ Provide a clear, informative summary that highlights:
 
 Keep the tone informative but accessible to general audiences."""
 
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
+            response = self.client.generate(prompt)
+            return {'summary': response['text'].strip()}
             
-        except Exception as e:
+        except LLMError as e:
             logger.error(f"Error summarizing article: {e}")
-            return self._basic_summary(content)
+            return None
     
     def categorize_article(self, title: str, content: str) -> str:
         """Categorize a news article using AI"""
         
-        if not self.model:
+        if not self.client.available:
             return self._basic_categorization(title, content)
         
+        result = self._cached_result(self.CATEGORY_PROMPT_VERSION, title, content, self._generate_category)
+        return result['category'] if result else self._basic_categorization(title, content)
+    
+    def _generate_category(self, title: str, content: str) -> Optional[Dict]:
         try:
             prompt = f"""Categorize this climate news article into one of these categories:
 - POLICY: Government policies, regulations, international agreements
@@ -167,19 +538,18 @@ Content: {content[:1000]}
 
 Return only the category name."""
 
-            response = self.model.generate_content(prompt)
-            category = response.text.strip().upper()
+            response = self.client.generate(prompt)
+            category = response['text'].strip().upper()
             
             # Validate category
-            valid_categories = ['POLICY', 'SCIENCE', 'DISASTERS', 'SOLUTIONS', 'LOCAL', 'GLOBAL']
-            if category in valid_categories:
-                return category
+            if category in self.VALID_CATEGORIES:
+                return {'category': category}
             else:
-                return self._basic_categorization(title, content)
+                return None
                 
-        except Exception as e:
+        except LLMError as e:
             logger.error(f"Error categorizing article: {e}")
-            return self._basic_categorization(title, content)
+            return None
     
     def _basic_summary(self, content: str) -> str:
         """Basic summarization when AI is not available"""
@@ -189,20 +559,7 @@ Return only the category name."""
     
     def _basic_categorization(self, title: str, content: str) -> str:
         """Basic categorization when AI is not available"""
-        text = (title + ' ' + content).lower()
-        
-        if any(word in text for word in ['policy', 'government', 'regulation', 'agreement']):
-            return 'POLICY'
-        elif any(word in text for word in ['research', 'study', 'scientific', 'data']):
-            return 'SCIENCE'
-        elif any(word in text for word in ['disaster', 'hurricane', 'flood', 'drought', 'fire']):
-            return 'DISASTERS'
-        elif any(word in text for word in ['solution', 'technology', 'renewable', 'innovation']):
-            return 'SOLUTIONS'
-        elif any(word in text for word in ['local', 'city', 'regional', 'community']):
-            return 'LOCAL'
-        else:
-            return 'GLOBAL'
+        return get_news_categorizer().match(f'{title} {content}') or 'GLOBAL'
 
 
 class ClimateDataService:
@@ -0,0 +1,44 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.carbon.models import CarbonEntry
+from apps.climate_data.models import ClimateStatistics
+from apps.gamification.models import UserChallenge
+
+from .context import user_context_snapshots
+from .models import ChatbotConfig
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=CarbonEntry)
+@receiver(post_delete, sender=CarbonEntry)
+@receiver(post_save, sender=UserChallenge)
+@receiver(post_delete, sender=UserChallenge)
+def refresh_user_context_on_activity(sender, instance, **kwargs):
+    """Carbon entries and challenges feed the user's chatbot context"""
+    user_id = instance.user_id
+    transaction.on_commit(lambda: user_context_snapshots.schedule_user_refresh(user_id))
+
+
+@receiver(post_save, sender=User)
+def refresh_user_context_on_profile_change(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    if update_fields is not None and not {'location', 'total_points'} & set(update_fields):
+        return
+    transaction.on_commit(lambda: user_context_snapshots.schedule_user_refresh(instance.pk))
+
+
+@receiver(post_save, sender=ClimateStatistics)
+def refresh_climate_context(sender, instance, **kwargs):
+    from .tasks import refresh_climate_chat_context
+    transaction.on_commit(lambda: refresh_climate_chat_context.apply_async(countdown=5))
+
+
+@receiver(post_save, sender=ChatbotConfig)
+@receiver(post_delete, sender=ChatbotConfig)
+def invalidate_config_flags(sender, instance, **kwargs):
+    user_context_snapshots.invalidate_config()
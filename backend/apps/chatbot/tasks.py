@@ -0,0 +1,40 @@
+from celery import shared_task
+import logging
+
+from apps.chatbot.context import user_context_snapshots
+from apps.chatbot.retrieval import get_retrieval_index
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def refresh_user_chat_context(user_id):
+    """Rebuild a user's chatbot context snapshot after their data changed"""
+    try:
+        user_context_snapshots.refresh_user_snapshot(user_id)
+    
+    except Exception as e:
+        logger.error(f"Error refreshing chat context for user {user_id}: {e}")
+
+
+@shared_task
+def refresh_climate_chat_context():
+    """Rebuild the shared climate snapshot used in chatbot prompts"""
+    try:
+        user_context_snapshots.refresh_climate_snapshot()
+    
+    except Exception as e:
+        logger.error(f"Error refreshing climate chat context: {e}")
+
+
+@shared_task
+def update_retrieval_index(full=False):
+    """Add new articles and current statistics to the chatbot retrieval index"""
+    try:
+        index = get_retrieval_index()
+        added = index.rebuild() if full else index.update()
+        index.save()
+        logger.info(f"Retrieval index updated with {added} article passages ({len(index)} total)")
+        
+    except Exception as e:
+        logger.error(f"Error updating retrieval index: {e}")
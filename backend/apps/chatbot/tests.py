@@ -0,0 +1,144 @@
+"""
+Streaming chat tests against a local fake Gemini server.
+
+The fake server speaks the REST ``streamGenerateContent`` protocol the
+Gemini SDK uses when ``GEMINI_API_ENDPOINT`` is set, so replies go through
+the real backend, LLM client and consumer. Run with
+``python manage.py test apps.chatbot.tests``.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase, override_settings
+
+from apps.chatbot import llm
+from .consumers import ChatConsumer
+from .models import ChatMessage, ChatSession
+from .services import GeminiChatbotService
+
+User = get_user_model()
+
+FAKE_CHUNKS = ['Cycling ', 'cuts ', 'emissions.']
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    """Answers every generate call with ``FAKE_CHUNKS``"""
+    
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        chunks = [
+            {'candidates': [{'content': {'parts': [{'text': text}], 'role': 'model'}, 'index': 0}]}
+            for text in FAKE_CHUNKS
+        ]
+        if ':streamGenerateContent' not in self.path:
+            chunks = chunks[:1]
+            chunks[0]['candidates'][0]['content']['parts'][0]['text'] = ''.join(FAKE_CHUNKS)
+            body = json.dumps(chunks[0]).encode()
+        else:
+            body = json.dumps(chunks).encode()
+        
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    LLM_BACKEND='gemini',
+    GEMINI_API_KEY='test-key',
+)
+class ChatConsumerStreamingTests(TransactionTestCase):
+    """The consumer streams, persists and cleans up replies end to end"""
+    
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeGeminiHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+    
+    def setUp(self):
+        endpoint = override_settings(GEMINI_API_ENDPOINT=f'http://127.0.0.1:{self.server.server_port}')
+        endpoint.enable()
+        self.addCleanup(endpoint.disable)
+        # The shared client is built from settings on first use
+        llm._client = None
+        self.addCleanup(setattr, llm, '_client', None)
+        self.user = User.objects.create_user(username='streamer', email='streamer@example.com', password='secret')
+    
+    async def connect(self):
+        communicator = WebsocketCommunicator(ChatConsumer.as_asgi(), '/ws/chat/')
+        communicator.scope['user'] = self.user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+    
+    async def receive_until(self, communicator, message_type):
+        frames = []
+        while not frames or frames[-1]['type'] != message_type:
+            frames.append(await communicator.receive_json_from(timeout=10))
+        return frames
+    
+    async def test_reply_is_streamed_and_persisted(self):
+        communicator = await self.connect()
+        await communicator.send_json_to({'type': 'chat_message', 'message': 'How do bikes help?'})
+        frames = await self.receive_until(communicator, 'chat_complete')
+        await communicator.disconnect()
+        
+        self.assertEqual(frames[0]['type'], 'chat_started')
+        self.assertEqual([frame['delta'] for frame in frames if frame['type'] == 'chat_token'], FAKE_CHUNKS)
+        self.assertEqual(frames[-1]['content'], ''.join(FAKE_CHUNKS))
+        self.assertGreater(frames[-1]['tokens_used'], 0)
+        
+        message = await ChatMessage.objects.aget(id=frames[0]['message_id'])
+        self.assertEqual(message.content, ''.join(FAKE_CHUNKS))
+        session = await ChatSession.objects.aget(session_id=frames[0]['session_id'])
+        self.assertEqual(session.message_count, 2)
+        self.assertEqual(session.last_message_role, 'ASSISTANT')
+    
+    async def test_failure_mid_stream_keeps_partial_reply(self):
+        async def broken_stream(*args, **kwargs):
+            yield 'Partial '
+            raise RuntimeError('connection reset')
+        
+        communicator = await self.connect()
+        with mock.patch.object(GeminiChatbotService, 'astream_response', broken_stream):
+            await communicator.send_json_to({'type': 'chat_message', 'message': 'Hello'})
+            frames = await self.receive_until(communicator, 'error')
+        await communicator.disconnect()
+        
+        self.assertEqual(frames[-1]['message_id'], frames[0]['message_id'])
+        message = await ChatMessage.objects.aget(id=frames[0]['message_id'])
+        self.assertEqual(message.content, 'Partial ')
+    
+    async def test_failure_before_first_token_removes_placeholder(self):
+        async def broken_stream(*args, **kwargs):
+            raise RuntimeError('model unavailable')
+            yield
+        
+        communicator = await self.connect()
+        with mock.patch.object(GeminiChatbotService, 'astream_response', broken_stream):
+            await communicator.send_json_to({'type': 'chat_message', 'message': 'Hello'})
+            frames = await self.receive_until(communicator, 'error')
+        await communicator.disconnect()
+        
+        self.assertFalse(await ChatMessage.objects.filter(id=frames[-1]['message_id']).aexists())
+        session = await ChatSession.objects.aget(session_id=frames[0]['session_id'])
+        self.assertEqual(session.message_count, 1)
+        self.assertEqual(session.last_message_role, 'USER')
+        self.assertEqual(session.last_message_preview, 'Hello')
@@ -1,13 +1,21 @@
+import uuid
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from .models import ChatMessage, ChatSession, ChatbotConfig
+from .pagination import ChatMessageCursorPagination, ChatSessionCursorPagination
+from .serializers import ChatMessageSerializer, ChatSessionSerializer
+from .context import ConversationContextService, user_context_snapshots
+from .ratelimit import ChatRateThrottle, chat_rate_limiter
+from .services import GeminiChatbotService, ChatSessionService
 
 
 class ChatMessageViewSet(viewsets.ModelViewSet):
     """ViewSet for chat messages"""
+    serializer_class = ChatMessageSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ChatMessageCursorPagination
     
     def get_queryset(self):
         return ChatMessage.objects.filter(user=self.request.user).order_by('created_at')
@@ -15,10 +23,15 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
 
 class ChatSessionViewSet(viewsets.ModelViewSet):
     """ViewSet for chat sessions"""
+    serializer_class = ChatSessionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ChatSessionCursorPagination
     
     def get_queryset(self):
         return ChatSession.objects.filter(user=self.request.user).order_by('-last_activity')
+    
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user, session_id=uuid.uuid4().hex)
 
 
 class ChatbotConfigViewSet(viewsets.ReadOnlyModelViewSet):
@@ -31,8 +44,14 @@ class ChatbotConfigViewSet(viewsets.ReadOnlyModelViewSet):
 
 # API Views
 class ChatMessageView(APIView):
-    """API view to send a chat message"""
+    """
+    API view to send a chat message.
+    
+    Replies are returned in one piece; clients that want token streaming
+    should use the ws/chat/ WebSocket endpoint instead.
+    """
     permission_classes = [IsAuthenticated]
+    throttle_classes = [ChatRateThrottle]
     
     def post(self, request):
         message_text = request.data.get('message')
@@ -45,83 +64,75 @@ class ChatMessageView(APIView):
             )
         
         # Get or create session
-        if session_id:
-            try:
-                session = ChatSession.objects.get(id=session_id, user=request.user)
-            except ChatSession.DoesNotExist:
-                return Response(
-                    {'error': 'Session not found'}, 
-                    status=status.HTTP_404_NOT_FOUND
-                )
-        else:
-            session = ChatSession.objects.create(user=request.user)
+        sessions = ChatSessionService()
+        session = sessions.get_or_create_session(request.user, session_id)
+        if session is None:
+            return Response(
+                {'error': 'Session not found'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        # History is read before the new message is stored so it is not duplicated
+        conversation = ConversationContextService()
+        history = conversation.format_history(conversation.get_window(session.session_id))
         
         # Create user message
-        user_message = ChatMessage.objects.create(
-            user=request.user,
-            session=session,
-            message=message_text,
-            is_user=True
-        )
+        user_message = sessions.add_message(session, 'USER', message_text)
         
-        # Here you would typically call the AI service to get a response
-        # For now, we'll create a placeholder response
-        bot_response = "This is a placeholder response. The AI service would be integrated here."
+        response = GeminiChatbotService().generate_response(
+            message_text,
+            user_context_snapshots.get_prompt_context(request.user),
+            history
+        )
         
-        bot_message = ChatMessage.objects.create(
-            user=request.user,
-            session=session,
-            message=bot_response,
-            is_user=False
+        bot_message = sessions.add_message(
+            session,
+            'ASSISTANT',
+            response['content'],
+            tokens_used=response['tokens_used'],
+            response_time=response['response_time']
         )
+        chat_rate_limiter.record_usage(request.user, response['tokens_used'])
+        
+        conversation.record(session.session_id, 'USER', message_text)
+        conversation.record(session.session_id, 'ASSISTANT', bot_message.content)
         
         return Response({
-            'user_message': {
-                'id': user_message.id,
-                'message': user_message.message,
-                'created_at': user_message.created_at
-            },
-            'bot_message': {
-                'id': bot_message.id,
-                'message': bot_message.message,
-                'created_at': bot_message.created_at
-            },
-            'session_id': session.id
+            'user_message': ChatMessageSerializer(user_message).data,
+            'bot_message': ChatMessageSerializer(bot_message).data,
+            'session_id': session.session_id
         }, status=status.HTTP_201_CREATED)
 
 
 class ChatHistoryView(APIView):
-    """API view to get chat history"""
+    """
+    API view to get chat history.
+    
+    With ``session_id`` returns that session's messages, newest first; without
+    it returns the user's sessions with their last-message previews. Both are
+    cursor-paginated so no page needs a COUNT or an OFFSET scan.
+    """
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
         session_id = request.GET.get('session_id')
         
-        if session_id:
-            try:
-                session = ChatSession.objects.get(id=session_id, user=request.user)
-                messages = ChatMessage.objects.filter(session=session).order_by('created_at')
-            except ChatSession.DoesNotExist:
-                return Response(
-                    {'error': 'Session not found'}, 
-                    status=status.HTTP_404_NOT_FOUND
-                )
-        else:
-            # Get all messages for the user
-            messages = ChatMessage.objects.filter(user=request.user).order_by('created_at')
+        if not session_id:
+            sessions = ChatSession.objects.filter(user=request.user)
+            return self.paginate(sessions, ChatSessionCursorPagination(), ChatSessionSerializer)
         
-        data = {
-            'messages': [
-                {
-                    'id': msg.id,
-                    'message': msg.message,
-                    'is_user': msg.is_user,
-                    'created_at': msg.created_at
-                } for msg in messages
-            ]
-        }
+        if not ChatSession.objects.filter(session_id=session_id, user=request.user).exists():
+            return Response(
+                {'error': 'Session not found'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
         
-        return Response(data)
+        messages = ChatMessage.objects.filter(session_id=session_id)
+        return self.paginate(messages, ChatMessageCursorPagination(), ChatMessageSerializer)
+    
+    def paginate(self, queryset, paginator, serializer_class):
+        page = paginator.paginate_queryset(queryset, self.request, view=self)
+        return paginator.get_paginated_response(serializer_class(page, many=True).data)
 
 
 class ChatbotConfigView(APIView):
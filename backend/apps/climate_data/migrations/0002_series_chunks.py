@@ -0,0 +1,79 @@
+# Generated by Django 5.0.6 on 2026-10-19 10:23
+
+import calendar
+import datetime
+
+import numpy as np
+from django.db import migrations, models
+
+
+def backfill_series(apps, schema_editor):
+    # Frozen copy of the chunk layout from apps.climate_data.timeseries as of
+    # this migration: 366 day slots, 53 seven-day buckets from 1 January and
+    # 12 months, float64 with NaN for gaps
+    ClimateData = apps.get_model('climate_data', 'ClimateData')
+    ClimateSeriesChunk = apps.get_model('climate_data', 'ClimateSeriesChunk')
+    
+    def bucket_means(values, starts):
+        present = ~np.isnan(values)
+        sums = np.add.reduceat(np.where(present, values, 0.0), starts)
+        counts = np.add.reduceat(present.astype(np.int64), starts)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, sums / counts, np.nan)
+    
+    series, units = {}, {}
+    rows = ClimateData.objects.order_by('data_type', 'date').values_list('data_type', 'date', 'value', 'unit')
+    for data_type, day, value, unit in rows.iterator(chunk_size=2000):
+        daily = series.setdefault((data_type, day.year), np.full(366, np.nan))
+        daily[day.timetuple().tm_yday - 1] = float(value)
+        units[data_type] = unit
+    
+    chunks = []
+    for (data_type, year), daily in series.items():
+        days = 366 if calendar.isleap(year) else 365
+        month_starts = np.array([(datetime.date(year, month, 1) - datetime.date(year, 1, 1)).days for month in range(1, 13)])
+        arrays = {
+            'daily': daily,
+            'weekly': bucket_means(daily[:days], np.arange(0, days, 7)),
+            'monthly': bucket_means(daily[:days], month_starts),
+        }
+        chunks += [
+            ClimateSeriesChunk(
+                data_type=data_type, resolution=resolution, year=year,
+                unit=units[data_type], values=values.astype('<f8').tobytes()
+            )
+            for resolution, values in arrays.items()
+        ]
+    ClimateSeriesChunk.objects.bulk_create(chunks, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('climate_data', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClimateSeriesChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_type', models.CharField(choices=[('CO2_LEVELS', 'CO2 Levels'), ('TEMPERATURE_ANOMALY', 'Temperature Anomaly'), ('SEA_LEVEL', 'Sea Level'), ('ARCTIC_ICE', 'Arctic Ice'), ('GREENHOUSE_GASES', 'Greenhouse Gases')], help_text='Type of climate data', max_length=30)),
+                ('resolution', models.CharField(choices=[('daily', 'Daily'), ('weekly', 'Weekly'), ('monthly', 'Monthly')], help_text='Slot width of the stored values', max_length=10)),
+                ('year', models.PositiveSmallIntegerField(help_text='Calendar year covered by the chunk')),
+                ('unit', models.CharField(blank=True, help_text='Unit of measurement', max_length=20)),
+                ('values', models.BinaryField(help_text='Little-endian float64 values, one per slot, NaN for gaps')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Climate Series Chunk',
+                'verbose_name_plural': 'Climate Series Chunks',
+                'db_table': 'climate_series_chunks',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='climateserieschunk',
+            constraint=models.UniqueConstraint(fields=('data_type', 'resolution', 'year'), name='unique_climate_series_chunk'),
+        ),
+        migrations.RunPython(backfill_series, migrations.RunPython.noop),
+    ]
@@ -58,6 +58,60 @@ class ClimateData(models.Model):
         return f"{self.get_data_type_display()}: {self.value} {self.unit} ({self.date})"
 
 
+class ClimateSeriesChunk(models.Model):
+    """
+    One year of a climate series at one resolution, stored as a float64 array
+    (see ``apps.climate_data.timeseries``)
+    """
+    RESOLUTION_CHOICES = [
+        ('daily', 'Daily'),
+        ('weekly', 'Weekly'),
+        ('monthly', 'Monthly'),
+    ]
+    
+    data_type = models.CharField(
+        max_length=30,
+        choices=ClimateData.DATA_TYPE_CHOICES,
+        help_text='Type of climate data'
+    )
+    
+    resolution = models.CharField(
+        max_length=10,
+        choices=RESOLUTION_CHOICES,
+        help_text='Slot width of the stored values'
+    )
+    
+    year = models.PositiveSmallIntegerField(
+        help_text='Calendar year covered by the chunk'
+    )
+    
+    unit = models.CharField(
+        max_length=20,
+        blank=True,
+        help_text='Unit of measurement'
+    )
+    
+    values = models.BinaryField(
+        help_text='Little-endian float64 values, one per slot, NaN for gaps'
+    )
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'climate_series_chunks'
+        verbose_name = 'Climate Series Chunk'
+        verbose_name_plural = 'Climate Series Chunks'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['data_type', 'resolution', 'year'],
+                name='unique_climate_series_chunk'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_data_type_display()} {self.resolution} {self.year}"
+
+
 class ClimateAlert(models.Model):
     """
     Model for climate alerts and warnings
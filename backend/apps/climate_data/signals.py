@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import ClimateData
+from .timeseries import climate_series
+
+
+@receiver(post_save, sender=ClimateData)
+def write_climate_series_point(sender, instance, **kwargs):
+    """Keep the chunked series in step with saved data points"""
+    transaction.on_commit(
+        lambda: climate_series.write(instance.data_type, [(instance.date, instance.value)], instance.unit)
+    )
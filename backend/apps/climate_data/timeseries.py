@@ -0,0 +1,192 @@
+"""
+Compact time-series storage for climate data.
+
+Each (data type, resolution, year) is one ``ClimateSeriesChunk`` row holding
+a float64 array: 366 day slots, 53 week slots (seven-day buckets counted from
+1 January, so buckets never straddle a chunk) or 12 month slots, with NaN
+marking gaps. Weekly and monthly chunks are averaged from the daily chunk
+whenever it is written, so any range at any resolution is served with one
+query over a handful of rows. ``ClimateData`` rows remain the raw input,
+but the chunks are the long-term record: they outlive the raw rows'
+retention window, so they are only ever merged into, never rebuilt from
+``ClimateData``.
+"""
+import calendar
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.db import transaction
+
+RESOLUTIONS = ('daily', 'weekly', 'monthly')
+SLOTS = {'daily': 366, 'weekly': 53, 'monthly': 12}
+DEFAULT_MAX_POINTS = 500
+
+
+def to_bytes(values: np.ndarray) -> bytes:
+    return values.astype('<f8').tobytes()
+
+
+def from_bytes(value) -> np.ndarray:
+    return np.frombuffer(bytes(value), dtype='<f8')
+
+
+def empty(resolution: str) -> np.ndarray:
+    return np.full(SLOTS[resolution], np.nan)
+
+
+def slot_date(year: int, resolution: str, slot: int) -> date:
+    if resolution == 'monthly':
+        return date(year, slot + 1, 1)
+    days = slot * 7 if resolution == 'weekly' else slot
+    return date(year, 1, 1) + timedelta(days=days)
+
+
+def slot_end(year: int, resolution: str, slot: int) -> date:
+    """Last day covered by a slot (clamped to the year)"""
+    if resolution == 'daily':
+        return slot_date(year, resolution, slot)
+    if resolution == 'monthly':
+        return date(year, slot + 1, calendar.monthrange(year, slot + 1)[1])
+    return min(slot_date(year, resolution, slot) + timedelta(days=6), date(year, 12, 31))
+
+
+def _bucket_means(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Mean of the non-NaN values between consecutive start offsets (NaN if none)"""
+    present = ~np.isnan(values)
+    sums = np.add.reduceat(np.where(present, values, 0.0), starts)
+    counts = np.add.reduceat(present.astype(np.int64), starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def downsample(daily: np.ndarray, year: int) -> Dict[str, np.ndarray]:
+    """Weekly and monthly averages of one year's daily slots"""
+    days = 366 if calendar.isleap(year) else 365
+    values = daily[:days]
+    month_starts = np.array([(date(year, month, 1) - date(year, 1, 1)).days for month in range(1, 13)])
+    return {
+        'weekly': _bucket_means(values, np.arange(0, days, 7)),
+        'monthly': _bucket_means(values, month_starts),
+    }
+
+
+def place(points: Iterable[Tuple[date, float]], existing: Dict[int, np.ndarray] = None) -> Dict[int, np.ndarray]:
+    """Write points into daily arrays keyed by year (copying any existing arrays)"""
+    chunks = {year: values.copy() for year, values in (existing or {}).items()}
+    for day, value in points:
+        if day.year not in chunks:
+            chunks[day.year] = empty('daily')
+        chunks[day.year][day.timetuple().tm_yday - 1] = float(value)
+    return chunks
+
+
+def choose_resolution(start: date, end: date, max_points: int = DEFAULT_MAX_POINTS) -> str:
+    """Finest resolution that keeps the range within ``max_points`` points"""
+    days = (end - start).days + 1
+    if days <= max_points:
+        return 'daily'
+    if days / 7 <= max_points:
+        return 'weekly'
+    return 'monthly'
+
+
+class ClimateSeriesStore:
+    """Read and write chunked climate series"""
+    
+    def write(self, data_type: str, points: Iterable[Tuple[date, float]], unit: str = ''):
+        """Merge daily points into the series and refresh its downsampled chunks"""
+        from .models import ClimateSeriesChunk
+        
+        points = list(points)
+        if not points:
+            return
+        years = {day.year for day, _ in points}
+        
+        with transaction.atomic():
+            # Make sure every daily chunk exists before locking, so two first
+            # writes to a year serialize on the row instead of both reading
+            # nothing and upserting over each other
+            ClimateSeriesChunk.objects.bulk_create(
+                [
+                    ClimateSeriesChunk(
+                        data_type=data_type, resolution='daily', year=year,
+                        unit=unit, values=to_bytes(empty('daily'))
+                    )
+                    for year in sorted(years)
+                ],
+                ignore_conflicts=True
+            )
+            stored = list(
+                ClimateSeriesChunk.objects.select_for_update().filter(
+                    data_type=data_type, resolution='daily', year__in=years
+                ).order_by('year')
+            )
+            existing = {chunk.year: from_bytes(chunk.values) for chunk in stored}
+            if not unit:
+                unit = next((chunk.unit for chunk in stored if chunk.unit), '')
+            self._save(data_type, unit, place(points, existing))
+    
+    def _save(self, data_type: str, unit: str, daily_chunks: Dict[int, np.ndarray]) -> int:
+        from .models import ClimateSeriesChunk
+        
+        chunks = []
+        for year, daily in daily_chunks.items():
+            arrays = {'daily': daily, **downsample(daily, year)}
+            chunks += [
+                ClimateSeriesChunk(
+                    data_type=data_type, resolution=resolution, year=year,
+                    unit=unit, values=to_bytes(values)
+                )
+                for resolution, values in arrays.items()
+            ]
+        ClimateSeriesChunk.objects.bulk_create(
+            chunks,
+            update_conflicts=True,
+            unique_fields=['data_type', 'resolution', 'year'],
+            update_fields=['unit', 'values', 'updated_at']
+        )
+        return len(chunks)
+    
+    def read_many(self, data_types: List[str], start: date, end: date,
+                  resolution: Optional[str] = None, max_points: int = DEFAULT_MAX_POINTS) -> Dict[str, Dict]:
+        """
+        Chart-ready series for several data types in one query.
+        
+        Each series is ``{'unit', 'resolution', 'dates', 'values'}`` with
+        gaps left out; weekly and monthly buckets are included when they
+        overlap the range. ``resolution`` defaults to the finest one that
+        fits ``max_points``.
+        """
+        from .models import ClimateSeriesChunk
+        
+        resolution = resolution or choose_resolution(start, end, max_points)
+        chunks = ClimateSeriesChunk.objects.filter(
+            data_type__in=data_types,
+            resolution=resolution,
+            year__gte=start.year,
+            year__lte=end.year
+        ).order_by('year').values_list('data_type', 'year', 'unit', 'values')
+        
+        series = {
+            data_type: {'unit': '', 'resolution': resolution, 'dates': [], 'values': []}
+            for data_type in data_types
+        }
+        for data_type, year, unit, raw in chunks:
+            values = from_bytes(raw)
+            entry = series[data_type]
+            entry['unit'] = unit
+            for slot in np.flatnonzero(~np.isnan(values)):
+                day = slot_date(year, resolution, int(slot))
+                # buckets that overlap the range are kept, dated by their first day
+                if day.year == year and day <= end and slot_end(year, resolution, int(slot)) >= start:
+                    entry['dates'].append(day)
+                    entry['values'].append(round(float(values[slot]), 3))
+        return series
+    
+    def read(self, data_type: str, start: date, end: date,
+             resolution: Optional[str] = None, max_points: int = DEFAULT_MAX_POINTS) -> Dict:
+        return self.read_many([data_type], start, end, resolution, max_points)[data_type]
+
+
+climate_series = ClimateSeriesStore()
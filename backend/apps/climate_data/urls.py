@@ -11,4 +11,5 @@ urlpatterns = [
     path('', include(router.urls)),
     path('stats/', views.ClimateStatsView.as_view(), name='climate-stats'),
     path('trends/', views.ClimateTrendsView.as_view(), name='climate-trends'),
+    path('series/', views.ClimateSeriesView.as_view(), name='climate-series'),
 ]
@@ -3,7 +3,10 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from django.db.models import Avg, Max, Min
+from django.utils import timezone
+from datetime import date, timedelta
 from .models import ClimateData, ClimateAlert, ClimateStatistics
+from .timeseries import DEFAULT_MAX_POINTS, RESOLUTIONS, climate_series
 
 
 class ClimateDataViewSet(viewsets.ReadOnlyModelViewSet):
@@ -70,31 +73,77 @@ class ClimateTrendsView(APIView):
     """API view for climate trends"""
     permission_classes = [IsAuthenticated]
     
+    PERIOD_DAYS = 30
+    
     def get(self, request):
-        # Get trends for the last 30 days
-        from datetime import datetime, timedelta
-        thirty_days_ago = datetime.now() - timedelta(days=30)
+        # Daily values of the last 30 days, one chunk read for every type
+        today = timezone.now().date()
+        data_types = [code for code, _ in ClimateData.DATA_TYPE_CHOICES]
+        series = climate_series.read_many(
+            data_types, today - timedelta(days=self.PERIOD_DAYS), today, resolution='daily'
+        )
         
-        recent_data = ClimateData.objects.filter(
-            date__gte=thirty_days_ago
-        ).order_by('date')
+        data = {}
+        for data_type, entry in series.items():
+            values = entry['values']
+            data[data_type.lower() + '_trend'] = {
+                'current': values[-1] if values else 0,
+                'change': round(values[-1] - values[0], 3) if len(values) > 1 else 0,
+                'data_points': len(values),
+                'unit': entry['unit']
+            }
+        data['period_days'] = self.PERIOD_DAYS
+        
+        return Response(data)
+
+
+class ClimateSeriesView(APIView):
+    """Chart-ready climate series at daily, weekly or monthly resolution"""
+    permission_classes = [IsAuthenticated]
+    
+    DEFAULT_DAYS = 365
+    
+    def get(self, request):
+        valid_types = [code for code, _ in ClimateData.DATA_TYPE_CHOICES]
+        requested = request.query_params.get('type')
+        data_types = [code.strip().upper() for code in requested.split(',')] if requested else valid_types
+        if any(code not in valid_types for code in data_types):
+            return Response(
+                {'error': f'type must be one of {", ".join(valid_types)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Calculate trends (simplified)
-        temperatures = [data.temperature for data in recent_data if data.temperature]
-        humidities = [data.humidity for data in recent_data if data.humidity]
+        try:
+            end = date.fromisoformat(request.query_params.get('end_date', timezone.now().date().isoformat()))
+            start = date.fromisoformat(
+                request.query_params.get('start_date', (end - timedelta(days=self.DEFAULT_DAYS)).isoformat())
+            )
+            max_points = int(request.query_params.get('max_points', DEFAULT_MAX_POINTS))
+        except ValueError:
+            return Response(
+                {'error': 'start_date and end_date must be YYYY-MM-DD dates and max_points an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if start > end or max_points < 1:
+            return Response(
+                {'error': 'start_date must not be after end_date and max_points must be positive'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        data = {
-            'temperature_trend': {
-                'current': temperatures[-1] if temperatures else 0,
-                'change': (temperatures[-1] - temperatures[0]) if len(temperatures) > 1 else 0,
-                'data_points': len(temperatures)
-            },
-            'humidity_trend': {
-                'current': humidities[-1] if humidities else 0,
-                'change': (humidities[-1] - humidities[0]) if len(humidities) > 1 else 0,
-                'data_points': len(humidities)
-            },
-            'period_days': 30
-        }
+        resolution = request.query_params.get('resolution')
+        if resolution not in (None, 'auto') + RESOLUTIONS:
+            return Response(
+                {'error': f'resolution must be auto or one of {", ".join(RESOLUTIONS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        return Response(data)
+        series = climate_series.read_many(
+            data_types, start, end,
+            resolution=None if resolution == 'auto' else resolution,
+            max_points=max_points
+        )
+        return Response({
+            'start_date': start,
+            'end_date': end,
+            'series': series
+        })
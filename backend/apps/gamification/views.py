@@ -7,6 +7,7 @@ from django.contrib.auth import get_user_model
 from django.utils import timezone
 from .models import Challenge, UserChallenge, Achievement, UserAchievement, UserPoints
 from apps.users.serializers import UserSerializer
+from apps.notifications.services import notifications
 
 User = get_user_model()
 
@@ -149,6 +150,17 @@ class UpdateProgressView(APIView):
         
         user_challenge.save()
         
+        if user_challenge.status == 'COMPLETED':
+            notifications.notify(
+                request.user.id,
+                'CHALLENGE',
+                title=f'Challenge Completed: {user_challenge.challenge.name}',
+                content=f'You completed the "{user_challenge.challenge.name}" challenge!',
+                priority='HIGH',
+                icon='🎯',
+                reference_id=user_challenge.challenge_id
+            )
+        
         serializer = UserChallengeSerializer(user_challenge)
         return Response(serializer.data)
 
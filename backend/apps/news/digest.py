@@ -0,0 +1,173 @@
+"""
+Precomputed weekly news digests.
+
+``DigestService.build`` runs in Celery: it picks the top articles of the last
+``NEWS_DIGEST_DAYS`` once, renders a shared digest and, for users with
+bookmark history, a personalized one ranked by their category interests. Each
+digest is stored as a ready-to-serve JSON body with its ETag in
+``DigestSnapshot`` and written through to the cache, so serving a digest is a
+cache read (or a 304) rather than a query.
+"""
+import hashlib
+import json
+import math
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import ArticleBookmark, DigestSnapshot, NewsArticle
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DigestService:
+    """Build, store and serve weekly digest snapshots"""
+    
+    CACHE_KEY_TEMPLATE = 'news:digest:{date}:{owner}'
+    LATEST_KEY = 'news:digest:latest'
+    CACHE_TIMEOUT = 60 * 60 * 48
+    
+    CANDIDATE_LIMIT = 100
+    AFFINITY_DAYS = 90
+    AFFINITY_WEIGHT = 2.0
+    RECENCY_HALF_LIFE_HOURS = 48
+    
+    # Building
+    
+    def build(self, today: date = None) -> Tuple[int, int]:
+        """Store today's shared and personalized digests; returns (articles, personalized users)"""
+        now = timezone.now()
+        today = today or now.date()
+        start = now - timedelta(days=settings.NEWS_DIGEST_DAYS)
+        
+        candidates = list(
+            NewsArticle.objects.filter(published_date__gte=start)
+            .order_by('-published_date')
+            .only('id', 'title', 'summary', 'category', 'published_date')[:self.CANDIDATE_LIMIT]
+        )
+        size = settings.NEWS_DIGEST_SIZE
+        
+        shared = self._render(candidates[:size], start, now)
+        personalized = {}
+        if settings.NEWS_DIGEST_PERSONALIZED and candidates:
+            for user_id, affinity in self._category_affinities(now).items():
+                personalized[user_id] = self._render(self._rank(candidates, affinity, now)[:size], start, now)
+        
+        with transaction.atomic():
+            DigestSnapshot.objects.update_or_create(
+                user=None, date=today, defaults={'payload': shared[1], 'etag': shared[0]}
+            )
+            DigestSnapshot.objects.bulk_create(
+                [
+                    DigestSnapshot(user_id=user_id, date=today, payload=body, etag=etag)
+                    for user_id, (etag, body) in personalized.items()
+                ],
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=['user', 'date'],
+                update_fields=['payload', 'etag']
+            )
+            DigestSnapshot.objects.filter(date__lt=today - timedelta(days=settings.NEWS_DIGEST_DAYS)).delete()
+        
+        entries = {self._cache_key(today, None): shared}
+        entries.update({self._cache_key(today, user_id): digest for user_id, digest in personalized.items()})
+        cache.set_many(entries, self.CACHE_TIMEOUT)
+        cache.set(self.LATEST_KEY, today.isoformat(), self.CACHE_TIMEOUT)
+        
+        return min(len(candidates), size), len(personalized)
+    
+    def _category_affinities(self, now) -> Dict[int, Dict[str, float]]:
+        """Share of each user's recent bookmarks per category, in one grouped query"""
+        rows = ArticleBookmark.objects.filter(
+            created_at__gte=now - timedelta(days=self.AFFINITY_DAYS)
+        ).order_by().values('user_id', 'article__category').annotate(count=Count('id'))
+        
+        counts = {}
+        for row in rows:
+            counts.setdefault(row['user_id'], {})[row['article__category']] = row['count']
+        return {
+            user_id: {category: count / sum(categories.values()) for category, count in categories.items()}
+            for user_id, categories in counts.items()
+        }
+    
+    def _rank(self, articles: List[NewsArticle], affinity: Dict[str, float], now) -> List[NewsArticle]:
+        decay = math.log(2) / (self.RECENCY_HALF_LIFE_HOURS * 3600)
+        
+        def score(article):
+            age = max((now - article.published_date).total_seconds(), 0)
+            return (1 + self.AFFINITY_WEIGHT * affinity.get(article.category, 0)) * math.exp(-decay * age)
+        
+        return sorted(articles, key=score, reverse=True)
+    
+    def _render(self, articles: List[NewsArticle], start, end) -> Tuple[str, str]:
+        """Response body and its ETag"""
+        body = json.dumps(
+            {
+                'period_start': start,
+                'period_end': end,
+                'articles': [
+                    {
+                        'id': article.id,
+                        'title': article.title,
+                        'summary': article.summary,
+                        'category': article.category,
+                        'published_date': article.published_date
+                    } for article in articles
+                ]
+            },
+            cls=JSONEncoder
+        )
+        return hashlib.sha256(body.encode('utf-8')).hexdigest(), body
+    
+    # Serving
+    
+    def _cache_key(self, day: date, user_id: Optional[int]) -> str:
+        return self.CACHE_KEY_TEMPLATE.format(date=day.isoformat(), owner=user_id or 'shared')
+    
+    def get(self, user) -> Tuple[str, str]:
+        """``(etag, body)`` of the user's digest, falling back to the shared one"""
+        latest = cache.get(self.LATEST_KEY)
+        if latest is None:
+            latest_date = DigestSnapshot.objects.aggregate(latest=Max('date'))['latest']
+            if latest_date is None:
+                # Nothing built yet (fresh install); build now rather than fail
+                self.build()
+                latest_date = timezone.now().date()
+            latest = latest_date.isoformat()
+            cache.set(self.LATEST_KEY, latest, self.CACHE_TIMEOUT)
+        
+        day = date.fromisoformat(latest)
+        user_key = self._cache_key(day, user.id)
+        shared_key = self._cache_key(day, None)
+        cached = cache.get_many([user_key, shared_key])
+        
+        # False marks "no personalized digest", so those users skip the lookup too
+        digest = cached.get(user_key)
+        if digest is None:
+            digest = self._load(day, user.id) or False
+            cache.set(user_key, digest, self.CACHE_TIMEOUT)
+        if digest:
+            return tuple(digest)
+        
+        digest = cached.get(shared_key)
+        if digest is None:
+            digest = self._load(day, None)
+            if digest is None:
+                self.build(day)
+                digest = self._load(day, None)
+            cache.set(shared_key, digest, self.CACHE_TIMEOUT)
+        return tuple(digest)
+    
+    def _load(self, day: date, user_id: Optional[int]) -> Optional[Tuple[str, str]]:
+        snapshot = DigestSnapshot.objects.filter(user_id=user_id, date=day).values_list('etag', 'payload').first()
+        return tuple(snapshot) if snapshot else None
+
+
+digests = DigestService()
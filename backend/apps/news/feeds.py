@@ -0,0 +1,423 @@
+"""
+News feed ingestion.
+
+Sources come from ``NEWS_FEEDS``: each entry names a source type (``rss`` for
+RSS 2.0 and Atom, ``json`` for JSON APIs, ``directory`` for a local folder of
+feed files, or a dotted path to a custom class) plus its options.
+``FeedFetcher`` reads every source concurrently over one pooled HTTP session.
+Remote feeds use conditional GET, so an unchanged feed costs a single 304,
+and XML is parsed incrementally from the response stream so a large feed is
+never held in memory whole. The directory source reads the same formats from
+disk, which keeps ingestion runnable fully offline.
+
+Every source yields plain item dicts with ``title``, ``content``, ``source``,
+``url``, ``published_date`` and ``image_url``.
+"""
+import abc
+import hashlib
+import html
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timezone as dt_timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+from defusedxml.ElementTree import iterparse
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.html import strip_tags
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import logging
+
+logger = logging.getLogger(__name__)
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+CONTENT_ENCODED = '{http://purl.org/rss/1.0/modules/content/}encoded'
+MEDIA = '{http://search.yahoo.com/mrss/}'
+
+FEED_CONTAINERS = ('channel', ATOM + 'feed')
+ENTRY_TAGS = ('item', ATOM + 'entry')
+
+TITLE_MAX_LENGTH = 200
+SOURCE_MAX_LENGTH = 100
+URL_MAX_LENGTH = 200  # URLField default
+VALIDATOR_TTL = 60 * 60 * 24 * 7
+
+WHITESPACE = re.compile(r'\s+')
+
+
+def _clean(text: Optional[str]) -> str:
+    """Plain text from feed markup: tags stripped, entities decoded, whitespace collapsed"""
+    return WHITESPACE.sub(' ', html.unescape(strip_tags(text or ''))).strip()
+
+
+def _parse_date(value: Optional[str]):
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        try:
+            parsed = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def _item(title, content, source, url, published_date=None, image_url='') -> Optional[Dict]:
+    title = _clean(title)
+    url = (url or '').strip()
+    image_url = (image_url or '').strip()
+    if not title or not url or len(url) > URL_MAX_LENGTH:
+        return None
+    return {
+        'title': title[:TITLE_MAX_LENGTH],
+        'content': _clean(content),
+        'source': (source or 'Unknown')[:SOURCE_MAX_LENGTH],
+        'url': url,
+        'published_date': published_date or timezone.now(),
+        'image_url': image_url if len(image_url) <= URL_MAX_LENGTH else '',
+    }
+
+
+# Parsers
+
+def _child_text(element, *tags) -> str:
+    for tag in tags:
+        child = element.find(tag)
+        if child is not None and child.text and child.text.strip():
+            return child.text
+    return ''
+
+
+def _entry_link(element) -> str:
+    for link in element.findall(ATOM + 'link'):
+        if link.get('rel', 'alternate') == 'alternate' and link.get('href'):
+            return link.get('href')
+    link = _child_text(element, 'link')
+    if link:
+        return link
+    guid = element.find('guid')
+    if guid is not None and guid.get('isPermaLink', 'true') == 'true':
+        return guid.text or ''
+    return ''
+
+
+def _entry_image(element) -> str:
+    enclosure = element.find('enclosure')
+    if enclosure is not None and enclosure.get('type', '').startswith('image/'):
+        return enclosure.get('url', '')
+    for tag in (MEDIA + 'content', MEDIA + 'thumbnail'):
+        media = element.find(tag)
+        if media is not None and media.get('url'):
+            return media.get('url')
+    return ''
+
+
+def parse_xml_feed(stream, source_name: str = '', max_items: int = None) -> Iterator[Dict]:
+    """Yield items from an RSS 2.0 or Atom document, parsing as the bytes arrive"""
+    open_elements = []
+    count = 0
+    for event, element in iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            open_elements.append(element)
+            continue
+        
+        open_elements.pop()
+        parent = open_elements[-1] if open_elements else None
+        if element.tag in ('title', ATOM + 'title') and parent is not None and parent.tag in FEED_CONTAINERS:
+            source_name = source_name or _clean(element.text)
+        elif element.tag in ENTRY_TAGS:
+            item = _item(
+                _child_text(element, 'title', ATOM + 'title'),
+                _child_text(element, CONTENT_ENCODED, 'description', ATOM + 'content', ATOM + 'summary'),
+                source_name,
+                _entry_link(element),
+                _parse_date(_child_text(element, 'pubDate', ATOM + 'published', ATOM + 'updated')),
+                _entry_image(element)
+            )
+            # Entries are done with once read. Clearing one still leaves it
+            # attached to its ancestors, so clear those too (the root
+            # included); their tags are all the parser needs to keep
+            element.clear()
+            for ancestor in open_elements:
+                ancestor.clear()
+            if item:
+                yield item
+                count += 1
+                if max_items and count >= max_items:
+                    return
+
+
+JSON_FIELDS = {
+    'title': ('title',),
+    'url': ('url', 'link'),
+    'content': ('content_text', 'content_html', 'content', 'description', 'summary'),
+    'published_date': ('date_published', 'publishedAt', 'published', 'published_date'),
+    'image_url': ('image', 'urlToImage', 'image_url'),
+}
+
+
+def _json_field(entry: Dict, field: str):
+    for key in JSON_FIELDS[field]:
+        if entry.get(key):
+            return entry[key]
+    return None
+
+
+def parse_json_feed(stream, source_name: str = '', max_items: int = None) -> Iterator[Dict]:
+    """Yield items from a JSON Feed document or a NewsAPI-style ``articles`` list"""
+    data = json.load(stream)
+    feed_title = ''
+    if isinstance(data, dict):
+        feed_title = data.get('title', '')
+        entries = data.get('items') or data.get('articles') or []
+    else:
+        entries = data
+    
+    count = 0
+    for entry in entries:
+        source = entry.get('source')
+        if isinstance(source, dict):
+            source = source.get('name')
+        item = _item(
+            _json_field(entry, 'title'),
+            _json_field(entry, 'content'),
+            source_name or source or feed_title,
+            _json_field(entry, 'url'),
+            _parse_date(_json_field(entry, 'published_date')),
+            _json_field(entry, 'image_url')
+        )
+        if item:
+            yield item
+            count += 1
+            if max_items and count >= max_items:
+                return
+
+
+PARSERS = {
+    '.xml': parse_xml_feed,
+    '.rss': parse_xml_feed,
+    '.atom': parse_xml_feed,
+    '.json': parse_json_feed,
+}
+
+
+# Sources
+
+class FeedSource(abc.ABC):
+    """
+    One configured feed.
+    
+    ``fetch`` gets the validators saved after the last successful run and
+    returns ``(items, validators)``; ``items`` is None when nothing changed.
+    """
+    
+    def __init__(self, name: str = '', max_items: int = None):
+        self.name = name
+        self.max_items = max_items or settings.NEWS_FEED_MAX_ITEMS
+    
+    @property
+    @abc.abstractmethod
+    def key(self) -> str:
+        """Stable identifier the fetch validators are stored under"""
+    
+    @abc.abstractmethod
+    def fetch(self, session: requests.Session, validators: Dict) -> Tuple[Optional[List[Dict]], Dict]:
+        """Return ``(items, validators)``, with ``items`` None when unchanged"""
+
+
+class HTTPFeedSource(FeedSource):
+    """Remote feed fetched with conditional GET and parsed from the response stream"""
+    
+    parser = None
+    
+    def __init__(self, url: str, name: str = '', max_items: int = None, timeout: float = None):
+        super().__init__(name, max_items)
+        self.url = url
+        self.timeout = timeout or settings.NEWS_FEED_TIMEOUT
+    
+    @property
+    def key(self) -> str:
+        return self.url
+    
+    def fetch(self, session, validators):
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+        
+        with session.get(self.url, headers=headers, timeout=self.timeout, stream=True) as response:
+            if response.status_code == 304:
+                return None, validators
+            response.raise_for_status()
+            
+            response.raw.decode_content = True
+            items = list(self.parser(response.raw, self.name, self.max_items))
+            return items, {
+                'etag': response.headers.get('ETag', ''),
+                'last_modified': response.headers.get('Last-Modified', ''),
+            }
+
+
+class RSSSource(HTTPFeedSource):
+    """RSS 2.0 or Atom feed"""
+    
+    parser = staticmethod(parse_xml_feed)
+
+
+class JSONSource(HTTPFeedSource):
+    """JSON Feed or NewsAPI-style JSON endpoint"""
+    
+    parser = staticmethod(parse_json_feed)
+
+
+class DirectorySource(FeedSource):
+    """
+    Local directory of feed files (``.rss``, ``.atom``, ``.xml``, ``.json``).
+    
+    File modification time and size stand in for ETags, so a file is only
+    re-read after it changes.
+    """
+    
+    def __init__(self, path: str, name: str = '', max_items: int = None):
+        super().__init__(name, max_items)
+        self.path = str(path)
+    
+    @property
+    def key(self) -> str:
+        return f'file://{os.path.abspath(self.path)}'
+    
+    def fetch(self, session, validators):
+        items = []
+        current = {}
+        changed = False
+        
+        for filename in sorted(os.listdir(self.path)):
+            parser = PARSERS.get(os.path.splitext(filename)[1].lower())
+            if parser is None:
+                continue
+            
+            file_path = os.path.join(self.path, filename)
+            stat = os.stat(file_path)
+            current[filename] = f'{stat.st_mtime_ns}-{stat.st_size}'
+            if validators.get(filename) == current[filename]:
+                continue
+            
+            changed = True
+            with open(file_path, 'rb') as stream:
+                items.extend(parser(stream, self.name, self.max_items))
+        
+        return (items if changed else None), current
+
+
+SOURCE_TYPES = {
+    'rss': RSSSource,
+    'json': JSONSource,
+    'directory': DirectorySource,
+}
+
+
+def build_sources(configs: Iterable[Dict] = None) -> List[FeedSource]:
+    """Instantiate sources from ``NEWS_FEEDS``-style configuration"""
+    sources = []
+    for config in (settings.NEWS_FEEDS if configs is None else configs):
+        options = dict(config)
+        source_type = options.pop('type')
+        source_class = SOURCE_TYPES.get(source_type) or import_string(source_type)
+        sources.append(source_class(**options))
+    return sources
+
+
+# Fetching
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Process-wide HTTP session whose connection pool is shared by all fetches"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=settings.NEWS_FEED_CONCURRENCY,
+                    pool_maxsize=settings.NEWS_FEED_CONCURRENCY,
+                    max_retries=Retry(total=2, backoff_factor=0.5, status_forcelist=(502, 503, 504))
+                )
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers['User-Agent'] = 'EcoSphere news fetcher'
+                _session = session
+    return _session
+
+
+class FeedFetcher:
+    """
+    Fetch a set of sources concurrently.
+    
+    New validators are held until ``commit`` so a run that fails after
+    fetching (say, while storing articles) re-reads the same feeds next time
+    instead of getting a 304 for items it never saved.
+    """
+    
+    VALIDATOR_KEY_TEMPLATE = 'news:feed-validators:{digest}'
+    
+    def __init__(self, sources: List[FeedSource] = None, concurrency: int = None):
+        self.sources = build_sources() if sources is None else sources
+        self.concurrency = concurrency or settings.NEWS_FEED_CONCURRENCY
+        self._pending = {}
+    
+    def _cache_key(self, source: FeedSource) -> str:
+        digest = hashlib.sha1(source.key.encode('utf-8')).hexdigest()
+        return self.VALIDATOR_KEY_TEMPLATE.format(digest=digest)
+    
+    def fetch(self) -> List[Dict]:
+        if not self.sources:
+            return []
+        
+        session = get_session()
+        keys = {source: self._cache_key(source) for source in self.sources}
+        validators = cache.get_many(list(keys.values()))
+        
+        items = []
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(self.sources))) as pool:
+            futures = {
+                pool.submit(source.fetch, session, validators.get(keys[source]) or {}): source
+                for source in self.sources
+            }
+            for future in as_completed(futures):
+                source = futures[future]
+                try:
+                    source_items, source_validators = future.result()
+                except Exception as e:
+                    logger.warning(f"Could not fetch news feed {source.key}: {e}")
+                    continue
+                
+                self._pending[keys[source]] = source_validators
+                if source_items:
+                    items.extend(source_items)
+        
+        return items
+    
+    def commit(self):
+        """Remember validators from the last fetch so unchanged feeds are skipped next time"""
+        if self._pending:
+            cache.set_many(self._pending, VALIDATOR_TTL)
+            self._pending = {}
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.6 on 2026-10-19 10:06
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def backfill_content_hash(apps, schema_editor):
+    NewsArticle = apps.get_model('news', 'NewsArticle')
+    
+    batch = []
+    for article in NewsArticle.objects.only('id', 'title', 'content').iterator(chunk_size=1000):
+        normalized = ' '.join(f'{article.title}\n{article.content}'.lower().split())
+        article.content_hash = hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+        batch.append(article)
+        if len(batch) == 1000:
+            NewsArticle.objects.bulk_update(batch, ['content_hash'])
+            batch = []
+    if batch:
+        NewsArticle.objects.bulk_update(batch, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsarticle',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 of the normalized title and content', max_length=64),
+        ),
+        migrations.RunPython(backfill_content_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,99 @@
+# Full-text search index for news articles (see apps.news.search).
+# PostgreSQL: a weighted tsvector column kept current by a trigger, with a GIN
+# index. SQLite: an external-content FTS5 table kept current by triggers.
+# Both triggers only fire when title, summary or content change, so counter
+# updates (views, bookmarks) do not re-index the row.
+
+from django.db import migrations
+
+POSTGRES_VECTOR = (
+    "setweight(to_tsvector('english', coalesce({row}title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce({row}summary, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce({row}content, '')), 'C')"
+)
+
+POSTGRES_FORWARD = [
+    'ALTER TABLE news_articles ADD COLUMN search_vector tsvector',
+    f'UPDATE news_articles SET search_vector = {POSTGRES_VECTOR.format(row="")}',
+    'CREATE INDEX news_articles_search_idx ON news_articles USING GIN (search_vector)',
+    f"""
+    CREATE FUNCTION news_articles_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := {POSTGRES_VECTOR.format(row="NEW.")};
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER news_articles_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, summary, content ON news_articles
+    FOR EACH ROW EXECUTE FUNCTION news_articles_search_vector_update()
+    """,
+]
+
+POSTGRES_REVERSE = [
+    'DROP TRIGGER IF EXISTS news_articles_search_vector_trigger ON news_articles',
+    'DROP FUNCTION IF EXISTS news_articles_search_vector_update()',
+    'DROP INDEX IF EXISTS news_articles_search_idx',
+    'ALTER TABLE news_articles DROP COLUMN IF EXISTS search_vector',
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE news_articles_fts USING fts5(
+        title, summary, content,
+        content='news_articles', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER news_articles_fts_insert AFTER INSERT ON news_articles BEGIN
+        INSERT INTO news_articles_fts(rowid, title, summary, content)
+        VALUES (new.id, new.title, new.summary, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER news_articles_fts_delete AFTER DELETE ON news_articles BEGIN
+        INSERT INTO news_articles_fts(news_articles_fts, rowid, title, summary, content)
+        VALUES ('delete', old.id, old.title, old.summary, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER news_articles_fts_update AFTER UPDATE OF title, summary, content ON news_articles BEGIN
+        INSERT INTO news_articles_fts(news_articles_fts, rowid, title, summary, content)
+        VALUES ('delete', old.id, old.title, old.summary, old.content);
+        INSERT INTO news_articles_fts(rowid, title, summary, content)
+        VALUES (new.id, new.title, new.summary, new.content);
+    END
+    """,
+    "INSERT INTO news_articles_fts(news_articles_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS news_articles_fts_insert',
+    'DROP TRIGGER IF EXISTS news_articles_fts_delete',
+    'DROP TRIGGER IF EXISTS news_articles_fts_update',
+    'DROP TABLE IF EXISTS news_articles_fts',
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        statements = statements_by_vendor.get(schema_editor.connection.vendor, [])
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0002_article_content_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            _run({'postgresql': POSTGRES_REVERSE, 'sqlite': SQLITE_REVERSE}),
+        ),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 5.0.6 on 2026-10-19 10:12
+
+import hashlib
+import re
+
+import django.db.models.deletion
+import numpy as np
+from django.db import migrations, models
+
+# Frozen copy of the fingerprint from apps.news.dedup as of this migration, so
+# later changes to the live algorithm do not change what this backfill writes.
+# 0007_refingerprint_articles reuses these helpers.
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+PRIME = np.uint64(4294967291)
+_random = np.random.default_rng(20240601)
+PERM_A = _random.integers(1, int(PRIME), size=NUM_PERM, dtype=np.uint64)
+PERM_B = _random.integers(0, int(PRIME), size=NUM_PERM, dtype=np.uint64)
+WORD_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def text_signature(text):
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        shingles = {' '.join(words)}
+    else:
+        shingles = {' '.join(words[start:start + SHINGLE_SIZE]) for start in range(len(words) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=4).digest(), 'big') for shingle in shingles),
+        dtype=np.uint64
+    )
+    return ((np.outer(hashes, PERM_A) + PERM_B) % PRIME).min(axis=0).astype(np.uint32)
+
+
+def band_keys(signature):
+    raw = signature.astype('<u4').tobytes()
+    width = ROWS * 4
+    return [
+        int.from_bytes(
+            hashlib.blake2b(bytes([band]) + raw[band * width:(band + 1) * width], digest_size=8).digest(),
+            'big', signed=True
+        )
+        for band in range(BANDS)
+    ]
+
+
+def write_fingerprints(apps, signature_of):
+    """Store ``signature_of(article)`` and its band keys for every article"""
+    NewsArticle = apps.get_model('news', 'NewsArticle')
+    ArticleFingerprintBand = apps.get_model('news', 'ArticleFingerprintBand')
+    
+    ArticleFingerprintBand.objects.all().delete()
+    articles, bands = [], []
+    for article in NewsArticle.objects.only('id', 'title', 'content').iterator(chunk_size=1000):
+        signature = signature_of(article)
+        article.minhash = signature.astype('<u4').tobytes()
+        articles.append(article)
+        bands += [ArticleFingerprintBand(article_id=article.id, key=key) for key in band_keys(signature)]
+        if len(articles) == 1000:
+            NewsArticle.objects.bulk_update(articles, ['minhash'])
+            ArticleFingerprintBand.objects.bulk_create(bands)
+            articles, bands = [], []
+    if articles:
+        NewsArticle.objects.bulk_update(articles, ['minhash'])
+        ArticleFingerprintBand.objects.bulk_create(bands)
+
+
+def backfill_minhash(apps, schema_editor):
+    write_fingerprints(apps, lambda article: text_signature(f'{article.title}\n{article.content}'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0003_article_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsarticle',
+            name='minhash',
+            field=models.BinaryField(blank=True, help_text='MinHash signature for near-duplicate detection', null=True),
+        ),
+        migrations.CreateModel(
+            name='ArticleFingerprintBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField(db_index=True)),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fingerprint_bands', to='news.newsarticle')),
+            ],
+            options={
+                'verbose_name': 'Article Fingerprint Band',
+                'verbose_name_plural': 'Article Fingerprint Bands',
+                'db_table': 'news_article_fingerprint_bands',
+            },
+        ),
+        migrations.RunPython(backfill_minhash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.0.6 on 2026-10-19 10:14
+
+import hashlib
+from importlib import import_module
+from urllib.parse import urlsplit, urlunsplit
+
+from django.db import migrations, models
+
+search_index = import_module('apps.news.migrations.0003_article_search_index')
+
+
+def backfill_url_hash(apps, schema_editor):
+    NewsArticle = apps.get_model('news', 'NewsArticle')
+    
+    # Older rows could share a URL; only the first keeps the hash, the rest
+    # stay NULL (allowed by the unique index) rather than being deleted
+    seen = set()
+    batch = []
+    for article in NewsArticle.objects.only('id', 'url').order_by('id').iterator(chunk_size=1000):
+        parts = urlsplit(article.url.strip())
+        normalized = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', parts.query, ''))
+        url_hash = hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+        if url_hash in seen:
+            continue
+        seen.add(url_hash)
+        article.url_hash = url_hash
+        batch.append(article)
+        if len(batch) == 1000:
+            NewsArticle.objects.bulk_update(batch, ['url_hash'])
+            batch = []
+    if batch:
+        NewsArticle.objects.bulk_update(batch, ['url_hash'])
+
+
+def restore_search_triggers(apps, schema_editor):
+    # SQLite adds (and removes) a unique column by rebuilding news_articles,
+    # which drops the FTS triggers created in 0003; recreate them and resync
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in search_index.SQLITE_REVERSE[:3] + search_index.SQLITE_FORWARD[1:]:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0004_article_minhash'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_search_triggers),
+        migrations.AddField(
+            model_name='newsarticle',
+            name='url_hash',
+            field=models.CharField(blank=True, editable=False, help_text='SHA-256 of the normalized URL', max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_url_hash, migrations.RunPython.noop),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.6 on 2026-10-19 10:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0005_article_url_hash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DigestSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text='Day the digest was built')),
+                ('payload', models.TextField(help_text='Serialized JSON response body')),
+                ('etag', models.CharField(help_text='SHA-256 of the payload', max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(blank=True, help_text='Owner of a personalized digest; empty for the shared digest', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='digest_snapshots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Digest Snapshot',
+                'verbose_name_plural': 'Digest Snapshots',
+                'db_table': 'news_digest_snapshots',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='digestsnapshot',
+            constraint=models.UniqueConstraint(fields=('user', 'date'), name='digest_snapshot_user_date_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='digestsnapshot',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', True)), fields=('date',), name='digest_snapshot_shared_date_uniq'),
+        ),
+    ]
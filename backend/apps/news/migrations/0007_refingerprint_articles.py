@@ -0,0 +1,37 @@
+# Recomputes article fingerprints after the signature switched to content
+# only (title included only for short content), so stored signatures and band
+# keys match what ingestion computes for new articles.
+
+from importlib import import_module
+
+from django.db import migrations
+
+fingerprints = import_module('apps.news.migrations.0004_article_minhash')
+
+MIN_CONTENT_WORDS = 20
+
+
+def content_signature(article):
+    content = article.content
+    if len(fingerprints.WORD_PATTERN.findall(content)) >= MIN_CONTENT_WORDS:
+        return fingerprints.text_signature(content)
+    return fingerprints.text_signature(f'{article.title}\n{content}')
+
+
+def refingerprint_articles(apps, schema_editor):
+    fingerprints.write_fingerprints(apps, content_signature)
+
+
+def restore_fingerprints(apps, schema_editor):
+    fingerprints.backfill_minhash(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0006_digest_snapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(refingerprint_articles, restore_fingerprints),
+    ]
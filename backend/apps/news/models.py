@@ -1,6 +1,10 @@
+import hashlib
+from urllib.parse import urlsplit, urlunsplit
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from . import dedup
+
 User = get_user_model()
 
 
@@ -40,6 +44,28 @@ class NewsArticle(models.Model):
         help_text='Original article URL'
     )
     
+    url_hash = models.CharField(
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text='SHA-256 of the normalized URL'
+    )
+    
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        help_text='SHA-256 of the normalized title and content'
+    )
+    
+    minhash = models.BinaryField(
+        null=True,
+        blank=True,
+        help_text='MinHash signature for near-duplicate detection'
+    )
+    
     image_url = models.URLField(
         blank=True,
         help_text='Article image URL'
@@ -86,6 +112,47 @@ class NewsArticle(models.Model):
     
     def __str__(self):
         return self.title
+    
+    @staticmethod
+    def compute_content_hash(title: str, content: str) -> str:
+        """Hash that identifies the same story regardless of whitespace and case"""
+        normalized = ' '.join(f'{title}\n{content}'.lower().split())
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def compute_url_hash(url: str) -> str:
+        """Hash that identifies a URL regardless of scheme/host case and fragment"""
+        parts = urlsplit(url.strip())
+        normalized = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', parts.query, ''))
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+    
+    def save(self, *args, **kwargs):
+        self.url_hash = self.compute_url_hash(self.url)
+        self.content_hash = self.compute_content_hash(self.title, self.content)
+        minhash = dedup.to_bytes(dedup.signature(self.title, self.content))
+        changed = self.minhash is None or bytes(self.minhash) != minhash
+        self.minhash = minhash
+        super().save(*args, **kwargs)
+        if changed:
+            dedup.index_articles([self])
+
+
+class ArticleFingerprintBand(models.Model):
+    """
+    One LSH band key of an article's MinHash signature (see apps.news.dedup)
+    """
+    article = models.ForeignKey(
+        NewsArticle,
+        on_delete=models.CASCADE,
+        related_name='fingerprint_bands'
+    )
+    
+    key = models.BigIntegerField(db_index=True)
+    
+    class Meta:
+        db_table = 'news_article_fingerprint_bands'
+        verbose_name = 'Article Fingerprint Band'
+        verbose_name_plural = 'Article Fingerprint Bands'
 
 
 class ArticleBookmark(models.Model):
@@ -153,3 +220,51 @@ class TrendingTopic(models.Model):
     
     def __str__(self):
         return f"{self.topic} ({self.date})"
+
+
+class DigestSnapshot(models.Model):
+    """
+    Prebuilt weekly digest response (see apps.news.digest)
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='digest_snapshots',
+        help_text='Owner of a personalized digest; empty for the shared digest'
+    )
+    
+    date = models.DateField(
+        help_text='Day the digest was built'
+    )
+    
+    payload = models.TextField(
+        help_text='Serialized JSON response body'
+    )
+    
+    etag = models.CharField(
+        max_length=64,
+        help_text='SHA-256 of the payload'
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'news_digest_snapshots'
+        verbose_name = 'Digest Snapshot'
+        verbose_name_plural = 'Digest Snapshots'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='digest_snapshot_user_date_uniq'),
+            models.UniqueConstraint(
+                fields=['date'],
+                condition=models.Q(user__isnull=True),
+                name='digest_snapshot_shared_date_uniq'
+            ),
+        ]
+    
+    def __str__(self):
+        owner = self.user.username if self.user_id else 'shared'
+        return f"Digest for {owner} ({self.date})"
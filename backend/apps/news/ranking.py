@@ -0,0 +1,258 @@
+"""
+Personalized ranking for the news feed.
+
+Scoring runs over a candidate set (the newest ``NEWS_RANKING_CANDIDATES``
+articles of the last ``NEWS_RANKING_WINDOW_DAYS``) held in each process as
+numpy arrays and rebuilt every ``CANDIDATE_TTL`` seconds. The feed lists the
+ranked candidates first and every other article after them, newest first. Each user has a
+precomputed profile: category affinities blended from bookmarks and views,
+plus the terms of their location. A request is one cached profile read and a
+handful of array operations::
+
+    score = recency * (1 + w_affinity * affinity[category]
+                         + w_trending * trending
+                         + w_location * mentions_location)
+
+Profiles are cached and rebuilt in the background when the user bookmarks,
+views or moves, the same way as chatbot context snapshots.
+"""
+import math
+import re
+import threading
+import time
+from datetime import timedelta
+from typing import Dict, List
+
+import numpy as np
+import redis
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+
+from ecosphere.redis_client import get_redis
+from .models import ArticleBookmark, NewsArticle
+from .trending import trending
+import logging
+
+logger = logging.getLogger(__name__)
+User = get_user_model()
+
+CATEGORIES = [code for code, _ in NewsArticle.CATEGORY_CHOICES]
+CATEGORY_INDEX = {code: index for index, code in enumerate(CATEGORIES)}
+
+WORD_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+class CandidateSet:
+    """Column arrays describing the articles eligible for ranking"""
+    
+    def __init__(self, ids, categories, published, trending_scores, postings):
+        self.ids = ids
+        self.categories = categories
+        self.published = published
+        self.trending = trending_scores
+        # word -> indexes of candidates whose title or summary contains it
+        self.postings = postings
+        self.built_at = time.monotonic()
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    def mentions(self, phrases: List[List[str]]) -> np.ndarray:
+        """1.0 for candidates containing every word of any phrase, else 0.0"""
+        matches = np.zeros(len(self.ids), dtype=np.float32)
+        empty = np.empty(0, dtype=np.int32)
+        for words in phrases:
+            indexes = self.postings.get(words[0], empty)
+            for word in words[1:]:
+                indexes = np.intersect1d(indexes, self.postings.get(word, empty), assume_unique=True)
+            matches[indexes] = 1.0
+        return matches
+
+
+class RankedFeed:
+    """
+    Article ids for the feed: ranked candidates first, then every other
+    article newest first.
+    
+    Sliceable and countable like a queryset, so the paginator only queries
+    the part of the catalogue a page actually reaches.
+    """
+    
+    def __init__(self, ranked_ids: List[int]):
+        self.ranked_ids = ranked_ids
+        self.rest = NewsArticle.objects.exclude(id__in=ranked_ids).order_by('-published_date', '-id')
+        self._count = None
+    
+    def count(self) -> int:
+        if self._count is None:
+            self._count = len(self.ranked_ids) + self.rest.count()
+        return self._count
+    
+    def __len__(self):
+        return self.count()
+    
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        ids = self.ranked_ids[start:stop]
+        if stop is None or stop > len(self.ranked_ids):
+            rest_start = max(start - len(self.ranked_ids), 0)
+            rest_stop = None if stop is None else stop - len(self.ranked_ids)
+            ids += list(self.rest.values_list('id', flat=True)[rest_start:rest_stop])
+        return ids
+
+
+class NewsRankingService:
+    """Per-user profiles and vectorized feed scoring"""
+    
+    PROFILE_KEY_TEMPLATE = 'news:ranking-profile:{user_id}'
+    PENDING_KEY_TEMPLATE = 'news:ranking-profile-pending:{user_id}'
+    VIEWS_KEY_TEMPLATE = 'news:category-views:{user_id}'
+    PROFILE_TIMEOUT = 60 * 60 * 24
+    VIEW_HISTORY_TTL = 60 * 60 * 24 * 90
+    REFRESH_DELAY = 30  # seconds; a reading session triggers one rebuild
+    CANDIDATE_TTL = 60
+    
+    BOOKMARK_WEIGHT = 3.0
+    VIEW_WEIGHT = 1.0
+    
+    def __init__(self):
+        self._candidates = None
+        self._candidates_lock = threading.Lock()
+    
+    # Profiles
+    
+    def record_view(self, user_id: int, category: str):
+        key = self.VIEWS_KEY_TEMPLATE.format(user_id=user_id)
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            pipe.hincrby(key, category, 1)
+            pipe.expire(key, self.VIEW_HISTORY_TTL)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Could not record article view for ranking: {e}")
+            return
+        self.schedule_profile_refresh(user_id)
+    
+    def get_profile(self, user_id: int) -> Dict:
+        profile = cache.get(self.PROFILE_KEY_TEMPLATE.format(user_id=user_id))
+        if profile is None:
+            profile = self.refresh_profile(user_id)
+        return profile
+    
+    def schedule_profile_refresh(self, user_id: int):
+        """Queue a rebuild unless one is already pending for this user"""
+        if cache.add(self.PENDING_KEY_TEMPLATE.format(user_id=user_id), 1, self.REFRESH_DELAY * 6):
+            from .tasks import refresh_news_profile
+            refresh_news_profile.apply_async((user_id,), countdown=self.REFRESH_DELAY)
+    
+    def refresh_profile(self, user_id: int) -> Dict:
+        cache.delete(self.PENDING_KEY_TEMPLATE.format(user_id=user_id))
+        
+        weights = np.zeros(len(CATEGORIES), dtype=np.float64)
+        bookmarks = ArticleBookmark.objects.filter(user_id=user_id).order_by().values(
+            'article__category'
+        ).annotate(count=Count('id'))
+        for row in bookmarks:
+            if row['article__category'] in CATEGORY_INDEX:
+                weights[CATEGORY_INDEX[row['article__category']]] += self.BOOKMARK_WEIGHT * row['count']
+        
+        try:
+            views = get_redis().hgetall(self.VIEWS_KEY_TEMPLATE.format(user_id=user_id))
+        except redis.RedisError:
+            views = {}
+        for category, count in views.items():
+            if category in CATEGORY_INDEX:
+                weights[CATEGORY_INDEX[category]] += self.VIEW_WEIGHT * int(count)
+        
+        # Scale so the user's favourite category scores 1
+        affinity = weights / weights.max() if weights.any() else weights
+        location = User.objects.filter(id=user_id).values_list('location', flat=True).first() or ''
+        
+        profile = {
+            'affinity': [round(float(value), 4) for value in affinity],
+            'location': [
+                words for words in (WORD_PATTERN.findall(part.lower()) for part in location.split(','))
+                if words
+            ],
+        }
+        cache.set(self.PROFILE_KEY_TEMPLATE.format(user_id=user_id), profile, self.PROFILE_TIMEOUT)
+        return profile
+    
+    # Candidates
+    
+    def get_candidates(self) -> CandidateSet:
+        candidates = self._candidates
+        if candidates is None or time.monotonic() - candidates.built_at > self.CANDIDATE_TTL:
+            with self._candidates_lock:
+                if self._candidates is candidates:
+                    self._candidates = self.build_candidates()
+                candidates = self._candidates
+        return candidates
+    
+    def build_candidates(self) -> CandidateSet:
+        since = timezone.now() - timedelta(days=settings.NEWS_RANKING_WINDOW_DAYS)
+        rows = list(
+            NewsArticle.objects.filter(published_date__gte=since)
+            .order_by('-published_date')
+            .values_list('id', 'category', 'published_date', 'title', 'summary')[:settings.NEWS_RANKING_CANDIDATES]
+        )
+        
+        try:
+            scores = dict(trending.top(trending.ARTICLES_KEY, settings.NEWS_RANKING_CANDIDATES))
+        except redis.RedisError:
+            scores = {}
+        top_score = max(scores.values(), default=0) or 1.0
+        
+        postings = {}
+        for index, (_, _, _, title, summary) in enumerate(rows):
+            for word in set(WORD_PATTERN.findall(f'{title} {summary}'.lower())):
+                postings.setdefault(word, []).append(index)
+        
+        return CandidateSet(
+            ids=np.array([row[0] for row in rows], dtype=np.int64),
+            categories=np.array([CATEGORY_INDEX.get(row[1], 0) for row in rows], dtype=np.int8),
+            published=np.array([row[2].timestamp() for row in rows], dtype=np.float64),
+            trending_scores=np.array(
+                [scores.get(str(row[0]), 0.0) / top_score for row in rows], dtype=np.float32
+            ),
+            postings={word: np.array(indexes, dtype=np.int32) for word, indexes in postings.items()}
+        )
+    
+    # Scoring
+    
+    def scores(self, profile: Dict, candidates: CandidateSet, now: float = None) -> np.ndarray:
+        weights = settings.NEWS_RANKING_WEIGHTS
+        now = now if now is not None else time.time()
+        
+        decay = math.log(2) / (settings.NEWS_RANKING_HALF_LIFE_HOURS * 3600)
+        recency = np.exp(-decay * np.maximum(now - candidates.published, 0))
+        affinity = np.asarray(profile['affinity'], dtype=np.float32)[candidates.categories]
+        
+        return recency * (
+            1.0
+            + weights['affinity'] * affinity
+            + weights['trending'] * candidates.trending
+            + weights['location'] * candidates.mentions(profile['location'])
+        )
+    
+    def rank(self, user) -> List[int]:
+        """Candidate article ids, best first, for the user's feed"""
+        candidates = self.get_candidates()
+        if not len(candidates):
+            return []
+        
+        scores = self.scores(self.get_profile(user.id), candidates)
+        order = np.argsort(-scores, kind='stable')
+        return candidates.ids[order].tolist()
+    
+    def feed(self, user) -> RankedFeed:
+        """The user's ranked candidates followed by the rest of the catalogue"""
+        return RankedFeed(self.rank(user))
+
+
+news_ranking = NewsRankingService()
@@ -0,0 +1,108 @@
+"""
+Ranked full-text search over news articles.
+
+Uses the index created by migration ``0003_article_search_index``: a weighted
+``tsvector`` with a GIN index on PostgreSQL and an FTS5 table on SQLite.
+Titles weigh more than summaries, which weigh more than full content. Every
+query term is prefix-matched so results appear while the user is typing, and
+each hit carries a highlighted snippet of its summary. The database marks
+matches with private-use sentinels; the snippet is HTML-escaped before they
+become ``<mark>`` tags, since summaries come from feeds and the model. Other
+databases fall back to unranked substring matching.
+"""
+import html
+import re
+from typing import Dict, List
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import NewsArticle
+
+TERM_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+MAX_TERMS = 8
+HIGHLIGHT_START = '\ue000'
+HIGHLIGHT_STOP = '\ue001'
+
+POSTGRES_SEARCH_SQL = f"""
+SELECT id, title, summary, category, published_date, rank,
+       ts_headline('english', summary, query,
+                   'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, MaxFragments=2, MaxWords=30, MinWords=10'
+       ) AS highlight
+FROM (
+    SELECT id, title, summary, category, published_date, query,
+           ts_rank_cd(search_vector, query) AS rank
+    FROM news_articles, to_tsquery('english', %s) AS query
+    WHERE search_vector @@ query
+    ORDER BY rank DESC, published_date DESC
+    LIMIT %s OFFSET %s
+) AS hits
+ORDER BY rank DESC, published_date DESC
+"""
+
+# bm25() returns lower-is-better scores; column weights are title, summary, content
+SQLITE_SEARCH_SQL = f"""
+SELECT a.id, a.title, a.summary, a.category, a.published_date,
+       -bm25(news_articles_fts, 10.0, 4.0, 1.0) AS rank,
+       snippet(news_articles_fts, 1, '{HIGHLIGHT_START}', '{HIGHLIGHT_STOP}', '...', 24) AS highlight
+FROM news_articles_fts
+JOIN news_articles a ON a.id = news_articles_fts.rowid
+WHERE news_articles_fts MATCH %s
+ORDER BY bm25(news_articles_fts, 10.0, 4.0, 1.0), a.published_date DESC
+LIMIT %s OFFSET %s
+"""
+
+
+def parse_terms(query: str) -> List[str]:
+    """Split user input into search terms, dropping operators and punctuation"""
+    return TERM_PATTERN.findall(query.lower())[:MAX_TERMS]
+
+
+def render_highlight(snippet: str) -> str:
+    """Escape a snippet and turn the match sentinels into ``<mark>`` tags"""
+    return (
+        html.escape(snippet or '')
+        .replace(HIGHLIGHT_START, '<mark>')
+        .replace(HIGHLIGHT_STOP, '</mark>')
+    )
+
+
+def search_articles(query: str, limit: int = 20, offset: int = 0) -> List[Dict]:
+    """Return matching articles, best first, as dicts with ``rank`` and ``highlight``"""
+    terms = parse_terms(query)
+    if not terms:
+        return []
+    
+    vendor = connection.vendor
+    if vendor == 'postgresql':
+        sql = POSTGRES_SEARCH_SQL
+        expression = ' & '.join(f'{term}:*' for term in terms)
+    elif vendor == 'sqlite':
+        sql = SQLITE_SEARCH_SQL
+        expression = ' '.join(f'"{term}"*' for term in terms)
+    else:
+        return _substring_search(terms, limit, offset)
+    
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [expression, limit, offset])
+        columns = [column[0] for column in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    
+    for row in rows:
+        row['highlight'] = render_highlight(row['highlight'])
+        if vendor == 'sqlite':
+            # Raw SQLite rows bypass the model field's datetime conversion
+            row['published_date'] = connection.ops.convert_datetimefield_value(row['published_date'], None, connection)
+    return rows
+
+
+def _substring_search(terms: List[str], limit: int, offset: int) -> List[Dict]:
+    condition = Q()
+    for term in terms:
+        condition &= Q(title__icontains=term) | Q(summary__icontains=term) | Q(content__icontains=term)
+    
+    articles = NewsArticle.objects.filter(condition).order_by('-published_date').values(
+        'id', 'title', 'summary', 'category', 'published_date'
+    )[offset:offset + limit]
+    return [dict(article, rank=None, highlight=html.escape(article['summary'][:200])) for article in articles]
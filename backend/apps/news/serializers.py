@@ -3,15 +3,24 @@ from .models import NewsArticle, ArticleBookmark, TrendingTopic
 
 
 class NewsArticleSerializer(serializers.ModelSerializer):
-    """Serializer for NewsArticle model"""
+    """
+    Serializer for NewsArticle model.
+    
+    ``is_bookmarked`` reads the ``bookmarked_ids`` set from the serializer
+    context, so flagging a whole page costs no queries.
+    """
+    is_bookmarked = serializers.SerializerMethodField()
     
     class Meta:
         model = NewsArticle
         fields = [
             'id', 'title', 'summary', 'content', 'source', 'url',
             'image_url', 'category', 'published_date', 'is_featured',
-            'is_trending', 'view_count', 'bookmark_count'
+            'is_trending', 'view_count', 'bookmark_count', 'is_bookmarked'
         ]
+    
+    def get_is_bookmarked(self, obj):
+        return obj.id in self.context.get('bookmarked_ids', ())
 
 
 class ArticleBookmarkSerializer(serializers.ModelSerializer):
@@ -0,0 +1,251 @@
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from typing import Dict, Iterable, Optional, Set
+import logging
+import redis
+
+from ecosphere.redis_client import get_redis
+from .models import ArticleBookmark, NewsArticle
+
+logger = logging.getLogger(__name__)
+
+
+class ArticleCounterService:
+    """
+    Write-behind view and bookmark counters for news articles.
+    
+    Increments land in Redis hashes (one field per article). ``flush`` swaps
+    the hashes out atomically and applies the summed deltas with one UPDATE
+    per batch of articles, so each article row is written at most once per
+    flush however many times it was viewed.
+    """
+    
+    COUNTERS = {
+        'view_count': 'news:counters:views',
+        'bookmark_count': 'news:counters:bookmarks',
+    }
+    FLUSH_BATCH_SIZE = 500
+    
+    def record_view(self, article_id: int):
+        self._record('view_count', article_id, 1)
+    
+    def record_bookmark(self, article_id: int, delta: int = 1):
+        self._record('bookmark_count', article_id, delta)
+    
+    def _record(self, field: str, article_id: int, delta: int):
+        try:
+            get_redis().hincrby(self.COUNTERS[field], article_id, delta)
+        except redis.RedisError as e:
+            # A lost increment is better than failing the request
+            logger.warning(f"Could not record article {field} change: {e}")
+    
+    def pending(self, article_ids: Iterable[int]) -> Dict[int, Dict[str, int]]:
+        """Deltas not yet flushed, per article and counter field"""
+        article_ids = list(article_ids)
+        if not article_ids:
+            return {}
+        
+        pipe = get_redis().pipeline(transaction=False)
+        for key in self.COUNTERS.values():
+            pipe.hmget(key, article_ids)
+        try:
+            results = pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Could not read pending article counters: {e}")
+            return {}
+        
+        return {
+            article_id: {
+                field: int(values[index] or 0)
+                for field, values in zip(self.COUNTERS, results)
+            }
+            for index, article_id in enumerate(article_ids)
+        }
+    
+    def apply_pending(self, articles: Iterable[NewsArticle]):
+        """Add unflushed deltas to loaded articles so responses show live counts"""
+        articles = list(articles)
+        pending = self.pending(article.id for article in articles)
+        for article in articles:
+            for field, delta in pending.get(article.id, {}).items():
+                setattr(article, field, max(getattr(article, field) + delta, 0))
+        return articles
+    
+    def flush(self) -> int:
+        """Move buffered deltas into the database; returns the number of articles updated"""
+        client = get_redis()
+        deltas = {}
+        
+        for field, key in self.COUNTERS.items():
+            # Take the hash and clear it in one step; increments arriving after
+            # this start a fresh hash for the next flush
+            pipe = client.pipeline()
+            pipe.hgetall(key)
+            pipe.delete(key)
+            values, _ = pipe.execute()
+            
+            for article_id, delta in values.items():
+                if int(delta):
+                    deltas.setdefault(int(article_id), {})[field] = int(delta)
+        
+        if not deltas:
+            return 0
+        
+        article_ids = sorted(deltas)
+        try:
+            with transaction.atomic():
+                for start in range(0, len(article_ids), self.FLUSH_BATCH_SIZE):
+                    batch = article_ids[start:start + self.FLUSH_BATCH_SIZE]
+                    NewsArticle.objects.filter(id__in=batch).update(**{
+                        field: Greatest(F(field) + self._delta_case(batch, deltas, field), Value(0))
+                        for field in self.COUNTERS
+                    })
+        except Exception:
+            # Put the deltas back so the next flush retries them
+            pipe = client.pipeline()
+            for article_id, fields in deltas.items():
+                for field, delta in fields.items():
+                    pipe.hincrby(self.COUNTERS[field], article_id, delta)
+            pipe.execute()
+            raise
+        
+        return len(article_ids)
+    
+    def _delta_case(self, batch, deltas, field):
+        return Case(
+            *[
+                When(id=article_id, then=Value(deltas[article_id][field]))
+                for article_id in batch if field in deltas[article_id]
+            ],
+            default=Value(0),
+            output_field=IntegerField()
+        )
+
+
+article_counters = ArticleCounterService()
+
+
+POPULATE_BOOKMARKS_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+for i = 3, #ARGV, 1000 do
+    redis.call('SADD', KEYS[1], unpack(ARGV, i, math.min(i + 999, #ARGV)))
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+UPDATE_BOOKMARKS_SCRIPT = """
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call(ARGV[1], KEYS[1], ARGV[2])
+end
+return 1
+"""
+
+
+class BookmarkService:
+    """
+    Single-statement bookmark writes and a cached set of bookmarked article ids.
+    
+    Adding is one ``INSERT ... SELECT ... ON CONFLICT DO NOTHING`` (which also
+    checks the article exists) and removing is one ``DELETE``. Each user's
+    bookmarked ids live in a Redis set that is loaded on first use and updated
+    in place (SADD/SREM) on every change, so feed pages flag bookmarks without
+    a query. Every change also bumps a per-user version; a load only stores
+    its set if the version is unchanged since it read the database, so a load
+    racing a toggle cannot cache the old state.
+    """
+    
+    KEY_TEMPLATE = 'news:bookmarked:{user_id}'
+    VERSION_KEY_TEMPLATE = 'news:bookmarked-version:{user_id}'
+    TIMEOUT = 60 * 60 * 6  # also bounds staleness if a change could not reach Redis
+    EMPTY_MARKER = '0'  # keeps an empty set cached; article ids start at 1
+    
+    INSERT_SQL = """
+        INSERT INTO {bookmarks} (user_id, article_id, created_at)
+        SELECT %s, id, %s FROM {articles} WHERE id = %s
+        ON CONFLICT (user_id, article_id) DO NOTHING
+    """
+    
+    def __init__(self):
+        self._populate = None
+        self._update = None
+    
+    def _keys(self, user_id: int):
+        return [self.KEY_TEMPLATE.format(user_id=user_id), self.VERSION_KEY_TEMPLATE.format(user_id=user_id)]
+    
+    def _scripts(self, client):
+        if self._populate is None:
+            self._populate = client.register_script(POPULATE_BOOKMARKS_SCRIPT)
+            self._update = client.register_script(UPDATE_BOOKMARKS_SCRIPT)
+        return self._populate, self._update
+    
+    def add(self, user_id: int, article_id: int) -> Optional[bool]:
+        """True if added, False if already bookmarked, None if the article does not exist"""
+        sql = self.INSERT_SQL.format(
+            bookmarks=connection.ops.quote_name(ArticleBookmark._meta.db_table),
+            articles=connection.ops.quote_name(NewsArticle._meta.db_table)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [user_id, connection.ops.adapt_datetimefield_value(timezone.now()), article_id])
+            inserted = cursor.rowcount > 0
+        
+        if inserted:
+            transaction.on_commit(lambda: self._apply(user_id, 'SADD', article_id))
+            return True
+        # Nothing inserted: either a duplicate or a missing article
+        return False if NewsArticle.objects.filter(id=article_id).exists() else None
+    
+    def remove(self, user_id: int, article_id: int) -> bool:
+        deleted, _ = ArticleBookmark.objects.filter(user_id=user_id, article_id=article_id).delete()
+        if deleted:
+            transaction.on_commit(lambda: self._apply(user_id, 'SREM', article_id))
+        return bool(deleted)
+    
+    def toggle(self, user_id: int, article_id: int) -> Optional[bool]:
+        """New bookmark state, or None if the article does not exist"""
+        if self.remove(user_id, article_id):
+            return False
+        return self.add(user_id, article_id)
+    
+    def bookmarked_ids(self, user_id: int) -> Set[int]:
+        client = get_redis()
+        key, version_key = self._keys(user_id)
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.smembers(key)
+            pipe.get(version_key)
+            members, version = pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Could not read cached bookmarks, querying the database: {e}")
+            return set(ArticleBookmark.objects.filter(user_id=user_id).values_list('article_id', flat=True))
+        
+        if not members:
+            members = {self.EMPTY_MARKER} | {
+                str(article_id) for article_id in
+                ArticleBookmark.objects.filter(user_id=user_id).values_list('article_id', flat=True)
+            }
+            populate, _ = self._scripts(client)
+            try:
+                populate(keys=[key, version_key], args=[version or '0', self.TIMEOUT, *members], client=client)
+            except redis.RedisError as e:
+                logger.warning(f"Could not cache bookmarks: {e}")
+        return {int(member) for member in members if member != self.EMPTY_MARKER}
+    
+    def _apply(self, user_id: int, command: str, article_id: int):
+        """Mirror a committed change in the cached set, if one is loaded"""
+        client = get_redis()
+        _, update = self._scripts(client)
+        try:
+            update(keys=self._keys(user_id), args=[command, article_id, self.TIMEOUT], client=client)
+        except redis.RedisError as e:
+            logger.warning(f"Could not update cached bookmarks for user {user_id}: {e}")
+
+
+bookmarks = BookmarkService()
@@ -0,0 +1,18 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .ranking import news_ranking
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def refresh_news_profile_on_location_change(sender, instance, created, update_fields=None, **kwargs):
+    """The user's location feeds their news ranking profile"""
+    if created:
+        return
+    if update_fields is not None and 'location' not in update_fields:
+        return
+    transaction.on_commit(lambda: news_ranking.schedule_profile_refresh(instance.pk))
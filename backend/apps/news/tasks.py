@@ -0,0 +1,65 @@
+from celery import shared_task
+import logging
+
+from apps.chatbot.services import NewsCurationService
+from apps.news.digest import digests
+from apps.news.ranking import news_ranking
+from apps.news.services import article_counters
+from apps.news.trending import trending
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def flush_article_counters():
+    """Write buffered article view and bookmark counts to the database"""
+    try:
+        updated = article_counters.flush()
+        if updated:
+            logger.info(f"Flushed counters for {updated} articles")
+        
+    except Exception as e:
+        logger.error(f"Error flushing article counters: {e}")
+
+
+@shared_task
+def materialize_trending():
+    """Store the current top trending topics and flag trending articles"""
+    try:
+        topics, articles = trending.materialize()
+        logger.info(f"Trending updated: {topics} topics, {articles} articles")
+        
+    except Exception as e:
+        logger.error(f"Error materializing trending data: {e}")
+
+
+@shared_task
+def build_news_digests():
+    """Prebuild the shared and personalized weekly digests"""
+    try:
+        articles, personalized = digests.build()
+        logger.info(f"Digests built: {articles} articles, {personalized} personalized")
+        
+    except Exception as e:
+        logger.error(f"Error building news digests: {e}")
+
+
+@shared_task
+def refresh_news_profile(user_id):
+    """Rebuild a user's news ranking profile after their reading activity changed"""
+    try:
+        news_ranking.refresh_profile(user_id)
+        
+    except Exception as e:
+        logger.error(f"Error refreshing news profile for user {user_id}: {e}")
+
+
+@shared_task
+def recurate_news_articles():
+    """Re-run curation over stored articles after a prompt or model change"""
+    try:
+        processed, updated = NewsCurationService().recurate_articles()
+        logger.info(f"Re-curated {processed} articles, {updated} changed")
+        
+    except Exception as e:
+        logger.error(f"Error re-curating news articles: {e}")
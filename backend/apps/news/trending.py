@@ -0,0 +1,202 @@
+"""
+Streaming trending scores for search topics and articles.
+
+Events (searches, article views, bookmarks) are folded into Redis sorted sets
+with forward exponential decay: an event at time ``t`` adds
+``weight * exp(lambda * (t - landmark))``, so older events lose weight
+relative to new ones without ever rewriting old entries. The landmark is
+moved forward periodically (rescaling every score in one ZUNIONSTORE) to keep
+the numbers finite. Each set is trimmed to ``TRENDING_MAX_TRACKED`` members on
+every write, and daily search counts go into a fixed-size count-min sketch,
+so memory stays bounded however many distinct queries arrive.
+
+``materialize`` copies the current top topics into ``TrendingTopic`` and
+flags the top articles with ``NewsArticle.is_trending``.
+"""
+import math
+import time
+import zlib
+from datetime import date
+from decimal import Decimal
+from typing import List, Tuple
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from ecosphere.redis_client import get_redis
+from .models import NewsArticle, TrendingTopic
+import logging
+
+logger = logging.getLogger(__name__)
+
+# KEYS: zset, landmark, sketch (or '' for none). ARGV: now, lambda, weight,
+# member, max_members, sketch_ttl, then the sketch field names for the member.
+RECORD_SCRIPT = """
+local now = tonumber(ARGV[1])
+local landmark = tonumber(redis.call('GET', KEYS[2]))
+if not landmark then
+    landmark = now
+    redis.call('SET', KEYS[2], landmark)
+end
+
+local increment = tonumber(ARGV[3]) * math.exp(tonumber(ARGV[2]) * (now - landmark))
+redis.call('ZINCRBY', KEYS[1], increment, ARGV[4])
+redis.call('ZREMRANGEBYRANK', KEYS[1], 0, -(tonumber(ARGV[5]) + 1))
+
+if KEYS[3] ~= '' then
+    for i = 7, #ARGV do
+        redis.call('HINCRBY', KEYS[3], ARGV[i], 1)
+    end
+    redis.call('EXPIRE', KEYS[3], tonumber(ARGV[6]))
+end
+return 1
+"""
+
+# KEYS: zset, landmark. ARGV: now, lambda, rebase_after.
+# Moves the landmark to now and rescales scores once it is older than rebase_after.
+REBASE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local landmark = tonumber(redis.call('GET', KEYS[2]))
+if not landmark or now - landmark < tonumber(ARGV[3]) then
+    return 0
+end
+
+local factor = math.exp(-tonumber(ARGV[2]) * (now - landmark))
+redis.call('ZUNIONSTORE', KEYS[1], 1, KEYS[1], 'WEIGHTS', factor)
+redis.call('SET', KEYS[2], now)
+return 1
+"""
+
+
+class CountMinSketch:
+    """Hash field layout for a count-min sketch stored in one Redis hash"""
+    
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.depth = depth
+    
+    def fields(self, member: str) -> List[str]:
+        encoded = member.encode('utf-8')
+        return [f'{row}:{zlib.crc32(encoded, row) % self.width}' for row in range(self.depth)]
+    
+    def estimate(self, client, key: str, member: str) -> int:
+        values = client.hmget(key, self.fields(member))
+        return min(int(value or 0) for value in values)
+
+
+class TrendingService:
+    """Decayed trending counters for search topics and articles"""
+    
+    TOPICS_KEY = 'trending:topics'
+    ARTICLES_KEY = 'trending:articles'
+    SEARCH_COUNTS_KEY_TEMPLATE = 'trending:search-counts:{date}'
+    LANDMARK_SUFFIX = ':landmark'
+    MAX_TOPIC_LENGTH = 100
+    
+    VIEW_WEIGHT = 1.0
+    BOOKMARK_WEIGHT = 3.0
+    SEARCH_WEIGHT = 1.0
+    
+    def __init__(self):
+        self.sketch = CountMinSketch()
+        self._record = None
+        self._rebase = None
+    
+    @property
+    def decay_rate(self) -> float:
+        return math.log(2) / (settings.TRENDING_HALF_LIFE_HOURS * 3600)
+    
+    def _scripts(self, client):
+        if self._record is None:
+            self._record = client.register_script(RECORD_SCRIPT)
+            self._rebase = client.register_script(REBASE_SCRIPT)
+        return self._record, self._rebase
+    
+    def _add(self, key: str, member: str, weight: float, sketch_key: str = ''):
+        client = get_redis()
+        record, _ = self._scripts(client)
+        args = [
+            time.time(), self.decay_rate, weight, member,
+            settings.TRENDING_MAX_TRACKED, 60 * 60 * 48
+        ]
+        if sketch_key:
+            args += self.sketch.fields(member)
+        try:
+            record(keys=[key, key + self.LANDMARK_SUFFIX, sketch_key], args=args, client=client)
+        except redis.RedisError as e:
+            logger.warning(f"Could not record trending event: {e}")
+    
+    # Event sources
+    
+    def record_search(self, terms: List[str]):
+        topic = ' '.join(terms)[:self.MAX_TOPIC_LENGTH]
+        if topic:
+            self._add(
+                self.TOPICS_KEY, topic, self.SEARCH_WEIGHT,
+                self.SEARCH_COUNTS_KEY_TEMPLATE.format(date=timezone.now().date().isoformat())
+            )
+    
+    def record_view(self, article_id: int):
+        self._add(self.ARTICLES_KEY, str(article_id), self.VIEW_WEIGHT)
+    
+    def record_bookmark(self, article_id: int):
+        self._add(self.ARTICLES_KEY, str(article_id), self.BOOKMARK_WEIGHT)
+    
+    # Reading
+    
+    def top(self, key: str, limit: int) -> List[Tuple[str, float]]:
+        """Top members with scores decayed to the present"""
+        client = get_redis()
+        landmark = client.get(key + self.LANDMARK_SUFFIX)
+        if landmark is None:
+            return []
+        
+        scale = math.exp(-self.decay_rate * (time.time() - float(landmark)))
+        return [
+            (member, score * scale)
+            for member, score in client.zrevrange(key, 0, limit - 1, withscores=True)
+        ]
+    
+    def rebase(self):
+        client = get_redis()
+        _, rebase = self._scripts(client)
+        rebase_after = settings.TRENDING_HALF_LIFE_HOURS * 3600 * 4
+        for key in (self.TOPICS_KEY, self.ARTICLES_KEY):
+            rebase(keys=[key, key + self.LANDMARK_SUFFIX], args=[time.time(), self.decay_rate, rebase_after], client=client)
+    
+    def materialize(self, today: date = None) -> Tuple[int, int]:
+        """Store today's top topics and flag the top articles; returns their counts"""
+        self.rebase()
+        today = today or timezone.now().date()
+        client = get_redis()
+        
+        topics = self.top(self.TOPICS_KEY, settings.TRENDING_TOP_TOPICS)
+        sketch_key = self.SEARCH_COUNTS_KEY_TEMPLATE.format(date=today.isoformat())
+        rows = [
+            TrendingTopic(
+                topic=topic,
+                date=today,
+                search_count=self.sketch.estimate(client, sketch_key, topic),
+                trend_score=Decimal(min(score, 999.99)).quantize(Decimal('0.01'))
+            )
+            for topic, score in topics
+        ]
+        article_ids = [int(member) for member, _ in self.top(self.ARTICLES_KEY, settings.TRENDING_TOP_ARTICLES)]
+        
+        with transaction.atomic():
+            TrendingTopic.objects.filter(date=today).exclude(topic__in=[row.topic for row in rows]).delete()
+            TrendingTopic.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['topic', 'date'],
+                update_fields=['search_count', 'trend_score']
+            )
+            NewsArticle.objects.filter(is_trending=True).exclude(id__in=article_ids).update(is_trending=False)
+            NewsArticle.objects.filter(id__in=article_ids, is_trending=False).update(is_trending=True)
+        
+        return len(rows), len(article_ids)
+
+
+trending = TrendingService()
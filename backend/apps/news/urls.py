@@ -4,6 +4,7 @@ from . import views
 
 router = DefaultRouter()
 router.register(r'articles', views.NewsArticleViewSet, basename='news-article')
+router.register(r'bookmarks', views.ArticleBookmarkViewSet, basename='article-bookmark')
 
 urlpatterns = [
     path('', include(router.urls)),
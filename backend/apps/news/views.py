@@ -1,25 +1,88 @@
+from django.http import HttpResponse
+from django.utils.http import parse_etags
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
-from django.db.models import Q
+from .digest import digests
 from .models import NewsArticle, ArticleBookmark, TrendingTopic
+from .ranking import news_ranking
+from .search import parse_terms, search_articles
+from .serializers import ArticleBookmarkSerializer, NewsArticleSerializer
+from .services import article_counters, bookmarks
+from .trending import trending
 
 
 class NewsArticleViewSet(viewsets.ReadOnlyModelViewSet):
-    """ViewSet for news articles"""
+    """
+    ViewSet for news articles.
+    
+    The list is the user's personalized feed: recent articles ranked for them
+    (see ``apps.news.ranking``), then older ones newest first.
+    ``?ordering=latest`` lists every article newest first.
+    """
+    serializer_class = NewsArticleSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
         return NewsArticle.objects.all().order_by('-published_date')
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request and self.request.user.is_authenticated:
+            context['bookmarked_ids'] = bookmarks.bookmarked_ids(self.request.user.id)
+        return context
+    
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('ordering') == 'latest':
+            return super().list(request, *args, **kwargs)
+        
+        page_ids = self.paginator.paginate_queryset(news_ranking.feed(request.user), request, view=self)
+        articles = NewsArticle.objects.in_bulk(page_ids)
+        page = article_counters.apply_pending(articles[article_id] for article_id in page_ids if article_id in articles)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+    
+    def retrieve(self, request, *args, **kwargs):
+        article = self.get_object()
+        article_counters.record_view(article.id)
+        trending.record_view(article.id)
+        news_ranking.record_view(request.user.id, article.category)
+        article_counters.apply_pending([article])
+        return Response(self.get_serializer(article).data)
+    
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        return article_counters.apply_pending(page) if page is not None else page
 
 
 class ArticleBookmarkViewSet(viewsets.ModelViewSet):
-    """ViewSet for article bookmarks"""
+    """ViewSet for article bookmarks; listing runs a fixed two queries per page"""
+    serializer_class = ArticleBookmarkSerializer
     permission_classes = [IsAuthenticated]
+    # Bookmarks are created through BookmarkArticleView
+    http_method_names = ['get', 'delete', 'head', 'options']
     
     def get_queryset(self):
-        return ArticleBookmark.objects.filter(user=self.request.user).order_by('-created_at')
+        return ArticleBookmark.objects.filter(
+            user=self.request.user
+        ).select_related('article').order_by('-created_at')
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request and self.request.user.is_authenticated:
+            context['bookmarked_ids'] = bookmarks.bookmarked_ids(self.request.user.id)
+        return context
+    
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            article_counters.apply_pending(bookmark.article for bookmark in page)
+        return page
+    
+    def perform_destroy(self, instance):
+        if bookmarks.remove(instance.user_id, instance.article_id):
+            article_counters.record_bookmark(instance.article_id, -1)
+            news_ranking.schedule_profile_refresh(instance.user_id)
 
 
 class TrendingTopicViewSet(viewsets.ReadOnlyModelViewSet):
@@ -32,56 +95,60 @@ class TrendingTopicViewSet(viewsets.ReadOnlyModelViewSet):
 
 # API Views
 class BookmarkArticleView(APIView):
-    """API view to bookmark/unbookmark an article"""
+    """
+    API view to bookmark/unbookmark an article.
+    
+    POST toggles the bookmark; DELETE removes it. Each write is a single
+    statement (see ``BookmarkService``).
+    """
     permission_classes = [IsAuthenticated]
     
     def post(self, request, article_id):
-        try:
-            article = NewsArticle.objects.get(id=article_id)
-        except NewsArticle.DoesNotExist:
+        bookmarked = bookmarks.toggle(request.user.id, article_id)
+        if bookmarked is None:
             return Response(
                 {'error': 'Article not found'}, 
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        bookmark, created = ArticleBookmark.objects.get_or_create(
-            user=request.user,
-            article=article
-        )
-        
-        if created:
-            return Response({'message': 'Article bookmarked'}, status=status.HTTP_201_CREATED)
+        self._record_change(request.user.id, article_id, bookmarked)
+        if bookmarked:
+            return Response({'message': 'Article bookmarked', 'bookmarked': True}, status=status.HTTP_201_CREATED)
         else:
-            bookmark.delete()
-            return Response({'message': 'Article unbookmarked'}, status=status.HTTP_200_OK)
+            return Response({'message': 'Article unbookmarked', 'bookmarked': False}, status=status.HTTP_200_OK)
+    
+    def delete(self, request, article_id):
+        if bookmarks.remove(request.user.id, article_id):
+            self._record_change(request.user.id, article_id, False)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    def _record_change(self, user_id, article_id, bookmarked):
+        article_counters.record_bookmark(article_id, 1 if bookmarked else -1)
+        if bookmarked:
+            trending.record_bookmark(article_id)
+        news_ranking.schedule_profile_refresh(user_id)
 
 
 class WeeklyDigestView(APIView):
-    """API view for weekly digest"""
+    """
+    API view for weekly digest.
+    
+    Serves the prebuilt snapshot (personalized when one exists) as-is, with
+    an ETag so unchanged digests revalidate with a 304.
+    """
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        # Get articles from the last week
-        from datetime import datetime, timedelta
-        week_ago = datetime.now() - timedelta(days=7)
-        
-        articles = NewsArticle.objects.filter(
-            published_date__gte=week_ago
-        ).order_by('-published_date')[:10]
+        etag, body = digests.get(request.user)
+        etag = f'"{etag}"'
         
-        # This would typically use a serializer
-        data = {
-            'articles': [
-                {
-                    'id': article.id,
-                    'title': article.title,
-                    'summary': article.summary,
-                    'published_date': article.published_date
-                } for article in articles
-            ]
-        }
-        
-        return Response(data)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
 
 
 class TrendingTopicsView(APIView):
@@ -89,13 +156,14 @@ class TrendingTopicsView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        topics = TrendingTopic.objects.all().order_by('-trend_score', '-date')[:10]
+        topics = TrendingTopic.objects.all().order_by('-date', '-trend_score')[:10]
         
         data = {
             'topics': [
                 {
                     'id': topic.id,
-                    'name': topic.name,
+                    'name': topic.topic,
+                    'search_count': topic.search_count,
                     'trend_score': topic.trend_score,
                     'date': topic.date
                 } for topic in topics
@@ -106,26 +174,40 @@ class TrendingTopicsView(APIView):
 
 
 class SearchArticlesView(APIView):
-    """API view to search articles"""
+    """
+    API view to search articles.
+    
+    Results are ranked by relevance (title matches first) and include a
+    ``highlight`` snippet with matched terms wrapped in ``<mark>`` tags.
+    """
     permission_classes = [IsAuthenticated]
+    MAX_LIMIT = 50
     
     def get(self, request):
         query = request.GET.get('q', '')
         if not query:
             return Response({'error': 'Query parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        articles = NewsArticle.objects.filter(
-            Q(title__icontains=query) | Q(content__icontains=query) | Q(summary__icontains=query)
-        ).order_by('-published_date')[:20]
+        try:
+            limit = max(1, min(int(request.GET.get('limit', 20)), self.MAX_LIMIT))
+            offset = max(int(request.GET.get('offset', 0)), 0)
+        except ValueError:
+            return Response({'error': 'limit and offset must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if offset == 0:
+            trending.record_search(parse_terms(query))
         
         data = {
             'articles': [
                 {
-                    'id': article.id,
-                    'title': article.title,
-                    'summary': article.summary,
-                    'published_date': article.published_date
-                } for article in articles
+                    'id': article['id'],
+                    'title': article['title'],
+                    'summary': article['summary'],
+                    'category': article['category'],
+                    'published_date': article['published_date'],
+                    'rank': article['rank'],
+                    'highlight': article['highlight']
+                } for article in search_articles(query, limit, offset)
             ]
         }
         
@@ -1,12 +1,6 @@
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.contrib.auth import get_user_model
-from django.contrib.auth.models import AnonymousUser
-from rest_framework_simplejwt.tokens import AccessToken
-from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
-
-User = get_user_model()
 
 
 class NotificationConsumer(AsyncWebsocketConsumer):
@@ -16,10 +10,10 @@ class NotificationConsumer(AsyncWebsocketConsumer):
     
     async def connect(self):
         """Handle WebSocket connection"""
-        # Get user from JWT token in query parameters
-        self.user = await self.get_user_from_token()
+        # Resolved by JWTAuthMiddleware from the token query parameter
+        self.user = self.scope.get('user')
         
-        if self.user is None or isinstance(self.user, AnonymousUser):
+        if self.user is None or not self.user.is_authenticated:
             await self.close()
             return
         
@@ -114,25 +108,6 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             'location': event['location']
         }))
     
-    @database_sync_to_async
-    def get_user_from_token(self):
-        """Get user from JWT token"""
-        try:
-            # Get token from query parameters
-            token = self.scope['query_string'].decode().split('token=')[1] if 'token=' in self.scope['query_string'].decode() else None
-            
-            if not token:
-                return None
-            
-            # Decode and validate token
-            access_token = AccessToken(token)
-            user_id = access_token['user_id']
-            user = User.objects.get(id=user_id)
-            return user
-            
-        except (InvalidToken, TokenError, User.DoesNotExist, IndexError, KeyError):
-            return None
-    
     @database_sync_to_async
     def mark_notification_as_read(self, notification_id):
         """Mark notification as read"""
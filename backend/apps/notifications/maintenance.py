@@ -0,0 +1,197 @@
+from django.db import connection, transaction
+from django.utils import timezone
+from datetime import date, datetime
+from typing import Callable, List, Optional
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLE = 'notifications'
+PARTITION_PREFIX = 'notifications_p'
+DEFAULT_PARTITION = 'notifications_default'
+
+
+def delete_in_batches(queryset, batch_size: int = 1000, pause: float = 0.0,
+                      time_budget: Optional[float] = None,
+                      progress: Optional[Callable[[int], None]] = None):
+    """
+    Delete the rows of a queryset in primary-key chunks.
+    
+    Each chunk is its own short transaction, so locks are held briefly and
+    rows are never loaded into memory. Stops early once ``time_budget``
+    seconds have elapsed. Returns ``(deleted, finished)``.
+    """
+    model = queryset.model
+    pk_queryset = queryset.order_by().values_list('pk', flat=True)
+    started = time.monotonic()
+    deleted = 0
+    
+    while True:
+        pks = list(pk_queryset[:batch_size])
+        if not pks:
+            return deleted, True
+        
+        with transaction.atomic():
+            batch_deleted, _ = model._base_manager.filter(pk__in=pks).delete()
+        deleted += batch_deleted
+        
+        if progress:
+            progress(deleted)
+        
+        if len(pks) < batch_size:
+            return deleted, True
+        
+        if time_budget is not None and time.monotonic() - started >= time_budget:
+            return deleted, False
+        
+        if pause:
+            time.sleep(pause)
+
+
+def supports_partitioning() -> bool:
+    return connection.vendor == 'postgresql'
+
+
+def _month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def _add_months(value: date, months: int) -> date:
+    month_index = value.month - 1 + months
+    return date(value.year + month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f'{PARTITION_PREFIX}{month:%Y%m}'
+
+
+def list_notification_partitions() -> List[str]:
+    """Names of the monthly partitions currently attached to the notifications table"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON pg_inherits.inhparent = parent.oid
+            JOIN pg_class child ON pg_inherits.inhrelid = child.oid
+            WHERE parent.relname = %s AND child.relname LIKE %s
+            ORDER BY child.relname
+            """,
+            [PARTITIONED_TABLE, PARTITION_PREFIX + '%']
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def ensure_notification_partitions(months_ahead: int = 3) -> List[str]:
+    """
+    Create monthly partitions from the current month up to ``months_ahead``
+    months ahead.
+    
+    Rows that landed in the default partition while a month had no partition
+    of its own (e.g. the beat schedule was down) would make ``CREATE TABLE ...
+    PARTITION OF`` fail, so for such months the default partition is detached,
+    its rows moved into the new partition and the default reattached, all in
+    one transaction.
+    """
+    if not supports_partitioning():
+        return []
+    
+    created = []
+    existing = set(list_notification_partitions())
+    current = _month_start(timezone.now().date())
+    
+    for offset in range(months_ahead + 1):
+        month = _add_months(current, offset)
+        name = partition_name(month)
+        if name in existing:
+            continue
+        bounds = [month.isoformat(), _add_months(month, 1).isoformat()]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT EXISTS (SELECT 1 FROM "{DEFAULT_PARTITION}" '
+                f'WHERE created_at >= %s AND created_at < %s)',
+                bounds
+            )
+            stranded = cursor.fetchone()[0]
+            if stranded:
+                cursor.execute(f'ALTER TABLE "{PARTITIONED_TABLE}" DETACH PARTITION "{DEFAULT_PARTITION}"')
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{PARTITIONED_TABLE}" '
+                f'FOR VALUES FROM (%s) TO (%s)',
+                bounds
+            )
+            if stranded:
+                cursor.execute(
+                    f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" '
+                    f'WHERE created_at >= %s AND created_at < %s RETURNING *) '
+                    f'INSERT INTO "{name}" SELECT * FROM moved',
+                    bounds
+                )
+                logger.info(f"Moved {cursor.rowcount} notifications from the default partition into {name}")
+                cursor.execute(f'ALTER TABLE "{PARTITIONED_TABLE}" ATTACH PARTITION "{DEFAULT_PARTITION}" DEFAULT')
+        created.append(name)
+    
+    if created:
+        logger.info(f"Created notification partitions: {', '.join(created)}")
+    return created
+
+
+def delete_expired_default_rows(cutoff: datetime, batch_size: int = 1000) -> int:
+    """
+    Delete read rows older than ``cutoff`` from the default partition, in
+    batches.
+    
+    Monthly partitions are dropped whole; read rows that only ever lived in
+    the default partition are not covered by that and are removed here.
+    Unread rows are kept, including those moved here when their month was
+    dropped.
+    """
+    if not supports_partitioning():
+        return 0
+    
+    deleted = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM "{DEFAULT_PARTITION}" WHERE ctid IN ('
+                f'SELECT ctid FROM "{DEFAULT_PARTITION}" WHERE created_at < %s AND is_read LIMIT %s)',
+                [cutoff, batch_size]
+            )
+            batch_deleted = cursor.rowcount
+        deleted += batch_deleted
+        if batch_deleted < batch_size:
+            return deleted
+
+
+def drop_expired_notification_partitions(cutoff: datetime) -> List[str]:
+    """
+    Detach and drop monthly partitions that lie entirely before ``cutoff``.
+    
+    Retention only ever removes read notifications, so a partition's unread
+    rows are first copied back into the table; with their month detached
+    they land in the default partition. This happens in the same
+    transaction as the drop.
+    """
+    if not supports_partitioning():
+        return []
+    
+    dropped = []
+    cutoff_month = _month_start(cutoff.date())
+    
+    for name in list_notification_partitions():
+        month = datetime.strptime(name[len(PARTITION_PREFIX):], '%Y%m').date()
+        if _add_months(month, 1) > cutoff_month:
+            continue
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE "{PARTITIONED_TABLE}" DETACH PARTITION "{name}"')
+            cursor.execute(f'INSERT INTO "{PARTITIONED_TABLE}" SELECT * FROM "{name}" WHERE NOT is_read')
+            kept = cursor.rowcount
+            cursor.execute(f'DROP TABLE "{name}"')
+        if kept:
+            logger.info(f"Kept {kept} unread notifications from {name} in the default partition")
+        dropped.append(name)
+    
+    if dropped:
+        logger.info(f"Dropped notification partitions: {', '.join(dropped)}")
+    return dropped
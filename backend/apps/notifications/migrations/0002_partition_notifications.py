@@ -0,0 +1,111 @@
+# Converts the notifications table to monthly range partitions on PostgreSQL;
+# reversing it copies the rows back into a plain table. Other backends (SQLite
+# in development) keep the plain table and rely on the batched deleter in
+# apps.notifications.maintenance for retention.
+
+from django.db import migrations
+
+
+def _add_months(value, months):
+    import datetime
+    month_index = value.month - 1 + months
+    return datetime.date(value.year + month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_notifications(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    
+    import datetime
+    
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT MIN(created_at) FROM notifications')
+        oldest = cursor.fetchone()[0]
+        
+        cursor.execute('ALTER TABLE notifications RENAME TO notifications_legacy')
+        # Indexes are excluded because the old primary key on id alone is not
+        # allowed on a partitioned table; everything else (defaults, identity,
+        # check constraints, ...) carries over, and the indexes are recreated
+        # with the partition key below
+        cursor.execute(
+            'CREATE TABLE notifications ('
+            ' LIKE notifications_legacy INCLUDING ALL EXCLUDING INDEXES'
+            ') PARTITION BY RANGE (created_at)'
+        )
+        cursor.execute('ALTER TABLE notifications ADD PRIMARY KEY (id, created_at)')
+        # Leads with user_id, so it also covers the foreign key index from 0001
+        cursor.execute(
+            'CREATE INDEX notifications_user_created_idx '
+            'ON notifications (user_id, created_at DESC)'
+        )
+        cursor.execute(
+            'ALTER TABLE notifications ADD CONSTRAINT notifications_user_id_fk '
+            'FOREIGN KEY (user_id) REFERENCES users (id) DEFERRABLE INITIALLY DEFERRED'
+        )
+        
+        today = datetime.date.today()
+        month = datetime.date((oldest or today).year, (oldest or today).month, 1)
+        last = _add_months(datetime.date(today.year, today.month, 1), 3)
+        while month <= last:
+            cursor.execute(
+                f'CREATE TABLE "notifications_p{month:%Y%m}" PARTITION OF notifications '
+                f'FOR VALUES FROM (%s) TO (%s)',
+                [month.isoformat(), _add_months(month, 1).isoformat()]
+            )
+            month = _add_months(month, 1)
+        cursor.execute('CREATE TABLE notifications_default PARTITION OF notifications DEFAULT')
+        
+        cursor.execute('INSERT INTO notifications SELECT * FROM notifications_legacy')
+        cursor.execute(
+            "SELECT setval(pg_get_serial_sequence('notifications', 'id'), "
+            "COALESCE((SELECT MAX(id) FROM notifications), 0) + 1, false)"
+        )
+        cursor.execute('DROP TABLE notifications_legacy')
+
+
+def unpartition_notifications(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    
+    Notification = apps.get_model('notifications', 'Notification')
+    columns = ', '.join(
+        schema_editor.quote_name(field.column) for field in Notification._meta.local_concrete_fields
+    )
+    
+    with schema_editor.connection.cursor() as cursor:
+        # Free the names the recreated table needs
+        cursor.execute('ALTER TABLE notifications RENAME TO notifications_partitioned')
+        cursor.execute(
+            'ALTER TABLE notifications_partitioned '
+            'RENAME CONSTRAINT notifications_pkey TO notifications_partitioned_pkey'
+        )
+        cursor.execute(
+            'ALTER INDEX notifications_user_created_idx '
+            'RENAME TO notifications_partitioned_user_created_idx'
+        )
+    
+    # The plain table exactly as 0001 created it, with Django's own
+    # constraint and index names
+    schema_editor.create_model(Notification)
+    
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO notifications ({columns}) SELECT {columns} FROM notifications_partitioned'
+        )
+        cursor.execute(
+            "SELECT setval(pg_get_serial_sequence('notifications', 'id'), "
+            "COALESCE((SELECT MAX(id) FROM notifications), 0) + 1, false)"
+        )
+        # Drops every partition with it
+        cursor.execute('DROP TABLE notifications_partitioned')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_notifications, unpartition_notifications),
+    ]
@@ -90,10 +90,32 @@ class Notification(models.Model):
     def mark_as_read(self):
         """Mark notification as read"""
         if not self.is_read:
-            self.is_read = True
             from django.utils import timezone
+            from .services import unread_counts
+            
+            self.is_read = True
             self.read_at = timezone.now()
-            self.save(update_fields=['is_read', 'read_at'])
+            # Conditional update so concurrent calls only decrement the counter once
+            updated = Notification.objects.filter(pk=self.pk, is_read=False).update(
+                is_read=True,
+                read_at=self.read_at
+            )
+            if updated:
+                unread_counts.decrement(self.user_id)
+    
+    def mark_as_unread(self):
+        """Mark notification as unread"""
+        if self.is_read:
+            from .services import unread_counts
+            
+            self.is_read = False
+            self.read_at = None
+            updated = Notification.objects.filter(pk=self.pk, is_read=True).update(
+                is_read=False,
+                read_at=None
+            )
+            if updated:
+                unread_counts.increment(self.user_id)
 
 
 class NotificationTemplate(models.Model):
@@ -0,0 +1,436 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db.models import Count
+from django.contrib.auth import get_user_model
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from string import Formatter
+import json
+import time
+import logging
+
+import redis
+from ecosphere.redis_client import get_redis
+from .models import Notification, NotificationTemplate
+
+logger = logging.getLogger(__name__)
+User = get_user_model()
+
+
+INCREMENT_IF_EXISTS_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('INCRBY', KEYS[1], ARGV[1])
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 1
+"""
+
+
+class UnreadCountService:
+    """
+    Per-user unread notification counters kept in Redis.
+    
+    Counters are seeded from the database on read and only adjusted while they
+    exist: an increment on a missing (or just expired) counter is skipped
+    rather than creating a partial count, and every write renews the TTL in
+    the same script, so a counter can never linger without one. While Redis
+    is unreachable reads fall back to the database and writes are skipped;
+    the periodic ``reconcile`` repairs any counter that missed an update.
+    """
+    
+    KEY_TEMPLATE = 'notifications:unread:{user_id}'
+    TIMEOUT = 60 * 60 * 24  # Reconciled well within a day
+    
+    def __init__(self):
+        self._increment = None
+    
+    def _key(self, user_id: int) -> str:
+        return self.KEY_TEMPLATE.format(user_id=user_id)
+    
+    def _script(self, client):
+        if self._increment is None:
+            self._increment = client.register_script(INCREMENT_IF_EXISTS_SCRIPT)
+        return self._increment
+    
+    def get(self, user_id: int) -> int:
+        """Return the unread count, seeding it from the database on a miss"""
+        try:
+            client = get_redis()
+            count = client.get(self._key(user_id))
+            if count is None:
+                count = self._count_from_db(user_id)
+                # NX so a concurrent seed or reset is not overwritten
+                client.set(self._key(user_id), count, ex=self.TIMEOUT, nx=True)
+        except redis.RedisError as e:
+            logger.warning(f"Unread count cache unavailable, counting in the database: {e}")
+            count = self._count_from_db(user_id)
+        return max(0, int(count))
+    
+    def increment(self, user_id: int, delta: int = 1):
+        """Atomically add to a counter; missing counters are left to be seeded on read"""
+        try:
+            client = get_redis()
+            self._script(client)(keys=[self._key(user_id)], args=[delta, self.TIMEOUT], client=client)
+        except redis.RedisError as e:
+            logger.warning(f"Could not update unread count for user {user_id}: {e}")
+    
+    def decrement(self, user_id: int, delta: int = 1):
+        self.increment(user_id, -delta)
+    
+    def increment_many(self, user_ids: Iterable[int]):
+        """Increment counters for a batch of users (e.g. after bulk_create) in one round trip"""
+        try:
+            client = get_redis()
+            script = self._script(client)
+            pipe = client.pipeline(transaction=False)
+            for user_id in user_ids:
+                script(keys=[self._key(user_id)], args=[1, self.TIMEOUT], client=pipe)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Could not update unread counts: {e}")
+    
+    def reset(self, user_id: int, count: int = 0):
+        try:
+            get_redis().set(self._key(user_id), count, ex=self.TIMEOUT)
+        except redis.RedisError as e:
+            logger.warning(f"Could not reset unread count for user {user_id}: {e}")
+    
+    def reconcile(self) -> Dict[int, int]:
+        """Recompute every active user's counter with a single grouped query"""
+        unread = dict(
+            Notification.objects.filter(is_read=False)
+            .order_by()
+            .values('user_id')
+            .annotate(count=Count('id'))
+            .values_list('user_id', 'count')
+        )
+        user_ids = User.objects.filter(is_active=True).values_list('id', flat=True)
+        counts = {user_id: unread.get(user_id, 0) for user_id in user_ids}
+        
+        pipe = get_redis().pipeline(transaction=False)
+        for user_id, count in counts.items():
+            pipe.set(self._key(user_id), count, ex=self.TIMEOUT)
+        pipe.execute()
+        logger.info(f"Reconciled unread notification counts for {len(counts)} users")
+        return counts
+    
+    def _count_from_db(self, user_id: int) -> int:
+        return Notification.objects.filter(user_id=user_id, is_read=False).count()
+
+
+class NotificationDispatchService:
+    """
+    Create notifications and push them over WebSockets.
+    
+    Types listed in ``settings.NOTIFICATION_COALESCE_WINDOWS`` are throttled
+    per (user, type): the first notification opens a window and is delivered
+    at once, and anything else arriving while the window is open is buffered
+    in Redis and delivered as a single digest when it closes. HIGH and URGENT
+    notifications are never held back. Buffered bursts are also tracked in a
+    due-time sorted set, so a lost flush task is caught up by
+    ``flush_overdue`` instead of the burst silently expiring.
+    """
+    
+    PENDING_KEY_TEMPLATE = 'notifications:pending:{user_id}:{notification_type}'
+    WINDOW_KEY_TEMPLATE = 'notifications:window:{user_id}:{notification_type}'
+    DUE_KEY = 'notifications:pending-due'
+    PENDING_TTL = 60 * 60 * 24
+    IMMEDIATE_PRIORITIES = ('HIGH', 'URGENT')
+    PRIORITY_ORDER = [choice for choice, _ in Notification.PRIORITY_CHOICES]
+    
+    def _pending_key(self, user_id: int, notification_type: str) -> str:
+        return self.PENDING_KEY_TEMPLATE.format(
+            user_id=user_id,
+            notification_type=notification_type
+        )
+    
+    def _window_key(self, user_id: int, notification_type: str) -> str:
+        return self.WINDOW_KEY_TEMPLATE.format(
+            user_id=user_id,
+            notification_type=notification_type
+        )
+    
+    def notify(self, user_id: int, notification_type: str, title: str, content: str,
+               priority: str = 'MEDIUM', icon: str = '', action_url: str = '',
+               reference_id: Optional[int] = None) -> Optional[Notification]:
+        """Send a notification, or buffer it if its type's coalescing window is open"""
+        payload = {
+            'title': title,
+            'content': content,
+            'priority': priority,
+            'icon': icon,
+            'action_url': action_url,
+            'reference_id': reference_id,
+        }
+        
+        window = settings.NOTIFICATION_COALESCE_WINDOWS.get(notification_type)
+        if not window or priority in self.IMMEDIATE_PRIORITIES:
+            return self.deliver(user_id, notification_type, [payload])
+        
+        window_key = self._window_key(user_id, notification_type)
+        key = self._pending_key(user_id, notification_type)
+        try:
+            client = get_redis()
+            # First of a burst: deliver now and hold back what follows
+            first = client.set(window_key, 1, nx=True, ex=window)
+            if not first:
+                pipe = client.pipeline()
+                pipe.rpush(key, json.dumps(payload))
+                pipe.expire(key, self.PENDING_TTL)
+                pipe.pttl(window_key)
+                # NX keeps the due time of the burst's first buffered item
+                pipe.zadd(self.DUE_KEY, {f'{user_id}:{notification_type}': time.time() + window}, nx=True)
+                pending, _, remaining_ms, _ = pipe.execute()
+        except redis.RedisError as e:
+            # Without the buffer, deliver uncoalesced rather than drop it
+            logger.warning(f"Notification coalescing unavailable, delivering at once: {e}")
+            first = True
+        
+        if first:
+            return self.deliver(user_id, notification_type, [payload])
+        
+        if pending == 1:
+            from .tasks import flush_coalesced_notifications
+            flush_coalesced_notifications.apply_async(
+                (user_id, notification_type),
+                countdown=max(remaining_ms, 0) / 1000
+            )
+        return None
+    
+    def flush(self, user_id: int, notification_type: str) -> Optional[Notification]:
+        """Persist and push everything buffered for a (user, type) pair"""
+        key = self._pending_key(user_id, notification_type)
+        pipe = get_redis().pipeline()
+        pipe.lrange(key, 0, -1)
+        pipe.delete(key)
+        pipe.zrem(self.DUE_KEY, f'{user_id}:{notification_type}')
+        raw_payloads, _, _ = pipe.execute()
+        
+        if not raw_payloads:
+            return None
+        return self.deliver(
+            user_id,
+            notification_type,
+            [json.loads(raw) for raw in raw_payloads]
+        )
+    
+    def flush_overdue(self, grace: int = 60) -> int:
+        """Flush bursts whose window closed more than ``grace`` seconds ago; returns how many"""
+        members = get_redis().zrangebyscore(self.DUE_KEY, 0, time.time() - grace)
+        flushed = 0
+        for member in members:
+            user_id, notification_type = member.split(':', 1)
+            if self.flush(int(user_id), notification_type):
+                flushed += 1
+        return flushed
+    
+    def deliver(self, user_id: int, notification_type: str,
+                payloads: List[Dict]) -> Notification:
+        """Persist one notification (a digest if several payloads) and push it"""
+        if len(payloads) == 1:
+            fields = payloads[0]
+        else:
+            fields = self._build_digest(notification_type, payloads)
+        
+        notification = Notification.objects.create(
+            user_id=user_id,
+            notification_type=notification_type,
+            **fields
+        )
+        self.push(notification)
+        return notification
+    
+    def push(self, notification: Notification):
+        """Send a persisted notification to the user's WebSocket group"""
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        
+        try:
+            async_to_sync(channel_layer.group_send)(
+                f'user_{notification.user_id}',
+                {
+                    'type': 'notification.message',
+                    'id': notification.id,
+                    'title': notification.title,
+                    'content': notification.content,
+                    'notification_type': notification.notification_type,
+                    'priority': notification.priority,
+                    'icon': notification.icon,
+                    'action_url': notification.action_url,
+                    'created_at': notification.created_at.isoformat(),
+                }
+            )
+        except Exception as e:
+            logger.error(f"Error pushing notification {notification.id}: {e}")
+    
+    def _build_digest(self, notification_type: str, payloads: List[Dict]) -> Dict:
+        label = dict(Notification.TYPE_CHOICES).get(notification_type, notification_type)
+        priority = max(
+            (payload['priority'] for payload in payloads),
+            key=lambda value: self.PRIORITY_ORDER.index(value) if value in self.PRIORITY_ORDER else 0
+        )
+        content = '\n\n'.join(f"• {payload['title']}\n{payload['content']}" for payload in payloads)
+        
+        return {
+            'title': f'{len(payloads)} new notifications: {label}'[:200],
+            'content': content,
+            'priority': priority,
+            'icon': payloads[0]['icon'],
+            'action_url': '',
+            'reference_id': None,
+        }
+
+
+# Built-in templates used when no active NotificationTemplate row overrides them
+DEFAULT_TEMPLATES = {
+    'weekly_summary': {
+        'notification_type': 'WEEKLY_SUMMARY',
+        'title_template': 'Weekly EcoSphere Summary',
+        'content_template': (
+            'Weekly EcoSphere Summary:\n\n'
+            '• Carbon tracked: {total_co2:.1f} kg CO2 ({entries_count} entries)\n'
+            '• Challenges completed: {challenges_completed}\n'
+            '• Achievements earned: {achievements_earned}\n'
+            '• Current points: {total_points}\n\n'
+            'Keep up the great work! 🌱'
+        ),
+        'icon': '📊',
+        'priority': 'MEDIUM',
+    },
+    'achievement_unlocked': {
+        'notification_type': 'ACHIEVEMENT',
+        'title_template': 'Achievement Unlocked: {achievement_name}',
+        'content_template': 'Congratulations! You\'ve earned the "{achievement_name}" achievement.',
+        'icon': '🏆',
+        'priority': 'HIGH',
+    },
+}
+
+
+class CompiledTemplate:
+    """A title/content template pair parsed once into literal and field segments"""
+    
+    __slots__ = ('notification_type', 'title', 'content', 'icon', 'priority')
+    
+    def __init__(self, notification_type: str, title_template: str,
+                 content_template: str, icon: str = '', priority: str = 'MEDIUM'):
+        self.notification_type = notification_type
+        self.title = self._compile(title_template)
+        self.content = self._compile(content_template)
+        self.icon = icon
+        self.priority = priority
+    
+    @staticmethod
+    def _compile(template: str) -> Tuple:
+        segments = []
+        for literal, field_name, format_spec, conversion in Formatter().parse(template):
+            path = tuple(field_name.split('.')) if field_name else None
+            segments.append((literal, path, format_spec or '', conversion))
+        return tuple(segments)
+    
+    @staticmethod
+    def _resolve(context: Dict, path: Tuple):
+        value = context.get(path[0], '')
+        for attr in path[1:]:
+            value = value.get(attr, '') if isinstance(value, dict) else getattr(value, attr, '')
+        return value
+    
+    def _render(self, segments: Tuple, context: Dict) -> str:
+        output = []
+        for literal, path, format_spec, conversion in segments:
+            output.append(literal)
+            if path is None:
+                continue
+            value = self._resolve(context, path)
+            if conversion == 'r':
+                value = repr(value)
+            elif conversion == 'a':
+                value = ascii(value)
+            try:
+                output.append(format(value, format_spec))
+            except (TypeError, ValueError):
+                output.append(str(value))
+        return ''.join(output)
+    
+    def render(self, context: Dict) -> Dict:
+        return {
+            'notification_type': self.notification_type,
+            'title': self._render(self.title, context)[:200],
+            'content': self._render(self.content, context),
+            'icon': self.icon,
+            'priority': self.priority,
+        }
+
+
+class NotificationTemplateRenderer:
+    """
+    Render notifications from NotificationTemplate rows.
+    
+    Active templates are compiled once per process and recompiled only when
+    their ``updated_at`` changes; the freshness check itself runs at most
+    every ``REFRESH_INTERVAL`` seconds, so bulk renders never query per call.
+    """
+    
+    REFRESH_INTERVAL = 30
+    
+    def __init__(self):
+        self._compiled: Dict[str, Tuple] = {}  # name -> (updated_at, CompiledTemplate)
+        self._defaults = {
+            name: CompiledTemplate(**fields) for name, fields in DEFAULT_TEMPLATES.items()
+        }
+        self._checked_at = 0.0
+    
+    def _refresh(self):
+        if time.monotonic() - self._checked_at < self.REFRESH_INTERVAL:
+            return
+        
+        versions = dict(
+            NotificationTemplate.objects.filter(is_active=True).values_list('name', 'updated_at')
+        )
+        stale = [
+            name for name, updated_at in versions.items()
+            if name not in self._compiled or self._compiled[name][0] != updated_at
+        ]
+        
+        compiled = {name: entry for name, entry in self._compiled.items() if name in versions}
+        for template in NotificationTemplate.objects.filter(is_active=True, name__in=stale):
+            compiled[template.name] = (
+                template.updated_at,
+                CompiledTemplate(
+                    template.notification_type,
+                    template.title_template,
+                    template.content_template,
+                    template.icon,
+                    template.priority
+                )
+            )
+        
+        self._compiled = compiled
+        self._checked_at = time.monotonic()
+    
+    def get(self, name: str) -> Optional[CompiledTemplate]:
+        """Return the compiled template for a name, falling back to the built-in default"""
+        self._refresh()
+        entry = self._compiled.get(name)
+        return entry[1] if entry else self._defaults.get(name)
+    
+    def render(self, name: str, context: Dict) -> Optional[Dict]:
+        template = self.get(name)
+        return template.render(context) if template else None
+    
+    def render_many(self, name: str, contexts: Iterable[Dict]) -> Iterator[Dict]:
+        """Render one template against many contexts with a single freshness check"""
+        template = self.get(name)
+        if template is None:
+            return
+        for context in contexts:
+            yield template.render(context)
+    
+    def invalidate(self):
+        self._checked_at = 0.0
+
+
+unread_counts = UnreadCountService()
+notifications = NotificationDispatchService()
+templates = NotificationTemplateRenderer()
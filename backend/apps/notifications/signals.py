@@ -0,0 +1,13 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Notification
+from .services import unread_counts
+
+
+@receiver(post_save, sender=Notification)
+def increment_unread_count(sender, instance, created, **kwargs):
+    """Bump the cached unread counter once the new notification is committed"""
+    if created and not instance.is_read:
+        transaction.on_commit(lambda: unread_counts.increment(instance.user_id))
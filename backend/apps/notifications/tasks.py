@@ -2,13 +2,24 @@ from celery import shared_task
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.db import models
+from django.conf import settings
 from datetime import datetime, timedelta
+import time
 import logging
 
 from apps.notifications.models import Notification
+from apps.notifications.services import unread_counts, notifications, templates
+from apps.notifications.maintenance import (
+    delete_in_batches, ensure_notification_partitions,
+    delete_expired_default_rows, drop_expired_notification_partitions
+)
+from apps.news import dedup
+from apps.news.feeds import FeedFetcher
 from apps.news.models import NewsArticle
+from apps.news.tasks import build_news_digests
 from apps.climate_data.models import ClimateData, ClimateStatistics
 from apps.chatbot.services import NewsCurationService, ClimateDataService
+from apps.chatbot.tasks import update_retrieval_index
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
@@ -20,58 +31,62 @@ def send_weekly_summary():
     try:
         logger.info("Starting weekly summary task")
         
-        # Get all active users
-        users = User.objects.filter(is_active=True)
+        from apps.carbon.models import CarbonEntry
+        from apps.gamification.models import UserChallenge, UserAchievement
         
-        for user in users:
-            # Calculate user's weekly stats
-            week_ago = timezone.now() - timedelta(days=7)
-            
-            # Get carbon entries from last week
-            from apps.carbon.models import CarbonEntry
-            weekly_entries = CarbonEntry.objects.filter(
-                user=user,
+        week_ago = timezone.now() - timedelta(days=7)
+        
+        # Weekly stats for every user in one grouped query per source
+        carbon_stats = {
+            row['user_id']: row for row in CarbonEntry.objects.filter(
                 created_at__gte=week_ago
+            ).order_by().values('user_id').annotate(
+                total_co2=models.Sum('co2_calculated'),
+                entries_count=models.Count('id')
             )
-            
-            total_co2 = sum(entry.co2_calculated for entry in weekly_entries)
-            entries_count = weekly_entries.count()
-            
-            # Get challenges completed
-            from apps.gamification.models import UserChallenge
-            challenges_completed = UserChallenge.objects.filter(
-                user=user,
+        }
+        challenges_completed = dict(
+            UserChallenge.objects.filter(
                 completed_at__gte=week_ago,
                 status='COMPLETED'
-            ).count()
-            
-            # Get achievements earned
-            from apps.gamification.models import UserAchievement
-            achievements_earned = UserAchievement.objects.filter(
-                user=user,
+            ).order_by().values('user_id').annotate(
+                count=models.Count('id')
+            ).values_list('user_id', 'count')
+        )
+        achievements_earned = dict(
+            UserAchievement.objects.filter(
                 earned_at__gte=week_ago
-            ).count()
-            
-            # Create notification
-            content = f"""Weekly EcoSphere Summary:
-            
-• Carbon tracked: {total_co2:.1f} kg CO2 ({entries_count} entries)
-• Challenges completed: {challenges_completed}
-• Achievements earned: {achievements_earned}
-• Current points: {user.total_points}
-
-Keep up the great work! 🌱"""
-            
-            Notification.objects.create(
-                user=user,
-                notification_type='WEEKLY_SUMMARY',
-                title='Weekly EcoSphere Summary',
-                content=content,
-                priority='MEDIUM',
-                icon='📊'
-            )
+            ).order_by().values('user_id').annotate(
+                count=models.Count('id')
+            ).values_list('user_id', 'count')
+        )
+        
+        # Get all active users
+        users = list(User.objects.filter(is_active=True).values_list('id', 'total_points'))
+        
+        contexts = []
+        for user_id, total_points in users:
+            carbon = carbon_stats.get(user_id, {})
+            contexts.append({
+                'total_co2': carbon.get('total_co2') or 0,
+                'entries_count': carbon.get('entries_count', 0),
+                'challenges_completed': challenges_completed.get(user_id, 0),
+                'achievements_earned': achievements_earned.get(user_id, 0),
+                'total_points': total_points,
+            })
         
-        logger.info(f"Weekly summary sent to {users.count()} users")
+        rendered = templates.render_many('weekly_summary', contexts)
+        Notification.objects.bulk_create(
+            [
+                Notification(user_id=user_id, **fields)
+                for (user_id, _), fields in zip(users, rendered)
+            ],
+            batch_size=1000
+        )
+        # bulk_create skips post_save, so bump unread counters explicitly
+        unread_counts.increment_many(user_id for user_id, _ in users)
+        
+        logger.info(f"Weekly summary sent to {len(users)} users")
         
     except Exception as e:
         logger.error(f"Error in weekly summary task: {e}")
@@ -83,60 +98,76 @@ def fetch_and_curate_news():
     try:
         logger.info("Starting news curation task")
         
-        # Mock news sources (in production, integrate with real news APIs)
-        mock_articles = [
-            {
-                'title': 'Global CO2 Levels Reach New Record High',
-                'content': 'Scientists report that atmospheric CO2 concentrations have reached 420.5 ppm, the highest level in human history. This represents a significant increase from pre-industrial levels of 280 ppm.',
-                'source': 'Climate Science Journal',
-                'url': 'https://example.com/co2-record',
-                'published_date': timezone.now() - timedelta(hours=2)
-            },
-            {
-                'title': 'Renewable Energy Surpasses Coal in Global Electricity Generation',
-                'content': 'For the first time in history, renewable energy sources have generated more electricity globally than coal-fired power plants. Solar and wind power lead the transition.',
-                'source': 'Energy Report',
-                'url': 'https://example.com/renewable-milestone',
-                'published_date': timezone.now() - timedelta(hours=5)
-            },
-            {
-                'title': 'Arctic Ice Extent Shows Continued Decline',
-                'content': 'Satellite data reveals that Arctic sea ice extent has reached its second-lowest level on record, continuing a decades-long trend of decline due to global warming.',
-                'source': 'Polar Research Institute',
-                'url': 'https://example.com/arctic-ice',
-                'published_date': timezone.now() - timedelta(hours=8)
-            }
-        ]
+        fetcher = FeedFetcher()
+        items = fetcher.fetch()
         
-        curation_service = NewsCurationService()
+        # Skip URLs we already have, then drop syndicated copies: anything whose
+        # fingerprint is near a stored article or an earlier one in this batch
+        for article_data in items:
+            article_data['url_hash'] = NewsArticle.compute_url_hash(article_data['url'])
+        existing_urls = set(NewsArticle.objects.filter(
+            url_hash__in=[article['url_hash'] for article in items]
+        ).values_list('url_hash', flat=True))
         
-        for article_data in mock_articles:
-            # Check if article already exists
-            if NewsArticle.objects.filter(url=article_data['url']).exists():
+        candidates = []
+        for article_data in items:
+            if article_data['url_hash'] in existing_urls:
                 continue
-            
-            # Summarize and categorize
-            summary = curation_service.summarize_article(
-                article_data['title'], 
-                article_data['content']
-            )
-            category = curation_service.categorize_article(
-                article_data['title'], 
-                article_data['content']
-            )
-            
-            # Create article
-            NewsArticle.objects.create(
+            existing_urls.add(article_data['url_hash'])
+            article_data['minhash'] = dedup.signature(article_data['title'], article_data['content'])
+            candidates.append(article_data)
+        
+        stored_duplicates = dedup.find_stored_duplicates([article['minhash'] for article in candidates])
+        batch_index = dedup.NearDuplicateIndex()
+        pending = []
+        for position, article_data in enumerate(candidates):
+            if position in stored_duplicates or batch_index.find(article_data['minhash']) is not None:
+                continue
+            batch_index.add(article_data['minhash'], article_data['url'])
+            pending.append(article_data)
+        
+        duplicates = len(candidates) - len(pending)
+        if duplicates:
+            logger.info(f"Skipped {duplicates} near-duplicate news articles")
+        
+        # One combined summarize-and-categorize call per new story, run concurrently
+        results = NewsCurationService().curate_many(pending)
+        
+        new_articles = []
+        for article_data, result in zip(pending, results):
+            new_articles.append(NewsArticle(
                 title=article_data['title'],
-                summary=summary,
+                summary=result['summary'],
                 content=article_data['content'],
+                content_hash=NewsArticle.compute_content_hash(article_data['title'], article_data['content']),
+                minhash=dedup.to_bytes(article_data['minhash']),
                 source=article_data['source'],
                 url=article_data['url'],
-                category=category,
+                url_hash=article_data['url_hash'],
+                image_url=article_data['image_url'],
+                category=result['category'],
                 published_date=article_data['published_date']
-            )
+            ))
+        # Upsert on the URL hash so a concurrent run that stored the same URL
+        # first is updated rather than failing the whole batch
+        articles = NewsArticle.objects.bulk_create(
+            new_articles,
+            update_conflicts=True,
+            unique_fields=['url_hash'],
+            update_fields=[
+                'title', 'summary', 'content', 'content_hash', 'minhash',
+                'image_url', 'category', 'published_date'
+            ]
+        )
+        # bulk_create skips save(), so write the band keys for the new rows here
+        created = dedup.index_articles(articles)
+        fetcher.commit()
         
-        logger.info(f"Processed {len(mock_articles)} news articles")
+        if created:
+            update_retrieval_index.delay()
+            build_news_digests.delay()
+        
+        logger.info(f"Processed {len(items)} news feed items, {created} new")
         
     except Exception as e:
         logger.error(f"Error in news curation task: {e}")
@@ -196,6 +227,8 @@ def update_climate_data():
             }
         )
         
+        update_retrieval_index.delay()
+        
         logger.info("Climate data updated successfully")
         
     except Exception as e:
@@ -255,14 +288,15 @@ def check_achievement_criteria():
                     )
                     
                     # Create notification
-                    Notification.objects.create(
-                        user=user,
-                        notification_type='ACHIEVEMENT',
-                        title=f'Achievement Unlocked: {achievement.name}',
-                        content=f'Congratulations! You\'ve earned the "{achievement.name}" achievement.',
-                        priority='HIGH',
-                        icon='🏆',
-                        reference_id=achievement.id
+                    fields = templates.render(
+                        'achievement_unlocked',
+                        {'achievement_name': achievement.name}
+                    )
+                    notifications.notify(
+                        user.id,
+                        fields.pop('notification_type'),
+                        reference_id=achievement.id,
+                        **fields
                     )
                     
                     logger.info(f"Unlocked achievement {achievement.name} for user {user.username}")
@@ -273,34 +307,113 @@ def check_achievement_criteria():
         logger.error(f"Error in achievement check task: {e}")
 
 
-@shared_task
-def cleanup_old_data():
+@shared_task(bind=True)
+def cleanup_old_data(self):
     """Clean up old data to maintain performance"""
     try:
         logger.info("Starting data cleanup task")
         
-        # Clean up old notifications (older than 30 days)
-        cutoff_date = timezone.now() - timedelta(days=30)
-        old_notifications = Notification.objects.filter(
-            created_at__lt=cutoff_date,
-            is_read=True
+        started = time.monotonic()
+        now = timezone.now()
+        
+        # Whole months of read notifications past retention are dropped as
+        # partitions (unread ones are kept, so unread counts are unaffected);
+        # a failure here should not hold up the batched deletes below
+        dropped_partitions, default_deleted = [], 0
+        try:
+            partition_cutoff = now - timedelta(days=settings.NOTIFICATION_PARTITION_RETENTION_DAYS)
+            ensure_notification_partitions()
+            dropped_partitions = drop_expired_notification_partitions(partition_cutoff)
+            default_deleted = delete_expired_default_rows(partition_cutoff, batch_size=settings.CLEANUP_BATCH_SIZE)
+        except Exception as e:
+            logger.error(f"Error maintaining notification partitions: {e}")
+        
+        def report(table):
+            def progress(deleted):
+                logger.info(f"Cleanup progress: {deleted} rows deleted from {table}")
+                self.update_state(state='PROGRESS', meta={'table': table, 'deleted': deleted})
+            return progress
+        
+        def remaining_budget():
+            return max(0.0, settings.CLEANUP_TIME_BUDGET - (time.monotonic() - started))
+        
+        # Clean up old read notifications
+        deleted_count, notifications_done = delete_in_batches(
+            Notification.objects.filter(
+                created_at__lt=now - timedelta(days=settings.READ_NOTIFICATION_RETENTION_DAYS),
+                is_read=True
+            ),
+            batch_size=settings.CLEANUP_BATCH_SIZE,
+            pause=settings.CLEANUP_BATCH_PAUSE,
+            time_budget=remaining_budget(),
+            progress=report('notifications')
         )
-        deleted_count = old_notifications.count()
-        old_notifications.delete()
         
-        # Clean up old climate data (older than 1 year)
-        old_climate_data = ClimateData.objects.filter(
-            date__lt=timezone.now().date() - timedelta(days=365)
+        # Clean up old climate data
+        climate_deleted_count, climate_done = 0, False
+        if notifications_done:
+            climate_deleted_count, climate_done = delete_in_batches(
+                ClimateData.objects.filter(
+                    date__lt=now.date() - timedelta(days=settings.CLIMATE_DATA_RETENTION_DAYS)
+                ),
+                batch_size=settings.CLEANUP_BATCH_SIZE,
+                pause=settings.CLEANUP_BATCH_PAUSE,
+                time_budget=remaining_budget(),
+                progress=report('climate_data')
+            )
+        
+        logger.info(
+            f"Cleaned up {len(dropped_partitions)} notification partitions, "
+            f"{deleted_count + default_deleted} old "
+            f"notifications and {climate_deleted_count} old climate data points"
         )
-        climate_deleted_count = old_climate_data.count()
-        old_climate_data.delete()
         
-        logger.info(f"Cleaned up {deleted_count} old notifications and {climate_deleted_count} old climate data points")
+        if not climate_done:
+            logger.info("Cleanup time budget exhausted, rescheduling remaining work")
+            cleanup_old_data.apply_async(countdown=60)
         
     except Exception as e:
         logger.error(f"Error in data cleanup task: {e}")
 
 
+@shared_task
+def reconcile_unread_counts():
+    """Rebuild cached unread notification counters from the database"""
+    try:
+        logger.info("Starting unread count reconciliation task")
+        
+        counts = unread_counts.reconcile()
+        
+        logger.info(f"Unread counts reconciled for {len(counts)} users")
+        
+    except Exception as e:
+        logger.error(f"Error reconciling unread counts: {e}")
+
+
+@shared_task
+def flush_coalesced_notifications(user_id, notification_type):
+    """Persist and push the digest for a coalescing window that has closed"""
+    try:
+        notification = notifications.flush(user_id, notification_type)
+        if notification:
+            logger.info(f"Flushed {notification_type} notifications for user {user_id}")
+        
+    except Exception as e:
+        logger.error(f"Error flushing coalesced notifications: {e}")
+
+
+@shared_task
+def flush_overdue_notifications():
+    """Deliver coalesced bursts whose scheduled flush never ran"""
+    try:
+        flushed = notifications.flush_overdue()
+        if flushed:
+            logger.info(f"Flushed {flushed} overdue coalesced notification bursts")
+        
+    except Exception as e:
+        logger.error(f"Error flushing overdue notifications: {e}")
+
+
 @shared_task
 def send_climate_alerts():
     """Check for and send climate alerts"""
@@ -324,9 +437,9 @@ def send_climate_alerts():
             
             for user in users:
                 # Create notification
-                Notification.objects.create(
-                    user=user,
-                    notification_type='CLIMATE_ALERT',
+                notifications.notify(
+                    user.id,
+                    'CLIMATE_ALERT',
                     title=alert_data['title'],
                     content=alert_data['description'],
                     priority=alert_data['severity'],
@@ -0,0 +1,123 @@
+"""
+Notification retention tests.
+
+The partition maintenance tests need PostgreSQL and are skipped on other
+databases; the retention policy itself (only read notifications expire) is
+checked on every backend. Run with
+``python manage.py test apps.notifications.tests``.
+"""
+from datetime import datetime, timedelta
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .maintenance import (
+    DEFAULT_PARTITION, _add_months, _month_start, delete_expired_default_rows,
+    drop_expired_notification_partitions, ensure_notification_partitions,
+    list_notification_partitions, partition_name,
+)
+from .models import Notification
+from .tasks import cleanup_old_data
+
+User = get_user_model()
+
+
+class NotificationFactoryMixin:
+    """Notifications backdated to a given creation time"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', email='reader@example.com', password='secret')
+    
+    def notification(self, created_at: datetime, is_read: bool) -> Notification:
+        notification = Notification.objects.create(
+            user=self.user,
+            notification_type='SYSTEM',
+            title='Notice',
+            content='Something happened',
+            is_read=is_read
+        )
+        # created_at is auto_now_add, and the partition key, so it is set afterwards
+        Notification.objects.filter(pk=notification.pk).update(created_at=created_at)
+        return notification
+    
+    def partition_of(self, notification: Notification) -> str:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT tableoid::regclass::text FROM notifications WHERE id = %s', [notification.pk])
+            return cursor.fetchone()[0].strip('"')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CleanupRetentionTests(NotificationFactoryMixin, TestCase):
+    """Cleanup expires old read notifications and never unread ones"""
+    
+    def test_only_old_read_notifications_are_deleted(self):
+        old = timezone.now() - timedelta(days=400)
+        old_read = self.notification(old, is_read=True)
+        old_unread = self.notification(old, is_read=False)
+        recent_read = self.notification(timezone.now(), is_read=True)
+        
+        cleanup_old_data.apply()
+        
+        remaining = set(Notification.objects.values_list('pk', flat=True))
+        self.assertNotIn(old_read.pk, remaining)
+        self.assertIn(old_unread.pk, remaining)
+        self.assertIn(recent_read.pk, remaining)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'notification partitioning is PostgreSQL only')
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class PartitionMaintenanceTests(NotificationFactoryMixin, TestCase):
+    """Monthly partition creation and expiry"""
+    
+    def create_partition(self, month):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS "{partition_name(month)}" PARTITION OF notifications '
+                f'FOR VALUES FROM (%s) TO (%s)',
+                [month.isoformat(), _add_months(month, 1).isoformat()]
+            )
+    
+    def test_dropping_a_partition_keeps_its_unread_rows(self):
+        month = _month_start((timezone.now() - timedelta(days=400)).date())
+        self.create_partition(month)
+        created_at = timezone.make_aware(datetime(month.year, month.month, 15))
+        read = self.notification(created_at, is_read=True)
+        unread = self.notification(created_at, is_read=False)
+        self.assertEqual(self.partition_of(unread), partition_name(month))
+        
+        dropped = drop_expired_notification_partitions(timezone.now() - timedelta(days=180))
+        
+        self.assertIn(partition_name(month), dropped)
+        self.assertNotIn(partition_name(month), list_notification_partitions())
+        self.assertFalse(Notification.objects.filter(pk=read.pk).exists())
+        self.assertEqual(self.partition_of(unread), DEFAULT_PARTITION)
+    
+    def test_default_partition_cleanup_keeps_unread_rows(self):
+        # Far enough back that no monthly partition covers it
+        created_at = timezone.now() - timedelta(days=365 * 20)
+        read = self.notification(created_at, is_read=True)
+        unread = self.notification(created_at, is_read=False)
+        self.assertEqual(self.partition_of(read), DEFAULT_PARTITION)
+        
+        deleted = delete_expired_default_rows(timezone.now() - timedelta(days=180))
+        
+        self.assertEqual(deleted, 1)
+        self.assertFalse(Notification.objects.filter(pk=read.pk).exists())
+        self.assertTrue(Notification.objects.filter(pk=unread.pk).exists())
+    
+    def test_rows_stranded_in_the_default_partition_move_to_their_new_partition(self):
+        month = _add_months(_month_start(timezone.now().date()), 3)
+        name = partition_name(month)
+        with connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE notifications DETACH PARTITION "{name}"')
+            cursor.execute(f'DROP TABLE "{name}"')
+        stranded = self.notification(timezone.make_aware(datetime(month.year, month.month, 2)), is_read=False)
+        self.assertEqual(self.partition_of(stranded), DEFAULT_PARTITION)
+        
+        created = ensure_notification_partitions()
+        
+        self.assertEqual(created, [name])
+        self.assertEqual(self.partition_of(stranded), name)
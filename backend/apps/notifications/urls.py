@@ -5,8 +5,10 @@ from . import views
 router = DefaultRouter()
 router.register(r'', views.NotificationViewSet, basename='notification')
 
+# The router is mounted at the root, so these must come first or its
+# detail route would capture them as primary keys
 urlpatterns = [
-    path('', include(router.urls)),
     path('read-all/', views.MarkAllReadView.as_view(), name='mark-all-read'),
     path('unread-count/', views.UnreadCountView.as_view(), name='unread-count'),
+    path('', include(router.urls)),
 ]
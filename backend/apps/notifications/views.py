@@ -2,15 +2,41 @@ from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
+from django.utils import timezone
 from .models import Notification, NotificationTemplate
+from .serializers import NotificationSerializer
+from .services import unread_counts
 
 
 class NotificationViewSet(viewsets.ModelViewSet):
     """ViewSet for notifications"""
+    serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    # Notifications are created by the server, never through the API
+    http_method_names = ['get', 'patch', 'delete', 'head', 'options']
     
     def get_queryset(self):
         return Notification.objects.filter(user=self.request.user).order_by('-created_at')
+    
+    def perform_update(self, serializer):
+        # Read state goes through the model's conditional updates so the
+        # unread counter moves exactly once per actual change
+        is_read = serializer.validated_data.pop('is_read', None)
+        serializer.validated_data.pop('read_at', None)
+        notification = serializer.save()
+        if is_read is True:
+            notification.mark_as_read()
+        elif is_read is False:
+            notification.mark_as_unread()
+    
+    def perform_destroy(self, instance):
+        # Deleting only while unread decides the counter change in the same
+        # statement, so a concurrent mark_as_read cannot decrement it twice
+        deleted, _ = Notification.objects.filter(pk=instance.pk, is_read=False).delete()
+        if deleted:
+            unread_counts.decrement(instance.user_id)
+        else:
+            instance.delete()
 
 
 class NotificationTemplateViewSet(viewsets.ReadOnlyModelViewSet):
@@ -30,7 +56,8 @@ class MarkAllReadView(APIView):
         Notification.objects.filter(
             user=request.user,
             is_read=False
-        ).update(is_read=True)
+        ).update(is_read=True, read_at=timezone.now())
+        unread_counts.reset(request.user.id)
         
         return Response({'message': 'All notifications marked as read'}, status=status.HTTP_200_OK)
 
@@ -40,9 +67,6 @@ class UnreadCountView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        count = Notification.objects.filter(
-            user=request.user,
-            is_read=False
-        ).count()
+        count = unread_counts.get(request.user.id)
         
         return Response({'unread_count': count})
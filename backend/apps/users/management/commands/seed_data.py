@@ -4,6 +4,8 @@ from apps.gamification.models import Challenge, Achievement, UserAchievement
 from apps.news.models import NewsArticle
 from apps.climate_data.models import ClimateData, ClimateStatistics
 from apps.carbon.models import CarbonEntry
+from apps.notifications.models import NotificationTemplate
+from apps.notifications.services import DEFAULT_TEMPLATES
 from datetime import datetime, timedelta
 import random
 
@@ -25,6 +27,9 @@ class Command(BaseCommand):
         # Create achievements
         self.create_achievements()
         
+        # Create notification templates
+        self.create_notification_templates()
+        
         # Create news articles
         self.create_news_articles()
         
@@ -208,6 +213,16 @@ class Command(BaseCommand):
             if created:
                 self.stdout.write(f'Created achievement: {achievement.name}')
 
+    def create_notification_templates(self):
+        """Create editable copies of the built-in notification templates"""
+        for name, template_data in DEFAULT_TEMPLATES.items():
+            template, created = NotificationTemplate.objects.get_or_create(
+                name=name,
+                defaults=template_data
+            )
+            if created:
+                self.stdout.write(f'Created notification template: {template.name}')
+
     def create_news_articles(self):
         """Create sample news articles"""
         articles_data = [
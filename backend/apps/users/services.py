@@ -0,0 +1,41 @@
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.db import router
+from typing import Optional
+
+User = get_user_model()
+
+
+class UserCacheService:
+    """
+    Short-lived cache of the user fields hot authentication paths need.
+    
+    Only ``FIELDS`` are cached (never the password hash or profile data);
+    ``get`` rebuilds a ``User`` from them with every other field deferred, so
+    code that touches anything else loads it from the database as usual.
+    """
+    
+    KEY_TEMPLATE = 'users:auth:{user_id}'
+    TIMEOUT = 60
+    FIELDS = ('id', 'username', 'role', 'is_active')
+    
+    def _key(self, user_id) -> str:
+        return self.KEY_TEMPLATE.format(user_id=user_id)
+    
+    def get(self, user_id) -> Optional[User]:
+        """Return an active user by id, hitting the database only on a cache miss"""
+        fields = cache.get(self._key(user_id))
+        if fields is None:
+            fields = User.objects.filter(id=user_id).values(*self.FIELDS).first()
+            if fields is None:
+                return None
+            cache.set(self._key(user_id), fields, self.TIMEOUT)
+        if not fields['is_active']:
+            return None
+        return User.from_db(router.db_for_read(User), list(fields), list(fields.values()))
+    
+    def invalidate(self, user_id):
+        cache.delete(self._key(user_id))
+
+
+user_cache = UserCacheService()
@@ -41,6 +41,31 @@ app.conf.beat_schedule = {
         'task': 'apps.notifications.tasks.send_climate_alerts',
         'schedule': 60.0 * 30.0,  # Every 30 minutes
     },
+    'reconcile-unread-counts': {
+        'task': 'apps.notifications.tasks.reconcile_unread_counts',
+        'schedule': 60.0 * 15.0,  # Every 15 minutes
+    },
+    'flush-overdue-notifications': {
+        'task': 'apps.notifications.tasks.flush_overdue_notifications',
+        'schedule': 60.0 * 5.0,  # Every 5 minutes
+    },
+    'flush-article-counters': {
+        'task': 'apps.news.tasks.flush_article_counters',
+        'schedule': 60.0,  # Every minute
+    },
+    'materialize-trending': {
+        'task': 'apps.news.tasks.materialize_trending',
+        'schedule': 60.0 * 10.0,  # Every 10 minutes
+    },
+    'build-news-digests': {
+        'task': 'apps.news.tasks.build_news_digests',
+        'schedule': 60.0 * 60.0 * 24.0,  # Daily
+    },
+    'rebuild-retrieval-index': {
+        'task': 'apps.chatbot.tasks.update_retrieval_index',
+        'schedule': 60.0 * 60.0 * 24.0,  # Daily
+        'kwargs': {'full': True},
+    },
 }
 
 app.conf.timezone = 'UTC'
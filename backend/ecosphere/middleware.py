@@ -0,0 +1,48 @@
+"""
+Channels middleware for EcoSphere WebSocket consumers
+"""
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.exceptions import TokenError
+
+from apps.users.services import user_cache
+
+
+@database_sync_to_async
+def get_user_for_token(raw_token):
+    """Validate an access token and resolve its user through the user cache"""
+    try:
+        access_token = AccessToken(raw_token)
+        user_id = access_token[settings.SIMPLE_JWT['USER_ID_CLAIM']]
+    except (TokenError, KeyError):
+        return AnonymousUser()
+    
+    return user_cache.get(user_id) or AnonymousUser()
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Populate scope['user'] from a JWT passed as ``?token=<access token>``.
+    
+    This is the only WebSocket authentication: there is no session or cookie
+    lookup, so connections without a valid token are anonymous.
+    """
+    
+    query_param = 'token'
+    
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        tokens = query.get(self.query_param)
+        
+        if tokens and tokens[0]:
+            scope['user'] = await get_user_for_token(tokens[0])
+        else:
+            scope['user'] = AnonymousUser()
+        
+        return await super().__call__(scope, receive, send)
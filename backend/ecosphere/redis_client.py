@@ -0,0 +1,16 @@
+"""
+Shared Redis client for features that need more than the cache API
+(lists, sorted sets, scripts)
+"""
+import redis
+from django.conf import settings
+
+_client = None
+
+
+def get_redis():
+    """Return a process-wide Redis client backed by a connection pool"""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _client
@@ -3,7 +3,9 @@ WebSocket URL routing for EcoSphere
 """
 from django.urls import path
 from apps.notifications.consumers import NotificationConsumer
+from apps.chatbot.consumers import ChatConsumer
 
 websocket_urlpatterns = [
     path('ws/notifications/', NotificationConsumer.as_asgi()),
+    path('ws/chat/', ChatConsumer.as_asgi()),
 ]
@@ -18,6 +18,8 @@ env = environ.Env(
     GOOGLE_OAUTH_CLIENT_ID=(str, 'your-google-client-id'),
     GOOGLE_OAUTH_CLIENT_SECRET=(str, 'your-google-client-secret'),
     GEMINI_API_KEY=(str, 'your-gemini-api-key'),
+    GEMINI_API_ENDPOINT=(str, ''),
+    LLM_BACKEND=(str, 'gemini'),
     OPENMETEO_API_KEY=(str, 'your-openmeteo-api-key'),
 )
 
@@ -204,18 +206,30 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Redis
+REDIS_URL = env('REDIS_URL')
+
 # Channels Configuration
 CHANNEL_LAYERS = {
     'default': {
         'BACKEND': 'channels_redis.core.RedisChannelLayer',
         'CONFIG': {
-            "hosts": [env('REDIS_URL')],
+            "hosts": [REDIS_URL],
         },
     },
 }
 
+# Cache Configuration
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'ecosphere',
+    }
+}
+
 # Celery Configuration
-CELERY_BROKER_URL = env('REDIS_URL')
+CELERY_BROKER_URL = REDIS_URL
 CELERY_RESULT_BACKEND = 'django-db'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
@@ -223,6 +237,23 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 
+# Notification coalescing: the first notification of a type is delivered at
+# once; same-type notifications for that user arriving within the following
+# window (seconds) are merged into a single digest. HIGH/URGENT skip this.
+NOTIFICATION_COALESCE_WINDOWS = {
+    'ACHIEVEMENT': 60,
+    'CHALLENGE': 60,
+    'CLIMATE_ALERT': 300,
+}
+
+# Data retention (see apps.notifications.tasks.cleanup_old_data)
+READ_NOTIFICATION_RETENTION_DAYS = 30
+NOTIFICATION_PARTITION_RETENTION_DAYS = 180  # Monthly partitions are dropped; their unread rows are kept
+CLIMATE_DATA_RETENTION_DAYS = 365
+CLEANUP_BATCH_SIZE = 1000
+CLEANUP_BATCH_PAUSE = 0.05  # seconds between delete batches
+CLEANUP_TIME_BUDGET = 300  # seconds per task run before rescheduling
+
 # Google OAuth Settings
 SOCIALACCOUNT_PROVIDERS = {
     'google': {
@@ -241,6 +272,72 @@ SOCIALACCOUNT_PROVIDERS = {
 GOOGLE_OAUTH_CLIENT_ID = env('GOOGLE_OAUTH_CLIENT_ID')
 GOOGLE_OAUTH_CLIENT_SECRET = env('GOOGLE_OAUTH_CLIENT_SECRET')
 GEMINI_API_KEY = env('GEMINI_API_KEY')
+GEMINI_API_ENDPOINT = env('GEMINI_API_ENDPOINT')  # Override for local/fake model servers
+
+# LLM client (see apps.chatbot.llm)
+LLM_BACKEND = env('LLM_BACKEND')  # 'gemini', 'stub' or a dotted path to a backend class
+LLM_MODEL = 'gemini-pro'
+LLM_MAX_CONCURRENCY = 8
+LLM_TIMEOUT = 20  # seconds per call
+LLM_MAX_RETRIES = 2
+LLM_CIRCUIT_FAILURE_THRESHOLD = 5
+LLM_CIRCUIT_RESET_TIMEOUT = 30  # seconds
+
+# Concurrent model calls per news curation batch (see apps.chatbot.services)
+NEWS_CURATION_CONCURRENCY = 8
+
+# News feeds read by fetch_and_curate_news (see apps.news.feeds). Each entry
+# has a 'type' ('rss', 'json', 'directory' or a dotted path to a source class)
+# plus its options, e.g. {'type': 'rss', 'url': 'https://example.com/feed.xml'}
+NEWS_FEEDS = [
+    {'type': 'directory', 'path': os.path.join(BASE_DIR.parent, 'apps', 'news', 'fixtures', 'feeds')},
+]
+NEWS_FEED_CONCURRENCY = 8
+NEWS_FEED_TIMEOUT = 10  # seconds per request
+NEWS_FEED_MAX_ITEMS = 50  # per feed
+
+# Estimated Jaccard similarity at which an incoming article counts as a
+# near-duplicate of a stored one and is skipped (see apps.news.dedup)
+NEWS_DEDUP_THRESHOLD = 0.7
+
+# Chatbot response cache (see apps.chatbot.cache)
+CHATBOT_CACHE_MAX_ENTRIES = 1000
+CHATBOT_CACHE_TTL = 60 * 60  # seconds
+CHATBOT_CACHE_SIMILARITY_THRESHOLD = 0.92  # None disables near-duplicate lookups
+
+# Chat history sent with each prompt (see apps.chatbot.context)
+CHATBOT_CONTEXT_MAX_TOKENS = 1500
+CHATBOT_CONTEXT_SUMMARY_MAX_TOKENS = 300
+
+# Retrieval over news and climate statistics (see apps.chatbot.retrieval)
+CHATBOT_RETRIEVAL_INDEX_PATH = env('CHATBOT_RETRIEVAL_INDEX_PATH', default=os.path.join(BASE_DIR, 'var', 'retrieval_index.npz'))
+CHATBOT_RETRIEVAL_TOP_K = 3
+CHATBOT_RETRIEVAL_MIN_SCORE = 0.1
+
+# Weekly digest snapshots (see apps.news.digest)
+NEWS_DIGEST_DAYS = 7
+NEWS_DIGEST_SIZE = 10
+NEWS_DIGEST_PERSONALIZED = True  # also build per-user digests from bookmark history
+
+# Personalized feed ranking (see apps.news.ranking)
+NEWS_RANKING_CANDIDATES = 500
+NEWS_RANKING_WINDOW_DAYS = 14
+NEWS_RANKING_HALF_LIFE_HOURS = 24
+NEWS_RANKING_WEIGHTS = {'affinity': 2.0, 'trending': 1.0, 'location': 1.5}
+
+# Trending topics and articles (see apps.news.trending)
+TRENDING_HALF_LIFE_HOURS = 6
+TRENDING_MAX_TRACKED = 5000
+TRENDING_TOP_TOPICS = 20
+TRENDING_TOP_ARTICLES = 10
+
+# Chat rate limits per user role (see apps.chatbot.ratelimit); None is unlimited
+CHATBOT_RATE_LIMITS = {
+    'INDIVIDUAL': {'request_burst': 10, 'requests_per_minute': 6, 'tokens_per_hour': 30000},
+    'NGO': {'request_burst': 20, 'requests_per_minute': 15, 'tokens_per_hour': 100000},
+    'ADMIN': None,
+    'default': {'request_burst': 10, 'requests_per_minute': 6, 'tokens_per_hour': 30000},
+}
 OPENMETEO_API_KEY = env('OPENMETEO_API_KEY')
 
 # Logging